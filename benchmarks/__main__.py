@@ -0,0 +1,62 @@
+import logging
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List
+
+from benchmarks import schedule, pipeline_overhead, html_extraction, http_download
+from benchmarks.common import DEFAULT_THRESHOLD, print_results, print_comparisons, save_results, load_results, \
+    compare, regressions
+
+SUITES = {
+    "schedule": schedule,
+    "pipeline": pipeline_overhead,
+    "html": html_extraction,
+    "http": http_download,
+}
+
+
+def run_suites(names: List[str]) -> List[dict]:
+    results = []
+    for name in names:
+        print(f"Running {name} benchmarks...", file=sys.stderr)
+        results.extend(SUITES[name].run())
+    return results
+
+
+def main() -> int:
+    parser = ArgumentParser(prog="python -m benchmarks", description="Run Pipeliner benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("-o", "--output", type=Path, help="save results into JSON file")
+    parser.add_argument("-c", "--compare", type=Path, metavar="BASELINE", help="compare with results saved before")
+    parser.add_argument("--current", type=Path, help="compare saved results instead of running benchmarks")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"relative slowdown reported as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(unknown)}")
+
+    logging.disable(logging.CRITICAL)
+    if args.current is not None:
+        results = load_results(args.current)
+    else:
+        results = run_suites(args.suites or list(SUITES))
+    if args.output is not None:
+        save_results(results, args.output)
+
+    if args.compare is None:
+        print_results(results)
+        return 0
+
+    comparisons = compare(load_results(args.compare), results)
+    print_comparisons(comparisons, args.threshold)
+    found = regressions(comparisons, args.threshold)
+    if found:
+        print(f"{len(found)} benchmarks are more than {args.threshold:.0%} slower", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
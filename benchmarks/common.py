@@ -0,0 +1,62 @@
+import json
+import timeit
+from pathlib import Path
+from typing import Callable, List, Dict, NamedTuple
+
+from pipeliner.history_cli import format_seconds
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.1
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else 0.0
+
+
+def measure(name: str, func: Callable[[], object], number: int = 1, repeat: int = DEFAULT_REPEAT) -> dict:
+    # the best of several repeats is the least disturbed by the rest of the system
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return {"name": name, "seconds": best / number}
+
+
+def print_results(results: List[dict]) -> None:
+    for result in results:
+        print(f"{result['name']:<48}{format_seconds(result['seconds']):>12}")
+
+
+def print_comparisons(comparisons: List[Comparison], threshold: float = DEFAULT_THRESHOLD) -> None:
+    for comparison in comparisons:
+        flag = "  REGRESSION" if comparison.change > threshold else ""
+        print(
+            f"{comparison.name:<48}{format_seconds(comparison.baseline):>12}"
+            f"{format_seconds(comparison.current):>12}{comparison.change:>+9.1%}{flag}"
+        )
+
+
+def save_results(results: List[dict], path: Path) -> None:
+    with open(str(path), encoding="utf8", mode="w") as results_file:
+        json.dump({"results": results}, results_file, indent=2)
+
+
+def load_results(path: Path) -> List[dict]:
+    with open(str(path), encoding="utf8", mode="r") as results_file:
+        return json.load(results_file)["results"]
+
+
+def compare(baseline: List[dict], current: List[dict]) -> List[Comparison]:
+    baseline_seconds: Dict[str, float] = {result["name"]: result["seconds"] for result in baseline}
+    return [
+        Comparison(result["name"], baseline_seconds[result["name"]], result["seconds"])
+        for result in current
+        if result["name"] in baseline_seconds
+    ]
+
+
+def regressions(comparisons: List[Comparison], threshold: float = DEFAULT_THRESHOLD) -> List[Comparison]:
+    return [comparison for comparison in comparisons if comparison.change > threshold]
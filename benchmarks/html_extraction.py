@@ -0,0 +1,41 @@
+from typing import List
+
+from benchmarks.common import measure, print_results
+from pipeliner.steps import GetHtmlElement, GetHtmlElementText, GetHtmlElementsText, ParseHtml
+
+POSTS_COUNT = 20000
+
+
+def make_page(posts_count: int = POSTS_COUNT) -> str:
+    posts = "".join(
+        f"<div class=\"post\"><h2 class=\"post-title\"><a href=\"/post/{i}\">Post {i}</a></h2>"
+        f"<span class=\"post-date\">2024-01-{i % 28 + 1:02}</span><p>{'lorem ipsum ' * 20}</p></div>"
+        for i in range(posts_count)
+    )
+    return f"<html><head><title>Blog</title></head><body>{posts}</body></html>"
+
+
+def run() -> List[dict]:
+    page = make_page()
+    document = ParseHtml().perform(page)
+    first_title = GetHtmlElementText("(//*[@class=\"post-title\"])[1]/a")
+    last_title = GetHtmlElementText("(//*[@class=\"post-title\"])[last()]/a")
+    first_post = GetHtmlElement("(//*[@class=\"post\"])[1]")
+    post_fields = GetHtmlElementsText({
+        "title": "(//*[@class=\"post-title\"])[1]/a",
+        "date": "(//*[@class=\"post-date\"])[1]",
+    })
+
+    return [
+        measure("html/parse", lambda: ParseHtml().perform(page)),
+        measure("html/element_text/string/first", lambda: first_title.perform(page)),
+        measure("html/element/string/first", lambda: first_post.perform(page)),
+        measure("html/element_text/document/first", lambda: first_title.perform(document)),
+        measure("html/element_text/document/last", lambda: last_title.perform(document)),
+        measure("html/element/document/first", lambda: first_post.perform(document)),
+        measure("html/elements_text/document", lambda: post_fields.perform(document)),
+    ]
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,82 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from typing import List
+
+from benchmarks.common import measure, print_results
+from benchmarks.html_extraction import make_page
+from pipeliner.http_session_pool import http_session_pool
+from pipeliner.steps import HttpDownload
+
+ETAG = "\"benchmark\""
+
+
+class _PageServer:
+    def __init__(self, page: bytes):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                # only "/cached" supports conditional requests so other downloads are always full
+                is_cached = self.path == "/cached"
+                if is_cached and self.headers.get("If-None-Match") == ETAG:
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if is_cached:
+                    self.send_header("ETag", ETAG)
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                try:
+                    self.wfile.write(page)
+                except ConnectionError:
+                    # downloads with until_xpath close the connection before reading the whole page
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    def url(self, path: str = "/") -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def __enter__(self) -> "_PageServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run() -> List[dict]:
+    small_page = make_page(10).encode("utf-8")
+    large_page = make_page().encode("utf-8")
+    # the element searched for is the last one on the page, the whole page is parsed incrementally
+    large_page_with_footer = large_page.replace(b"</body>", b"<footer class=\"footer\">End</footer><p></p></body>")
+    results = []
+    with _PageServer(small_page) as small_server, _PageServer(large_page) as large_server, \
+            _PageServer(large_page_with_footer) as footer_server:
+        small = HttpDownload(small_server.url(), {})
+        large = HttpDownload(large_server.url(), {})
+        large_unchanged = HttpDownload(large_server.url("/cached"), {})
+        large_unchanged.perform(None)
+        large_until_first = HttpDownload(large_server.url(), {}, until_xpath="(//*[@class=\"post-title\"])[1]")
+        large_until_last = HttpDownload(footer_server.url(), {}, until_xpath="(//*[@class=\"footer\"])[1]")
+
+        results.append(measure("http/download/small", lambda: small.perform(None), number=20))
+        results.append(measure("http/download/large", lambda: large.perform(None)))
+        results.append(measure("http/download/large/not_modified", lambda: large_unchanged.perform(None), number=20))
+        results.append(measure("http/download/large/until_xpath", lambda: large_until_first.perform(None), number=5))
+        results.append(measure("http/download/large/until_xpath/last", lambda: large_until_last.perform(None)))
+    http_session_pool.close()
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
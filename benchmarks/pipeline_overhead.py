@@ -0,0 +1,58 @@
+import copy
+import logging
+from typing import Any, List, Callable
+
+from benchmarks.common import measure, print_results
+from pipeliner import Pipeline
+from pipeliner.steps import DoNothing, Step
+
+STEPS_COUNT = 10
+
+
+class ProduceData(Step):
+    mutates_input = False
+
+    def __init__(self, data: Any):
+        self._data = data
+
+    def perform(self, data: Any) -> Any:
+        return self._data
+
+
+class DeepCopyingPipeline(Pipeline):
+    # input is copied before every attempt of every step, as it was before copying was made conditional
+    def _snapshot(self, step: Step, data: Any, is_retry_possible: bool) -> Any:
+        return copy.deepcopy(data)
+
+
+def make_payloads() -> dict:
+    html = "".join(f"<div class=\"post\"><h2 class=\"post-title\">Post {i}</h2><p>{'lorem ipsum ' * 20}</p></div>"
+                   for i in range(20000))
+    return {
+        "small str": "Hello test!",
+        "5 MB bytes": html.encode("utf-8")[:5 * 1024 * 1024],
+        "5 MB str": html[:5 * 1024 * 1024],
+        "parsed records": [{"title": f"Post {i}", "tags": ["a", "b"], "score": i} for i in range(20000)],
+    }
+
+
+def measure_per_step(name: str, pipeline_type: Callable[..., Pipeline], payload: Any) -> dict:
+    steps = [ProduceData(payload)] + [DoNothing() for _ in range(STEPS_COUNT)]
+    pipeline = pipeline_type("Benchmark", "* * * * *", steps)
+    result = measure(name, pipeline.run)
+    result["seconds"] /= len(steps)
+    return result
+
+
+def run() -> List[dict]:
+    results = []
+    for name, payload in make_payloads().items():
+        slug = name.replace(" ", "_")
+        results.append(measure_per_step(f"pipeline/{slug}/per_step", Pipeline, payload))
+        results.append(measure_per_step(f"pipeline/{slug}/per_step_deepcopy", DeepCopyingPipeline, payload))
+    return results
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    print_results(run())
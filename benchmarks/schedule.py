@@ -0,0 +1,61 @@
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks.common import measure, print_results
+from pipeliner.schedule import Schedule
+
+SCHEDULES_COUNT = 2000
+START = datetime(2024, 1, 1)
+
+
+def make_time_strings(count: int = SCHEDULES_COUNT, seed: int = 0) -> List[str]:
+    generator = random.Random(seed)
+
+    def field(low: int, high: int) -> str:
+        kind = generator.randrange(5)
+        if kind == 0:
+            return "*"
+        if kind == 1:
+            return str(generator.randint(low, high))
+        if kind == 2:
+            first = generator.randint(low, high)
+            return f"{first}-{generator.randint(first, high)}"
+        if kind == 3:
+            return f"*/{generator.randint(1, high // 2 or 1)}"
+        return ",".join(str(value) for value in sorted(generator.sample(range(low, high + 1), 3)))
+
+    # days of month are kept below 29 so every schedule runs in every month
+    return [
+        " ".join([field(0, 59), field(0, 23), field(1, 28), field(1, 12), field(0, 6)])
+        for _ in range(count)
+    ]
+
+
+def run() -> List[dict]:
+    time_strings = make_time_strings()
+    schedules = [Schedule(time_string) for time_string in time_strings]
+    times = [START + timedelta(minutes=17 * i) for i in range(100)]
+
+    def parse():
+        for time_string in time_strings:
+            Schedule(time_string)
+
+    def match():
+        for schedule in schedules:
+            for when in times:
+                schedule.should_run(when)
+
+    def next_run():
+        for schedule in schedules:
+            schedule.next_run(START)
+
+    return [
+        measure("schedule/parse", parse, repeat=3),
+        measure("schedule/should_run", match, repeat=3),
+        measure("schedule/next_run", next_run, repeat=3),
+    ]
+
+
+if __name__ == "__main__":
+    print_results(run())
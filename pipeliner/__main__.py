@@ -1,13 +1,26 @@
 import json
 import logging
 import logging.config
+import multiprocessing
 import os
+import sys
 import time
 from argparse import ArgumentParser, RawTextHelpFormatter, ArgumentTypeError
 from pathlib import Path
 from typing import List
 
-from pipeliner.pipeline_runner import PipelineRunner
+from pipeliner import history_cli
+from pipeliner.circuit_breaker import circuit_breakers
+from pipeliner.cluster import ClusterMember, make_cluster_member
+from pipeliner.config_reload import ConfigWatcher, PipelineSet
+from pipeliner.metrics import MetricsServer, metrics
+from pipeliner.pipeline_scheduler import PipelineScheduler
+from pipeliner.process_pool import PipelineProcessPool
+from pipeliner.profiler import PipelineProfiler, make_profiler
+from pipeliner.run_history import make_run_history, set_run_history, get_run_history
+from pipeliner.smtp_connection_pool import smtp_connection_pool, email_digest
+from pipeliner.state_store import make_state_store, set_state_store, get_state_store
+from pipeliner.triggers import WebhookServer, FileWatcher
 
 from pipeliner import StepsFactoryWithCustomSteps, PipelineFactory, Pipeline
 
@@ -15,11 +28,19 @@ logger = logging.getLogger(__name__)
 
 
 class Pipeliner:
-    runners: List[PipelineRunner]
-    pipelines: List[Pipeline]
+    RELOAD_CHECK_SECONDS = 10
+    DEFAULT_SHUTDOWN_TIMEOUT = 30.0
+    # changes of these fields are applied only after restart
+    RESTART_FIELDS = (
+        "custom_steps", "http", "state", "circuit_breaker", "process_workers", "max_workers", "metrics", "webhook",
+        "file_watch_interval", "history", "cluster"
+    )
+    scheduler: None or PipelineScheduler
+    cluster: None or ClusterMember
+    pipeline_set: None or PipelineSet
 
     def __init__(self):
-        self.load_logger_config()
+        self.log_config = self.load_logger_config()
         self.parser = ArgumentParser(
             description=r"""
     ____  _            ___                
@@ -35,79 +56,204 @@ Get rid of repetitive tasks. Make yourself happier.
         )
         self.parser.add_argument(
             "config",
-            type=self.load_config,
+            type=self.resolve_config_path,
             metavar="config",
             help="path to a config JSON file"
         )
+        self.parser.add_argument(
+            "--profile",
+            nargs="?",
+            const=PipelineProfiler.DEFAULT_OUTPUT_DIR,
+            metavar="dir",
+            help="profile steps of pipelines and save stats into given directory (default: profiles)"
+        )
+        self.parser.add_argument(
+            "--profile-sample-rate",
+            type=float,
+            default=1.0,
+            metavar="rate",
+            help="fraction of pipeline runs to profile (default: 1.0)"
+        )
+        self.parser.add_argument(
+            "--profile-top",
+            type=int,
+            default=PipelineProfiler.DEFAULT_TOP,
+            metavar="count",
+            help="number of functions in profile summaries (default: 20)"
+        )
         args = self.parser.parse_args()
-        self.config = args.config
+        self.config_path = args.config
+        try:
+            self.config = self.load_config(self.config_path)
+        except Exception as e:
+            self.parser.error(f"Could not parse config {self.config_path} because {e}")
+        self.config_watcher = ConfigWatcher(self.config_path)
+        profile_config = None
+        if args.profile is not None:
+            profile_config = {
+                "output_dir": args.profile,
+                "sample_rate": args.profile_sample_rate,
+                "top": args.profile_top
+            }
+
+        if "http" in self.config:
+            # requests is imported only when some step or config needs it
+            from pipeliner.http_session_pool import http_session_pool
+            http_session_pool.configure(**self.config["http"])
+        circuit_breakers.configure(**self.config.get("circuit_breaker", {}))
+        set_state_store(make_state_store(self.config.get("state", {})))
+        set_run_history(make_run_history(self.config.get("history")))
 
         custom_steps_path = Path(self.config.get("custom_steps", "")).resolve()
         self.steps_factory = StepsFactoryWithCustomSteps(custom_steps_path)
-        self.pipeline_factory = PipelineFactory(self.steps_factory)
-        self.pipelines = []
-        self.runners = []
+        shared_config = {
+            key: self.config[key] for key in ("http", "state", "circuit_breaker", "history") if key in self.config
+        }
+        shared_config["profile"] = profile_config
+        self.process_pool = PipelineProcessPool(
+            custom_steps_path,
+            shared_config,
+            self.config.get("process_workers"),
+            self.log_config
+        )
+        self.pipeline_factory = PipelineFactory(self.steps_factory, self.process_pool, make_profiler(profile_config))
+        self.scheduler = None
+        self.cluster = None
+        self.pipeline_set = None
+        self.metrics_server = None
+        self.webhook_server = None
+        self.file_watcher = None
+        self.abandoned_runs = False
 
     @staticmethod
-    def load_logger_config():
+    def load_logger_config() -> dict:
         log_config_path = str(Path(__file__).resolve().parent / "log_config.json")
         with open(log_config_path, "r") as log_config_file:
             log_config = json.load(log_config_file)
             logging.config.dictConfig(log_config)
+            return log_config
 
     @staticmethod
-    def load_config(path: str) -> dict:
-        try:
-            path = Path(path).resolve()
-            if path.suffix.lower() != ".json":
-                raise ArgumentTypeError(f"Given config path {path} is not a valid JSON file")
+    def resolve_config_path(path: str) -> Path:
+        resolved_path = Path(path).resolve()
+        if resolved_path.suffix.lower() != ".json":
+            raise ArgumentTypeError(f"Given config path {resolved_path} is not a valid JSON file")
 
-            if not path.is_file():
-                cwd = Path(os.getcwd()).resolve()
-                path = cwd / path
+        if not resolved_path.is_file():
+            cwd = Path(os.getcwd()).resolve()
+            resolved_path = cwd / resolved_path
 
-            if path.is_file():
-                with open(str(path), encoding="utf8", mode="r") as config_file:
-                    return json.load(config_file)
+        if not resolved_path.is_file():
+            raise ArgumentTypeError(f"{resolved_path} is not a valid file")
+        return resolved_path
 
-            raise FileNotFoundError(f"{path} is not a valid file")
+    @staticmethod
+    def load_config(path: Path) -> dict:
+        with open(str(path), encoding="utf8", mode="r") as config_file:
+            return json.load(config_file)
 
-        except Exception as e:
-            raise ArgumentTypeError(f"Could not parse config {path} because {e}")
+    @property
+    def pipelines(self) -> List[Pipeline]:
+        return self.pipeline_set.pipelines if self.pipeline_set is not None else []
 
     def run(self):
-        self.pipelines = [
-            self.pipeline_factory.create(pipeline_config)
-            for pipeline_config in self.config.get("pipelines", [])
-        ]
+        if "cluster" in self.config:
+            self.cluster = make_cluster_member(self.config["cluster"])
+        self.scheduler = PipelineScheduler(
+            self.config.get("max_workers", PipelineScheduler.DEFAULT_MAX_WORKERS),
+            self.cluster
+        )
+        self.pipeline_set = PipelineSet(self.pipeline_factory, self.scheduler)
+        # an invalid pipeline stops Pipeliner before anything is started, like any other config error
+        self.pipeline_set.apply(self.config.get("pipelines", []), strict=True)
+
+        if "metrics" in self.config:
+            self.metrics_server = MetricsServer(metrics, **self.config["metrics"])
+            self.metrics_server.start()
+        if self.cluster is not None:
+            self.cluster.start()
         if not self.pipelines:
             logger.warning("No pipelines were found. Add a pipeline into configuration to run Pipeliner.")
         else:
-            logger.info(f"Found {len(self.pipelines)} pipelines. Creating and starting runners...")
+            logger.info(f"Found {len(self.pipelines)} pipelines. Starting scheduler...")
+        self.scheduler.start()
 
-        self.runners = [
-            PipelineRunner(pipeline)
-            for pipeline in self.pipelines
-        ]
-        for runner in self.runners:
-            runner.start()
+        if "webhook" in self.config:
+            self.webhook_server = WebhookServer(self.pipeline_set, self.scheduler, **self.config["webhook"])
+            self.webhook_server.start()
+        self.file_watcher = FileWatcher(
+            self.pipeline_set,
+            self.scheduler,
+            self.config.get("file_watch_interval", FileWatcher.DEFAULT_INTERVAL)
+        )
+        self.file_watcher.start()
 
         try:
             logger.info("Running!")
             while True:
-                time.sleep(10)
+                time.sleep(self.RELOAD_CHECK_SECONDS)
+                if self.config.get("reload_config", True) and self.config_watcher.changed():
+                    self.reload_config()
         except (KeyboardInterrupt, SystemExit):
             pass
-        logger.info("Stopping runners.")
+        logger.info("Stopping scheduler.")
         self.stop()
         logger.info("I hope I helped you. Have a nice day! :)")
 
+    def reload_config(self):
+        logger.info(f"Configuration {self.config_path} was changed. Reloading pipelines...")
+        try:
+            config = self.load_config(self.config_path)
+        except Exception as e:
+            logger.error(f"Could not reload config {self.config_path} because {e}. Keeping current pipelines.")
+            return
+
+        changed_fields = [field for field in self.RESTART_FIELDS if config.get(field) != self.config.get(field)]
+        if changed_fields:
+            logger.warning(f"Changes of {', '.join(changed_fields)} will be applied after restart.")
+            for field in changed_fields:
+                if field in self.config:
+                    config[field] = self.config[field]
+                else:
+                    del config[field]
+        self.config = config
+        self.pipeline_set.apply(self.config.get("pipelines", []))
+
     def stop(self):
-        for runner in self.runners:
-            runner.stop()
-        self.runners = []
+        if self.webhook_server is not None:
+            self.webhook_server.stop()
+        self.webhook_server = None
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        self.file_watcher = None
+        if self.scheduler is not None:
+            # runs still in progress get shutdown_timeout seconds to finish, then they are cancelled and abandoned
+            shutdown_timeout = self.config.get("shutdown_timeout", self.DEFAULT_SHUTDOWN_TIMEOUT)
+            self.abandoned_runs = not self.scheduler.stop(shutdown_timeout)
+        self.scheduler = None
+        if self.cluster is not None:
+            self.cluster.stop()
+        self.cluster = None
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.metrics_server = None
+        self.process_pool.shutdown(wait=not self.abandoned_runs)
+        if "pipeliner.http_session_pool" in sys.modules:
+            sys.modules["pipeliner.http_session_pool"].http_session_pool.close()
+        email_digest.flush()
+        smtp_connection_pool.close()
+        get_state_store().close()
+        get_run_history().close()
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ["history"]:
+        sys.exit(history_cli.main(sys.argv[2:]))
     pipeliner = Pipeliner()
     pipeliner.run()
+    if pipeliner.abandoned_runs:
+        # threads and worker processes of abandoned runs would keep the interpreter from exiting
+        for process in multiprocessing.active_children():
+            process.terminate()
+        logging.shutdown()
+        os._exit(1)
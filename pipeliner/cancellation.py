@@ -0,0 +1,85 @@
+import contextvars
+from concurrent.futures import Future, wait
+from contextvars import ContextVar
+from threading import Event, Lock, Thread
+from typing import Any, Callable, List, Optional
+
+
+class Cancelled(Exception):
+    pass
+
+
+class StepTimeout(Cancelled, TimeoutError):
+    pass
+
+
+class CancellationToken:
+    _children: List["CancellationToken"]
+
+    def __init__(self):
+        self._event = Event()
+        self._lock = Lock()
+        self._reason = None
+        self._children = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self._reason
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._reason = reason
+            self._event.set()
+            children, self._children = self._children, []
+        for child in children:
+            child.cancel(reason)
+
+    def child(self) -> "CancellationToken":
+        # cancelling a token cancels also all tokens made from it, not the other way round
+        child = CancellationToken()
+        with self._lock:
+            if not self._event.is_set():
+                self._children.append(child)
+                return child
+        child.cancel(self._reason)
+        return child
+
+    def detach(self, child: "CancellationToken") -> None:
+        with self._lock:
+            if child in self._children:
+                self._children.remove(child)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self._reason)
+
+
+# token of the pipeline run in progress, set by the scheduler
+current_cancellation: ContextVar[Optional[CancellationToken]] = ContextVar("current_cancellation", default=None)
+
+
+def call_with_timeout(function: Callable[[], Any], timeout: float, token: CancellationToken, name: str) -> Any:
+    # Python threads cannot be killed, so a call which has not finished in time is cancelled and left behind
+    future = Future()
+    context = contextvars.copy_context()
+
+    def call() -> None:
+        try:
+            future.set_result(context.run(function))
+        except BaseException as e:
+            future.set_exception(e)
+
+    Thread(target=call, name=name, daemon=True).start()
+    if not wait([future], timeout).done:
+        token.cancel(f"{name} has not finished in {timeout} seconds")
+        raise StepTimeout(token.reason)
+    return future.result()
@@ -0,0 +1,111 @@
+import logging
+import time
+from threading import Lock
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_attempts: int):
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_attempts = half_open_attempts
+        self._lock = Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probed_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._reset_timeout:
+                logger.info(f"Circuit of {self._name} is half-open, probing")
+                self._state = self.HALF_OPEN
+                self._probes = 0
+            if self._state == self.HALF_OPEN and time.monotonic() - self._probed_at >= self._reset_timeout:
+                # probes whose outcome never came (e.g. abandoned calls) do not keep the circuit half-open forever
+                self._probes = 0
+
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self._half_open_attempts:
+                self._probes += 1
+                self._probed_at = time.monotonic()
+                return True
+            return False
+
+    def release(self) -> None:
+        # an attempt which was cancelled tells nothing about the host, its probe can be used by another one
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit of {self._name} is closed again")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit of {self._name} is open for {self._reset_timeout} seconds")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    DEFAULT_FAILURE_THRESHOLD = 5
+    DEFAULT_RESET_TIMEOUT = 60.0
+    DEFAULT_HALF_OPEN_ATTEMPTS = 1
+    _breakers: Dict[str, CircuitBreaker]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._breakers = {}
+        self.configure()
+
+    def configure(self,
+                  failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                  reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+                  half_open_attempts: int = DEFAULT_HALF_OPEN_ATTEMPTS) -> None:
+        with self._lock:
+            self._failure_threshold = failure_threshold
+            self._reset_timeout = reset_timeout
+            self._half_open_attempts = half_open_attempts
+            self._breakers = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self._failure_threshold, self._reset_timeout, self._half_open_attempts)
+                self._breakers[name] = breaker
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.state for name, breaker in breakers.items()}
+
+
+circuit_breakers = CircuitBreakerRegistry()
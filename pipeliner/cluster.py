@@ -0,0 +1,214 @@
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from threading import Thread, Event, Lock
+from typing import List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseStore(ABC):
+    @abstractmethod
+    def heartbeat(self, instance_id: str, ttl: float) -> List[str]:
+        # registers the instance, renews its leases and returns all live instances
+        pass
+
+    @abstractmethod
+    def acquire(self, name: str, instance_id: str, ttl: float) -> bool:
+        pass
+
+    @abstractmethod
+    def release(self, names: List[str], instance_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def leave(self, instance_id: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteLeaseStore(LeaseStore):
+    DEFAULT_TIMEOUT = 5.0
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT):
+        self._lock = Lock()
+        self._connection = sqlite3.connect(str(path), timeout=timeout, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS instances (id TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def heartbeat(self, instance_id: str, ttl: float) -> List[str]:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO instances (id, expires) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET expires = excluded.expires",
+                (instance_id, now + ttl)
+            )
+            self._connection.execute("UPDATE leases SET expires = ? WHERE owner = ?", (now + ttl, instance_id))
+            self._connection.execute("DELETE FROM instances WHERE expires < ?", (now,))
+            return [row[0] for row in self._connection.execute("SELECT id FROM instances ORDER BY id")]
+
+    def acquire(self, name: str, instance_id: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock, self._connection:
+            # a lease can be taken over only when its owner has not renewed it in time
+            cursor = self._connection.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (name, instance_id, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, names: List[str], instance_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM leases WHERE name = ? AND owner = ?", [(name, instance_id) for name in names]
+            )
+
+    def leave(self, instance_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM leases WHERE owner = ?", (instance_id,))
+            self._connection.execute("DELETE FROM instances WHERE id = ?", (instance_id,))
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class HashRing:
+    DEFAULT_REPLICAS = 64
+    _ring: List[Tuple[int, str]]
+
+    def __init__(self, nodes: List[str], replicas: int = DEFAULT_REPLICAS):
+        self._nodes = sorted(set(nodes))
+        # every node has many points on the ring, so keys spread evenly and only keys of a changed node move
+        self._ring = sorted((_hash(f"{node}#{replica}"), node) for node in self._nodes for replica in range(replicas))
+        self._points = [point for point, _ in self._ring]
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+
+class ClusterMember(Thread):
+    DEFAULT_LEASE_SECONDS = 30.0
+    _held: Set[str]
+
+    def __init__(self,
+                 lease_store: LeaseStore,
+                 instance_id: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 replicas: int = HashRing.DEFAULT_REPLICAS):
+        super().__init__(name="ClusterMember", daemon=True)
+        self._lease_store = lease_store
+        self._instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._lease_seconds = lease_seconds
+        self._replicas = replicas
+        self._lock = Lock()
+        self._stopped = Event()
+        self._ring = HashRing([self._instance_id], replicas)
+        self._held = set()
+
+    @property
+    def instance_id(self) -> str:
+        return self._instance_id
+
+    @property
+    def instances(self) -> List[str]:
+        with self._lock:
+            return self._ring.nodes
+
+    def start(self) -> None:
+        self.heartbeat()
+        logger.info(f"Joined cluster as {self._instance_id}")
+        super().start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+        # pipelines of a stopped instance are taken over right away instead of after their leases expire
+        try:
+            self._lease_store.leave(self._instance_id)
+        except Exception as e:
+            logger.error(f"Could not leave cluster because {e}")
+        self._lease_store.close()
+
+    def run(self) -> None:
+        # leases are renewed several times before they expire, so one slow heartbeat does not lose them
+        while not self._stopped.wait(self._lease_seconds / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Could not renew cluster membership because {e}")
+
+    def heartbeat(self) -> None:
+        instances = self._lease_store.heartbeat(self._instance_id, self._lease_seconds)
+        ring = HashRing(instances + [self._instance_id], self._replicas)
+        with self._lock:
+            if ring.nodes != self._ring.nodes:
+                logger.info(f"Cluster has {len(ring.nodes)} instances: {', '.join(ring.nodes)}")
+            self._ring = ring
+            moved = [name for name in self._held if ring.owner(name) != self._instance_id]
+            self._held.difference_update(moved)
+        if moved:
+            logger.info(f"Handing over pipelines {', '.join(sorted(moved))} to other instances")
+            self._lease_store.release(moved, self._instance_id)
+
+    def should_run(self, pipeline_name: str) -> bool:
+        return self.owns(pipeline_name) and self.acquire(pipeline_name)
+
+    def owns(self, pipeline_name: str) -> bool:
+        with self._lock:
+            return self._ring.owner(pipeline_name) == self._instance_id
+
+    def acquire(self, pipeline_name: str) -> bool:
+        try:
+            acquired = self._lease_store.acquire(pipeline_name, self._instance_id, self._lease_seconds)
+        except Exception as e:
+            # not running is safer than running a pipeline twice
+            logger.error(f"Could not lease pipeline \"{pipeline_name}\" because {e}")
+            return False
+        if not acquired:
+            logger.info(f"Pipeline \"{pipeline_name}\" is still leased by another instance")
+            return False
+        with self._lock:
+            self._held.add(pipeline_name)
+        return True
+
+
+_LEASE_STORE_BACKENDS = {
+    "sqlite": SqliteLeaseStore,
+}
+
+
+def make_lease_store(store_config: dict) -> LeaseStore:
+    params = dict(store_config)
+    backend = params.pop("backend", "sqlite")
+    if backend not in _LEASE_STORE_BACKENDS:
+        raise ValueError(f"Unknown lease store backend: {backend}")
+    return _LEASE_STORE_BACKENDS[backend](**params)
+
+
+def make_cluster_member(cluster_config: dict) -> ClusterMember:
+    params = dict(cluster_config)
+    return ClusterMember(make_lease_store(params.pop("store")), **params)
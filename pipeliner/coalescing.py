@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import Future
+from contextvars import ContextVar
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# scheduled time of the run in the current thread, None for triggered runs
+current_tick: ContextVar[Optional[datetime]] = ContextVar("current_tick", default=None)
+
+
+def config_hash(config: Any) -> str:
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    _calls: Dict[Hashable, Future]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        # callers asking for the same key while the first call is in progress wait for its result
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+
+        if is_leader:
+            try:
+                future.set_result(function())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+        return future.result()
+
+
+class SharedPrefixes:
+    _users: Dict[str, Set[str]]
+    _registered: Dict[str, List[str]]
+    _results: Dict[str, Tuple[datetime, Future, int]]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._users = {}
+        self._registered = {}
+        self._results = {}
+
+    def register(self, pipeline_name: str, prefix_hashes: List[str]) -> None:
+        with self._lock:
+            self._unregister(pipeline_name)
+            self._registered[pipeline_name] = prefix_hashes
+            for prefix_hash in prefix_hashes:
+                self._users.setdefault(prefix_hash, set()).add(pipeline_name)
+
+    def unregister(self, pipeline_name: str) -> None:
+        with self._lock:
+            self._unregister(pipeline_name)
+
+    def shared_length(self, prefix_hashes: List[str]) -> int:
+        with self._lock:
+            return self._shared_length(prefix_hashes)
+
+    def run(self, prefix_hash: str, tick: datetime, compute: Callable[[], Any]) -> Any:
+        # the first pipeline of the tick computes the prefix, the others get its result (or exception)
+        with self._lock:
+            result = self._results.get(prefix_hash)
+            if result is not None and result[0] > tick:
+                is_leader, future = None, None
+            elif result is not None and result[0] == tick:
+                is_leader, future = False, result[1]
+                self._consume(prefix_hash)
+            else:
+                is_leader, future = True, Future()
+                self._results[prefix_hash] = (tick, future, self._consumers(prefix_hash))
+                self._consume(prefix_hash)
+
+        if is_leader is None:
+            # a late run of an older tick does not replace the newer result
+            return compute()
+        if is_leader:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+        else:
+            logger.debug(f"Using shared result of steps {prefix_hash[:12]} from tick {tick}")
+        return future.result()
+
+    def _consume(self, prefix_hash: str) -> None:
+        # the result is dropped once every pipeline using the prefix has taken it, otherwise on the next tick
+        tick, future, remaining = self._results[prefix_hash]
+        if remaining <= 1:
+            del self._results[prefix_hash]
+        else:
+            self._results[prefix_hash] = (tick, future, remaining - 1)
+
+    def _shared_length(self, prefix_hashes: List[str]) -> int:
+        for length in range(len(prefix_hashes), 0, -1):
+            if len(self._users.get(prefix_hashes[length - 1], ())) > 1:
+                return length
+        return 0
+
+    def _consumers(self, prefix_hash: str) -> int:
+        # pipelines sharing a longer prefix with some others do not ask for this one
+        consumers = 0
+        for name in self._users.get(prefix_hash, ()):
+            prefix_hashes = self._registered[name]
+            length = self._shared_length(prefix_hashes)
+            if length and prefix_hashes[length - 1] == prefix_hash:
+                consumers += 1
+        return consumers
+
+    def _unregister(self, pipeline_name: str) -> None:
+        for prefix_hash in self._registered.pop(pipeline_name, []):
+            users = self._users.get(prefix_hash)
+            if users is not None:
+                users.discard(pipeline_name)
+                if not users:
+                    del self._users[prefix_hash]
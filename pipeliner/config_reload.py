@@ -0,0 +1,116 @@
+import logging
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from pipeliner import Pipeline, PipelineFactory
+from pipeliner.coalescing import config_hash
+from pipeliner.pipeline_scheduler import PipelineScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigWatcher:
+    def __init__(self, path: Path):
+        self._path = path
+        self._signature = self._read_signature()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def changed(self) -> bool:
+        signature = self._read_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return signature is not None
+
+    def _read_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(str(self._path))
+        except OSError:
+            # the file may be missing for a moment while an editor replaces it
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+class PipelineSet:
+    _pipelines: Dict[str, Pipeline]
+    _configs: Dict[str, dict]
+    _hashes: Dict[str, str]
+
+    def __init__(self, pipeline_factory: PipelineFactory, scheduler: PipelineScheduler):
+        self._pipeline_factory = pipeline_factory
+        self._scheduler = scheduler
+        # pipelines are looked up by triggers from other threads while the set is being changed
+        self._lock = Lock()
+        self._pipelines = {}
+        self._configs = {}
+        self._hashes = {}
+
+    @property
+    def pipelines(self) -> List[Pipeline]:
+        with self._lock:
+            return list(self._pipelines.values())
+
+    def get(self, name: str) -> Optional[Pipeline]:
+        with self._lock:
+            return self._pipelines.get(name)
+
+    def triggers(self, trigger_type: str) -> List[Tuple[str, dict]]:
+        with self._lock:
+            return [
+                (name, trigger)
+                for name, pipeline_config in self._configs.items()
+                for trigger in pipeline_config.get("triggers", [])
+                if trigger.get("type") == trigger_type
+            ]
+
+    def apply(self, pipeline_configs: List[dict], strict: bool = False) -> None:
+        # a strict apply (at start) fails on an invalid pipeline, a reload keeps the previous version instead
+        configs = {}
+        for pipeline_config in pipeline_configs:
+            name = pipeline_config["name"]
+            if name in configs:
+                logger.error(f"Pipeline \"{name}\" is defined more than once. Using the first definition.")
+                continue
+            configs[name] = pipeline_config
+
+        for name in list(self._pipelines):
+            if name not in configs:
+                logger.info(f"Pipeline \"{name}\" was removed from configuration. Stopping it.")
+                with self._lock:
+                    pipeline = self._pipelines.pop(name)
+                    del self._configs[name]
+                    del self._hashes[name]
+                self._scheduler.remove(pipeline)
+                self._pipeline_factory.release(name)
+
+        for name, pipeline_config in configs.items():
+            new_hash = config_hash(pipeline_config)
+            if self._hashes.get(name) == new_hash:
+                continue
+            try:
+                pipeline = self._pipeline_factory.create(pipeline_config)
+            except Exception as e:
+                if strict:
+                    raise
+                if name in self._pipelines:
+                    logger.error(f"Could not create pipeline \"{name}\" because {e}. Keeping its previous version.")
+                else:
+                    logger.error(f"Could not create pipeline \"{name}\" because {e}. Skipping it.")
+                continue
+
+            old_pipeline = self._pipelines.get(name)
+            if old_pipeline is None:
+                logger.info(f"Starting new pipeline \"{name}\".")
+                self._scheduler.add(pipeline)
+            else:
+                logger.info(f"Pipeline \"{name}\" was changed. Restarting it.")
+                self._scheduler.replace(old_pipeline, pipeline)
+            with self._lock:
+                self._pipelines[name] = pipeline
+                self._configs[name] = pipeline_config
+                self._hashes[name] = new_hash
@@ -0,0 +1,130 @@
+import json
+import math
+import sqlite3
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    # nearest-rank percentile of sorted values
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def pipeline_stats(connection: sqlite3.Connection, since: float, pipeline: Optional[str] = None) -> List[dict]:
+    runs = defaultdict(list)
+    for name, duration, outcome in connection.execute(
+            "SELECT pipeline, duration, outcome FROM runs WHERE started >= ? AND (? IS NULL OR pipeline = ?) "
+            "ORDER BY duration", (since, pipeline, pipeline)):
+        runs[name].append((duration, outcome))
+
+    stats = []
+    for name, pipeline_runs in sorted(runs.items()):
+        durations = [duration for duration, _ in pipeline_runs]
+        failures = sum(1 for _, outcome in pipeline_runs if outcome == "failure")
+        stats.append({
+            "pipeline": name,
+            "runs": len(pipeline_runs),
+            "failure_rate": failures / len(pipeline_runs),
+            "p50": percentile(durations, 0.5),
+            "p95": percentile(durations, 0.95),
+            "p99": percentile(durations, 0.99),
+            "max": durations[-1],
+        })
+    return stats
+
+
+def slowest_steps(connection: sqlite3.Connection,
+                  since: float,
+                  pipeline: Optional[str] = None,
+                  limit: int = 10) -> List[dict]:
+    steps: Dict[Tuple[str, str], List[Tuple[float, int, str]]] = defaultdict(list)
+    for name, step, duration, attempts, outcome in connection.execute(
+            "SELECT runs.pipeline, steps.step, steps.duration, steps.attempts, steps.outcome "
+            "FROM steps JOIN runs ON runs.id = steps.run_id "
+            "WHERE runs.started >= ? AND (? IS NULL OR runs.pipeline = ?) ORDER BY steps.duration",
+            (since, pipeline, pipeline)):
+        steps[(name, step)].append((duration, attempts, outcome))
+
+    stats = []
+    for (name, step), step_runs in steps.items():
+        durations = [duration for duration, _, _ in step_runs]
+        stats.append({
+            "pipeline": name,
+            "step": step,
+            "runs": len(step_runs),
+            "mean": sum(durations) / len(durations),
+            "p95": percentile(durations, 0.95),
+            "max": durations[-1],
+            "retries": sum(attempts for _, attempts, _ in step_runs) - len(step_runs),
+            "failure_rate": sum(1 for _, _, outcome in step_runs if outcome == "failure") / len(step_runs),
+        })
+    stats.sort(key=lambda step_stats: step_stats["p95"], reverse=True)
+    return stats[:limit]
+
+
+def print_pipeline_stats(stats: List[dict]) -> None:
+    print(f"{'pipeline':<32}{'runs':>8}{'failed':>9}{'p50':>12}{'p95':>12}{'p99':>12}{'max':>12}")
+    for row in stats:
+        print(
+            f"{row['pipeline']:<32}{row['runs']:>8}{row['failure_rate']:>9.1%}{format_seconds(row['p50']):>12}"
+            f"{format_seconds(row['p95']):>12}{format_seconds(row['p99']):>12}{format_seconds(row['max']):>12}"
+        )
+
+
+def print_step_stats(stats: List[dict]) -> None:
+    print(f"{'pipeline':<32}{'step':<32}{'runs':>8}{'mean':>12}{'p95':>12}{'max':>12}{'retries':>9}{'failed':>9}")
+    for row in stats:
+        print(
+            f"{row['pipeline']:<32}{row['step']:<32}{row['runs']:>8}{format_seconds(row['mean']):>12}"
+            f"{format_seconds(row['p95']):>12}{format_seconds(row['max']):>12}{row['retries']:>9}"
+            f"{row['failure_rate']:>9.1%}"
+        )
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def _history_path(source: Path) -> Path:
+    # the history database can be given directly or by the config which defines it
+    if source.suffix.lower() != ".json":
+        return source
+    with open(str(source), encoding="utf8", mode="r") as config_file:
+        history_config = json.load(config_file).get("history")
+    if not history_config:
+        raise ValueError(f"{source} does not configure run history")
+    return Path(history_config["path"])
+
+
+def main(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="python -m pipeliner history", description="Show statistics of past pipeline runs")
+    parser.add_argument("source", type=Path, help="run history database or config JSON file defining it")
+    parser.add_argument("-p", "--pipeline", help="show only this pipeline")
+    parser.add_argument("-d", "--days", type=float, help="show only runs of last days (default: all kept runs)")
+    parser.add_argument("-s", "--steps", type=int, nargs="?", const=10, metavar="count",
+                        help="show slowest steps by 95th percentile instead of pipelines (default count: 10)")
+    args = parser.parse_args(argv)
+
+    try:
+        path = _history_path(args.source)
+    except Exception as e:
+        parser.error(f"Could not read config {args.source} because {e}")
+    if not path.is_file():
+        parser.error(f"Run history {path} does not exist")
+
+    since = time.time() - args.days * 24 * 3600 if args.days is not None else 0
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if args.steps is not None:
+            print_step_stats(slowest_steps(connection, since, args.pipeline, args.steps))
+        else:
+            print_pipeline_stats(pipeline_stats(connection, since, args.pipeline))
+    finally:
+        connection.close()
+    return 0
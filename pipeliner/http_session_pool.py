@@ -0,0 +1,111 @@
+import logging
+from threading import Lock
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class HttpSessionPool:
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_TIMEOUT = 30.0
+    DEFAULT_RETRIES = 2
+    _sessions: Dict[str, requests.Session]
+    _requests_count: Dict[str, int]
+
+    def __init__(self,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES):
+        self._lock = Lock()
+        self._sessions = {}
+        self._requests_count = {}
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._retries = retries
+
+    def configure(self,
+                  pool_size: int = DEFAULT_POOL_SIZE,
+                  timeout: float = DEFAULT_TIMEOUT,
+                  retries: int = DEFAULT_RETRIES) -> None:
+        self.close()
+        with self._lock:
+            self._pool_size = pool_size
+            self._timeout = timeout
+            self._retries = retries
+
+    def session(self, url: str) -> requests.Session:
+        host = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                logger.debug(f"Creating HTTP session for {host}")
+                session = self._create_session()
+                self._sessions[host] = session
+                self._requests_count[host] = 0
+            self._requests_count[host] += 1
+            return session
+
+    def get(self, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.session(url).get(url, timeout=timeout or self._timeout, **kwargs)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                host: self._session_stats(session, self._requests_count[host])
+                for host, session in self._sessions.items()
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+            self._requests_count = {}
+
+    def _create_session(self) -> requests.Session:
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self._pool_size,
+            pool_block=True,
+            max_retries=Retry(
+                total=self._retries,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False
+            )
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def _session_stats(session: requests.Session, requests_count: int) -> dict:
+        connections = 0
+        sent_requests = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    sent_requests += pool.num_requests
+        return {
+            "requests": requests_count,
+            "connections": connections,
+            "reused_connections": max(sent_requests - connections, 0),
+            "reuse_rate": (sent_requests - connections) / sent_requests if sent_requests else 0.0,
+        }
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+http_session_pool = HttpSessionPool()
@@ -0,0 +1,270 @@
+import bisect
+import logging
+import math
+from abc import ABC, abstractmethod
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread
+from typing import List, Dict, Tuple, Sequence, Optional
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric(ABC):
+    TYPE: str
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self._name = name
+        self._help_text = help_text
+        self._label_names = tuple(label_names)
+        self._lock = Lock()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[label_name]) for label_name in self._label_names)
+
+    def _format_labels(self, key: LabelValues, **extra: str) -> str:
+        pairs = list(zip(self._label_names, key)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f"{name}=\"{_escape(value)}\"" for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self._name} {self._help_text}", f"# TYPE {self._name} {self.TYPE}"]
+        return lines + self._render_samples()
+
+    @abstractmethod
+    def _render_samples(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> List[dict]:
+        pass
+
+
+class Counter(Metric):
+    TYPE = "counter"
+    _values: Dict[LabelValues, float]
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            {"labels": dict(zip(self._label_names, key)), "value": value}
+            for key, value in values.items()
+        ]
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self._name}{self._format_labels(key)} {_format_number(value)}" for key, value in values.items()]
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    _counts: Dict[LabelValues, List[int]]
+    _sums: Dict[LabelValues, float]
+
+    def __init__(self,
+                 name: str,
+                 help_text: str,
+                 label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self._buckets = tuple(sorted(buckets))
+        self._counts = {}
+        self._sums = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = [0] * (len(self._buckets) + 1)
+                self._counts[key] = counts
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def snapshot(self) -> List[dict]:
+        return [
+            {
+                "labels": dict(zip(self._label_names, key)),
+                "count": cumulative[-1][1],
+                "sum": total,
+                "buckets": dict(cumulative),
+            }
+            for key, cumulative, total in self._cumulative()
+        ]
+
+    def _cumulative(self) -> List[Tuple[LabelValues, List[Tuple[float, int]], float]]:
+        with self._lock:
+            counts = {key: list(value) for key, value in self._counts.items()}
+            sums = dict(self._sums)
+
+        result = []
+        for key, bucket_counts in counts.items():
+            cumulative = []
+            total_count = 0
+            for bound, count in zip(self._buckets + (math.inf,), bucket_counts):
+                total_count += count
+                cumulative.append((bound, total_count))
+            result.append((key, cumulative, sums[key]))
+        return result
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for key, cumulative, total in self._cumulative():
+            for bound, count in cumulative:
+                labels = self._format_labels(key, le=_format_number(bound))
+                lines.append(f"{self._name}_bucket{labels} {count}")
+            lines.append(f"{self._name}_sum{self._format_labels(key)} {_format_number(total)}")
+            lines.append(f"{self._name}_count{self._format_labels(key)} {cumulative[-1][1]}")
+        return lines
+
+
+class MetricsRegistry:
+    _metrics: Dict[str, Metric]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._metrics = {}
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self,
+                  name: str,
+                  help_text: str,
+                  label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        logger.info(f"Serving metrics on port {self.port}")
+        self._thread = Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+metrics = MetricsRegistry()
+
+PIPELINE_RUNS = metrics.counter(
+    "pipeliner_pipeline_runs_total", "Finished pipeline runs", ["pipeline", "outcome"]
+)
+PIPELINE_DURATION = metrics.histogram(
+    "pipeliner_pipeline_duration_seconds", "Duration of pipeline runs", ["pipeline", "outcome"]
+)
+STEP_DURATION = metrics.histogram(
+    "pipeliner_step_duration_seconds", "Duration of step attempts", ["pipeline", "step", "outcome"]
+)
+STEP_RETRIES = metrics.counter(
+    "pipeliner_step_retries_total", "Retried step attempts", ["pipeline", "step"]
+)
+STEP_FAILURES = metrics.counter(
+    "pipeliner_step_failures_total", "Steps which failed after all attempts", ["pipeline", "step"]
+)
+STEP_PAYLOAD_SIZE = metrics.histogram(
+    "pipeliner_step_payload_bytes", "Size of str or bytes data produced by steps", ["pipeline", "step"],
+    buckets=(100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+)
+SCHEDULE_LAG = metrics.histogram(
+    "pipeliner_schedule_lag_seconds", "Delay between due time and actual start of pipeline runs", ["pipeline"]
+)
+WORKERS_BUSY = metrics.gauge(
+    "pipeliner_workers_busy", "Worker threads running a pipeline"
+)
+WORKERS_MAX = metrics.gauge(
+    "pipeliner_workers_max", "Size of the worker thread pool"
+)
+PIPELINES_QUEUED = metrics.gauge(
+    "pipeliner_pipelines_queued", "Due pipelines waiting for a free worker"
+)
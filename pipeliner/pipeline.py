@@ -1,56 +1,272 @@
 import copy
 import logging
-from typing import List, Any
+import time
+from contextlib import nullcontext
+from threading import Thread
+from types import GeneratorType
+from typing import List, Any, Optional, ContextManager, Dict
 
-from pipeliner.schedule import Schedule
-from pipeliner.steps.step import Step
+from pipeliner.cancellation import CancellationToken, current_cancellation
+from pipeliner.coalescing import SharedPrefixes, current_tick
+from pipeliner.metrics import PIPELINE_RUNS, PIPELINE_DURATION, STEP_DURATION, STEP_RETRIES, STEP_FAILURES, \
+    STEP_PAYLOAD_SIZE
+from pipeliner.profiler import PipelineProfiler, RunProfile
+from pipeliner.retry_policy import RetryPolicy
+from pipeliner.run_history import StepRecord, RunRecord, get_run_history
+from pipeliner.schedule import BaseSchedule, make_schedule
+from pipeliner.stream import ItemQueue, StreamCancelled
+from pipeliner.steps.step import Step, SkipRemainingSteps, StepAttempts, is_immutable, perform_step, snapshot_input
 
 logger = logging.getLogger(__name__)
 
 
 class Pipeline:
     STEP_REPEAT_TRY_COUNT = 3
+    DEFAULT_QUEUE_SIZE = 16
+    # an aggregating step consumes the stream, so it cannot be retried with the same items
+    _NO_RETRY = RetryPolicy(max_attempts=1)
     _current_data: Any
+    _step_records: Dict[str, StepRecord]
 
-    def __init__(self, name: str, schedule: str, steps: List[Step]):
+    def __init__(self,
+                 name: str,
+                 schedule: Optional[str],
+                 steps: List[Step],
+                 retry_policy: Optional[RetryPolicy] = None,
+                 profiler: Optional[PipelineProfiler] = None,
+                 streaming: bool = False,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 shared_prefixes: Optional[SharedPrefixes] = None,
+                 prefix_hashes: Optional[List[str]] = None):
         self._name = name
-        self._schedule = Schedule(schedule)
+        # pipelines without schedule run only when triggered
+        self._schedule = make_schedule(schedule) if schedule is not None else None
         self._steps = steps
+        self._retry_policy = retry_policy or RetryPolicy(max_attempts=self.STEP_REPEAT_TRY_COUNT)
+        self._profiler = profiler
+        self._streaming = streaming
+        self._queue_size = queue_size
+        # hashes of configs of the first 1, 2, ... steps, used to find pipelines starting with the same steps
+        self._shared_prefixes = shared_prefixes
+        self._prefix_hashes = prefix_hashes or []
         self._current_data = None
+        self._cancellation = CancellationToken()
+        self._step_records = {}
+        self._step_labels = [f"{position}:{step}" for position, step in enumerate(self._steps)]
+        for position, step in enumerate(self._steps):
+            step.bind(self._name, str(position))
 
-    def run(self) -> None:
+    def run(self, data: Any = None) -> None:
         logger.info(f"Starting pipeline \"{self.name}\"")
+        started = time.perf_counter()
+        started_at = time.time()
+        outcome = "failure"
+        self._step_records = {}
+        # the scheduler cancels runs which have not finished when it is stopped
+        self._cancellation = current_cancellation.get() or CancellationToken()
+        run_profile = self._profiler.start_run(self.name) if self._profiler is not None else None
         try:
-            self._current_data = None
-            for step in self._steps:
-                self._perform_step(step)
+            if self._streaming:
+                self._run_streaming(data, run_profile)
+            else:
+                self._run_steps(data, run_profile)
+            outcome = "success"
             logger.info(f"Pipeline \"{self.name}\" has finished.")
+        except SkipRemainingSteps as e:
+            outcome = "skipped"
+            logger.info(f"Pipeline \"{self.name}\" has skipped remaining steps because {e}")
         except Exception as e:
-            logger.error(f"Pipeline \"{self.name}\" has failed because {e}")
+            if self._cancellation.cancelled:
+                outcome = "cancelled"
+                logger.warning(f"Pipeline \"{self.name}\" was cancelled because {self._cancellation.reason}")
+            else:
+                logger.error(f"Pipeline \"{self.name}\" has failed because {e}")
             raise e
+        finally:
+            duration = time.perf_counter() - started
+            self.record_run(duration, outcome)
+            self._save_run(started_at, duration, outcome)
+            if run_profile is not None:
+                run_profile.finish()
 
-    def _perform_step(self, step: Step) -> None:
-        logger.info(f"Starting step {step} from \"{self.name}\".")
+    def record_run(self, duration: float, outcome: str) -> None:
+        PIPELINE_RUNS.inc(pipeline=self.name, outcome=outcome)
+        PIPELINE_DURATION.observe(duration, pipeline=self.name, outcome=outcome)
 
-        last_exception = None
-        for _ in range(self.STEP_REPEAT_TRY_COUNT):
-            try:
-                copied_data = copy.deepcopy(self._current_data)
-                self._current_data = step.perform(copied_data)
-                logger.info(f"Finished step {step} from \"{self.name}\".")
-                return
-            except Exception as e:
-                logger.warning(f"Failed step {step} from \"{self.name}\". Retrying...")
-                last_exception = e
+    def _save_run(self, started_at: float, duration: float, outcome: str) -> None:
+        run_history = get_run_history()
+        steps = [self._step_records[label] for label in self._step_labels if label in self._step_records]
+        output = run_history.output_of(self._current_data) if outcome == "success" and not self._streaming else None
+        run_history.record(RunRecord(self.name, started_at, duration, outcome, steps, output))
 
-        if last_exception:
-            logger.error(f"Step {step} from \"{self.name}\" failed too many times.")
-            raise last_exception
+    def _run_steps(self, data: Any, run_profile: Optional[RunProfile]) -> None:
+        self._current_data = data
+        shared_length = self._shared_length(data)
+        if shared_length:
+            # steps shared with other pipelines run once per tick, all of the pipelines get their result
+            tick = current_tick.get()
+            prefix_hash = self._prefix_hashes[shared_length - 1]
+            result = self._shared_prefixes.run(
+                prefix_hash, tick, lambda: self._perform_steps(0, shared_length, run_profile)
+            )
+            remaining_steps = self._steps[shared_length:]
+            if not is_immutable(result) and any(step.mutates_input for step in remaining_steps):
+                result = copy.deepcopy(result)
+            self._current_data = result
+        self._perform_steps(shared_length, len(self._steps), run_profile)
+
+    def _perform_steps(self, start: int, stop: int, run_profile: Optional[RunProfile]) -> Any:
+        for step, step_label in zip(self._steps[start:stop], self._step_labels[start:stop]):
+            with self._profile_step(run_profile, step_label):
+                data = self._current_data
+                if isinstance(data, GeneratorType):
+                    # without streaming, items produced by a generator are collected at once, so the next step
+                    # gets a list which can be copied and passed again when the step is retried
+                    data = list(data)
+                elif step.aggregates_items:
+                    data = [data]
+                self._current_data = self._perform_step(step, step_label, data)
+        if isinstance(self._current_data, GeneratorType):
+            # the last step's generator still has to run, like at the end of a stream
+            self._current_data = list(self._current_data)
+        return self._current_data
+
+    def _shared_length(self, data: Any) -> int:
+        # only scheduled runs share steps, a triggered run has its own input
+        if self._shared_prefixes is None or current_tick.get() is None or data is not None:
+            return 0
+        return self._shared_prefixes.shared_length(self._prefix_hashes)
+
+    def _run_streaming(self, data: Any, run_profile: Optional[RunProfile]) -> None:
+        # every step runs in its own thread, items produced by generator steps flow to the next step one by one
+        # through bounded queues, so a slow step makes the previous ones wait instead of piling up items
+        if not self._steps:
+            return
+        cancelled = self._cancellation.child()
+        errors = []
+        queues = [ItemQueue(self._queue_size, cancelled) for _ in self._steps]
+        stages = [
+            Thread(
+                target=self._run_stage,
+                args=(step, step_label, inbox, outbox, cancelled, errors, run_profile),
+                name=f"{self.name}:{step_label}",
+                daemon=True
+            )
+            for step, step_label, inbox, outbox in zip(self._steps, self._step_labels, queues, queues[1:] + [None])
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            queues[0].put(data)
+            queues[0].close()
+        except StreamCancelled:
+            pass
+        for stage in stages:
+            stage.join()
+        self._cancellation.detach(cancelled)
+        if errors:
+            raise errors[0]
+        self._cancellation.raise_if_cancelled()
+
+    def _run_stage(self,
+                   step: Step,
+                   step_label: str,
+                   inbox: ItemQueue,
+                   outbox: Optional[ItemQueue],
+                   cancelled: CancellationToken,
+                   errors: List[Exception],
+                   run_profile: Optional[RunProfile]) -> None:
+        try:
+            with self._profile_step(run_profile, step_label):
+                for item in [iter(inbox)] if step.aggregates_items else inbox:
+                    try:
+                        result = self._perform_step(
+                            step, step_label, item, self._NO_RETRY if step.aggregates_items else None, cancelled
+                        )
+                    except SkipRemainingSteps as e:
+                        logger.info(f"Step {step} from \"{self.name}\" has dropped an item because {e}")
+                        continue
+                    for output in result if isinstance(result, GeneratorType) else [result]:
+                        # output of the last step is not used, but its generator still has to run
+                        if outbox is not None:
+                            outbox.put(output)
+                if outbox is not None:
+                    outbox.close()
+        except StreamCancelled:
+            pass
+        except Exception as e:
+            logger.error(f"Step {step} from \"{self.name}\" has failed, cancelling the stream")
+            errors.append(e)
+            cancelled.cancel(f"step {step} has failed")
+
+    @staticmethod
+    def _profile_step(run_profile: Optional[RunProfile], step_label: str) -> ContextManager:
+        return run_profile.step(step_label) if run_profile is not None else nullcontext()
+
+    def _perform_step(self,
+                      step: Step,
+                      step_label: str,
+                      data: Any,
+                      retry_policy: Optional[RetryPolicy] = None,
+                      cancellation: Optional[CancellationToken] = None) -> Any:
+        attempts = _RecordedAttempts(self, step_label)
+        step_started = time.perf_counter()
+        try:
+            return perform_step(
+                step,
+                data,
+                cancellation or self._cancellation,
+                retry_policy or step.retry_policy or self._retry_policy,
+                attempts,
+                f"{step} from \"{self.name}\""
+            )
+        finally:
+            self._add_step_record(
+                step_label, time.perf_counter() - step_started, attempts.count, attempts.outcome, attempts.result
+            )
+
+    def _snapshot(self, step: Step, data: Any, is_retry_possible: bool) -> Any:
+        return snapshot_input(step, data, is_retry_possible)
+
+    def _add_step_record(self, step_label: str, duration: float, attempts: int, outcome: str, result: Any) -> None:
+        payload_size = len(result) if isinstance(result, (str, bytes)) else None
+        previous = self._step_records.get(step_label)
+        if previous is not None:
+            # a step of a streaming pipeline runs once per item
+            duration += previous.duration
+            attempts += previous.attempts
+            if previous.payload_size is not None:
+                payload_size = previous.payload_size + (payload_size or 0)
+            if previous.outcome == "failure":
+                outcome = previous.outcome
+        self._step_records[step_label] = StepRecord(step_label, duration, attempts, outcome, payload_size)
 
     @property
     def name(self) -> str:
         return self._name
 
     @property
-    def schedule(self) -> Schedule:
+    def schedule(self) -> Optional[BaseSchedule]:
         return self._schedule
+
+
+class _RecordedAttempts(StepAttempts):
+    def __init__(self, pipeline: Pipeline, step_label: str):
+        super().__init__()
+        self._pipeline = pipeline
+        self._pipeline_name = pipeline.name
+        self._step_label = step_label
+
+    def attempt_finished(self, outcome: str, duration: float, result: Any = None) -> None:
+        STEP_DURATION.observe(duration, pipeline=self._pipeline_name, step=self._step_label, outcome=outcome)
+        if isinstance(result, (str, bytes)):
+            STEP_PAYLOAD_SIZE.observe(len(result), pipeline=self._pipeline_name, step=self._step_label)
+
+    def retrying(self) -> None:
+        STEP_RETRIES.inc(pipeline=self._pipeline_name, step=self._step_label)
+
+    def failed(self) -> None:
+        STEP_FAILURES.inc(pipeline=self._pipeline_name, step=self._step_label)
+
+    def snapshot(self, step: Step, data: Any, is_retry_possible: bool) -> Any:
+        return self._pipeline._snapshot(step, data, is_retry_possible)
@@ -1,13 +1,76 @@
+from typing import Optional, List
+
 from pipeliner import Pipeline, StepsFactoryWithCustomSteps
+from pipeliner.coalescing import SharedPrefixes, config_hash
+from pipeliner.process_pool import PipelineProcessPool, ProcessPipeline
+from pipeliner.profiler import PipelineProfiler, make_profiler
+from pipeliner.retry_policy import RetryPolicy
 
 
 class PipelineFactory:
-    def __init__(self, steps_factory: StepsFactoryWithCustomSteps):
+    TRIGGER_TYPES = ("webhook", "file")
+
+    def __init__(self,
+                 steps_factory: StepsFactoryWithCustomSteps,
+                 process_pool: Optional[PipelineProcessPool] = None,
+                 profiler: Optional[PipelineProfiler] = None,
+                 shared_prefixes: Optional[SharedPrefixes] = None):
         self._steps_factory = steps_factory
+        self._process_pool = process_pool
+        # used by pipelines without their own "profile" config
+        self._profiler = profiler
+        self._shared_prefixes = shared_prefixes or SharedPrefixes()
 
     def create(self, pipeline_config: dict) -> Pipeline:
+        if "schedule" not in pipeline_config and not pipeline_config.get("triggers"):
+            raise ValueError(f"Pipeline \"{pipeline_config['name']}\" has neither schedule nor triggers")
+        for trigger in pipeline_config.get("triggers", []):
+            if trigger.get("type") not in self.TRIGGER_TYPES:
+                raise ValueError(f"Unknown trigger \"{trigger.get('type')}\" of pipeline \"{pipeline_config['name']}\"")
+            if trigger["type"] == "file" and "path" not in trigger:
+                raise ValueError(f"File trigger of pipeline \"{pipeline_config['name']}\" needs a path")
+
+        executor = pipeline_config.get("executor", "thread")
+        if executor == "process":
+            if self._process_pool is None:
+                raise ValueError(f"Pipeline \"{pipeline_config['name']}\" needs a process pool to run in")
+            self._shared_prefixes.unregister(pipeline_config["name"])
+            return ProcessPipeline(
+                pipeline_config["name"],
+                pipeline_config.get("schedule"),
+                pipeline_config,
+                self._process_pool
+            )
+        if executor != "thread":
+            raise ValueError(f"Unknown executor \"{executor}\" of pipeline \"{pipeline_config['name']}\"")
+
+        steps = self._steps_factory.create(pipeline_config["steps"])
+        streaming = pipeline_config.get("streaming", False)
+        # items of streaming pipelines are not shared
+        prefix_hashes = self._prefix_hashes(pipeline_config["steps"], steps) if not streaming else []
+        self._shared_prefixes.register(pipeline_config["name"], prefix_hashes)
         return Pipeline(
             pipeline_config["name"],
-            pipeline_config["schedule"],
-            self._steps_factory.create(pipeline_config["steps"])
+            pipeline_config.get("schedule"),
+            steps,
+            RetryPolicy(**pipeline_config["retry"]) if "retry" in pipeline_config else None,
+            make_profiler(pipeline_config["profile"]) if "profile" in pipeline_config else self._profiler,
+            streaming,
+            pipeline_config.get("queue_size", Pipeline.DEFAULT_QUEUE_SIZE),
+            self._shared_prefixes,
+            prefix_hashes
         )
+
+    def release(self, pipeline_name: str) -> None:
+        # called when a pipeline is removed, so results of steps it shared with others are not kept for it
+        self._shared_prefixes.unregister(pipeline_name)
+
+    @staticmethod
+    def _prefix_hashes(steps_config: List[dict], steps: list) -> List[str]:
+        hashes = []
+        canonical_configs = [dict(step_config, params=step_config.get("params", {})) for step_config in steps_config]
+        for length, step in enumerate(steps, 1):
+            if not step.shareable:
+                break
+            hashes.append(config_hash(canonical_configs[:length]))
+        return hashes
@@ -0,0 +1,220 @@
+import heapq
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime, timedelta
+from threading import Thread, Condition, Lock
+from typing import List, Dict, Set, Tuple, Optional, Any
+
+from pipeliner import Pipeline
+from pipeliner.cancellation import CancellationToken, current_cancellation
+from pipeliner.cluster import ClusterMember
+from pipeliner.coalescing import current_tick
+from pipeliner.metrics import SCHEDULE_LAG, WORKERS_BUSY, WORKERS_MAX, PIPELINES_QUEUED
+from pipeliner.schedule import next_tick
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineScheduler(Thread):
+    DEFAULT_MAX_WORKERS = 8
+    MAX_SLEEP_SECONDS = 60
+    MAX_RETRY_DELAY_MINUTES = 60
+    # how long cancelled runs get to stop at their next cancellable point before they are abandoned
+    CANCEL_GRACE_SECONDS = 1.0
+    _queue: List[Tuple[datetime, int, Pipeline]]
+    _next_runs: Dict[Pipeline, datetime]
+    _running_pipelines: Set[Pipeline]
+    _cancellations: Dict[Pipeline, CancellationToken]
+    _failures: Dict[Pipeline, int]
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, cluster: Optional[ClusterMember] = None):
+        super().__init__(name="PipelineScheduler", daemon=True)
+        self._running = False
+        self._max_workers = max_workers
+        # in cluster mode only scheduled runs of pipelines leased by this instance are run
+        self._cluster = cluster
+        self._executor = None
+        self._condition = Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._next_runs = {}
+        self._running_pipelines = set()
+        self._cancellations = {}
+        self._failures = {}
+        self._busy_workers = 0
+        self._busy_workers_lock = Lock()
+
+    def add(self, pipeline: Pipeline, now: Optional[datetime] = None) -> None:
+        if pipeline.schedule is None:
+            return
+        with self._condition:
+            self._schedule_at(pipeline, pipeline.schedule.next_run(now or datetime.now()))
+            self._condition.notify()
+
+    def remove(self, pipeline: Pipeline) -> None:
+        with self._condition:
+            self._next_runs.pop(pipeline, None)
+            self._failures.pop(pipeline, None)
+            self._condition.notify()
+
+    def replace(self, old_pipeline: Pipeline, new_pipeline: Pipeline, now: Optional[datetime] = None) -> None:
+        # a run of the old pipeline is not interrupted, the new one does not start until it finishes
+        with self._condition:
+            self.remove(old_pipeline)
+            self.add(new_pipeline, now)
+
+    def trigger(self, pipeline: Pipeline, data: Any = None) -> bool:
+        with self._condition:
+            if self._is_running(pipeline):
+                logger.warning(f"Pipeline \"{pipeline.name}\" is still running. Ignoring trigger.")
+                return False
+            self._submit(pipeline, datetime.now(), data, triggered=True)
+            return True
+
+    def start(self) -> None:
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="PipelineWorker")
+        WORKERS_MAX.set(self._max_workers)
+        super().start()
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self.join()
+        # runs which have not started yet are dropped, the running ones can finish until the deadline
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._condition:
+            if self._condition.wait_for(lambda: not self._running_pipelines, timeout):
+                return True
+            for pipeline in self._running_pipelines:
+                logger.warning(f"Pipeline \"{pipeline.name}\" has not finished in {timeout} seconds. Cancelling it.")
+                self._cancellations[pipeline].cancel("Pipeliner is stopping")
+            if self._condition.wait_for(lambda: not self._running_pipelines, self.CANCEL_GRACE_SECONDS):
+                return True
+            names = ", ".join(sorted(pipeline.name for pipeline in self._running_pipelines))
+            logger.error(f"Abandoning runs of pipelines {names} which have not stopped after cancelling.")
+            return False
+
+    def run(self) -> None:
+        with self._condition:
+            while self._running:
+                now = datetime.now()
+                for due, pipeline in self._pop_due(now):
+                    self._dispatch(pipeline, now, due)
+                self._condition.wait(self._sleep_time(datetime.now()))
+
+    @property
+    def running_pipelines(self) -> Set[Pipeline]:
+        with self._condition:
+            return set(self._running_pipelines)
+
+    def _sleep_time(self, now: datetime) -> float:
+        while self._queue and self._is_stale(self._queue[0]):
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return self.MAX_SLEEP_SECONDS
+        until_next = (self._queue[0][0] - now).total_seconds()
+        return min(max(until_next, 0), self.MAX_SLEEP_SECONDS)
+
+    def _pop_due(self, now: datetime) -> List[Tuple[datetime, Pipeline]]:
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            entry = heapq.heappop(self._queue)
+            if not self._is_stale(entry):
+                del self._next_runs[entry[2]]
+                due.append((entry[0], entry[2]))
+        return due
+
+    def _is_stale(self, entry: Tuple[datetime, int, Pipeline]) -> bool:
+        when, _, pipeline = entry
+        return self._next_runs.get(pipeline) != when
+
+    def _schedule_at(self, pipeline: Pipeline, when: Optional[datetime]) -> None:
+        if when is None:
+            logger.warning(f"Pipeline \"{pipeline.name}\" will never run again according to its schedule.")
+            self._next_runs.pop(pipeline, None)
+            return
+        self._next_runs[pipeline] = when
+        heapq.heappush(self._queue, (when, next(self._sequence), pipeline))
+
+    def _dispatch(self, pipeline: Pipeline, now: datetime, due: Optional[datetime] = None) -> None:
+        self._schedule_at(pipeline, pipeline.schedule.next_run(now))
+
+        # pipelines owned by other instances of the cluster do not take up workers
+        if self._cluster is not None and not self._cluster.owns(pipeline.name):
+            logger.debug(f"Pipeline \"{pipeline.name}\" is run by another instance of the cluster.")
+            return
+        if self._is_running(pipeline):
+            logger.warning(f"Pipeline \"{pipeline.name}\" is still running. Skipping this run.")
+            return
+        self._submit(pipeline, due or now)
+
+    def _submit(self, pipeline: Pipeline, due: datetime, data: Any = None, triggered: bool = False) -> None:
+        cancellation = CancellationToken()
+        self._running_pipelines.add(pipeline)
+        self._cancellations[pipeline] = cancellation
+        self._update_pool_metrics()
+        future = self._executor.submit(self._run_pipeline, pipeline, due, data, triggered, cancellation)
+        future.add_done_callback(lambda f: self._on_finished(pipeline, f, triggered))
+
+    def _is_running(self, pipeline: Pipeline) -> bool:
+        # compared by name so a reloaded pipeline does not overlap with a run of its previous version
+        return any(running.name == pipeline.name for running in self._running_pipelines)
+
+    def _run_pipeline(self,
+                      pipeline: Pipeline,
+                      due: datetime,
+                      data: Any = None,
+                      triggered: bool = False,
+                      cancellation: Optional[CancellationToken] = None) -> None:
+        # the lease is taken in the worker, so waiting for the lease store does not hold up the scheduler
+        if not triggered and self._cluster is not None and not self._cluster.acquire(pipeline.name):
+            return
+        SCHEDULE_LAG.observe(max((datetime.now() - due).total_seconds(), 0), pipeline=pipeline.name)
+        with self._busy_workers_lock:
+            self._busy_workers += 1
+            WORKERS_BUSY.set(self._busy_workers)
+        # pipelines scheduled at the same time can share results of their common steps
+        tick_token = current_tick.set(None if triggered else due)
+        cancellation_token = current_cancellation.set(cancellation)
+        try:
+            pipeline.run(data)
+        finally:
+            current_cancellation.reset(cancellation_token)
+            current_tick.reset(tick_token)
+            with self._busy_workers_lock:
+                self._busy_workers -= 1
+                WORKERS_BUSY.set(self._busy_workers)
+
+    def _update_pool_metrics(self) -> None:
+        PIPELINES_QUEUED.set(max(len(self._running_pipelines) - self._max_workers, 0))
+
+    def _on_finished(self, pipeline: Pipeline, future: Future, triggered: bool = False) -> None:
+        with self._condition:
+            self._running_pipelines.discard(pipeline)
+            self._cancellations.pop(pipeline, None)
+            self._update_pool_metrics()
+            self._condition.notify_all()
+            if future.cancelled() or future.exception() is None:
+                self._failures.pop(pipeline, None)
+                return
+            if triggered:
+                # a retry would be a scheduled run without the trigger's data, the trigger can be sent again instead
+                logger.info(f"Triggered run of pipeline \"{pipeline.name}\" has failed. It is not retried.")
+                return
+            if pipeline not in self._next_runs:
+                return
+
+            # failing pipeline is retried after 1, 2, 4, ... minutes (seconds for schedules with seconds)
+            # so an outage does not cause a retry storm
+            failures = self._failures.get(pipeline, 0) + 1
+            self._failures[pipeline] = failures
+            resolution = pipeline.schedule.resolution
+            delay = min(2 ** (failures - 1), timedelta(minutes=self.MAX_RETRY_DELAY_MINUTES) // resolution)
+            retry_at = next_tick(datetime.now(), resolution) + resolution * (delay - 1)
+            if retry_at < self._next_runs[pipeline]:
+                self._schedule_at(pipeline, retry_at)
+                self._condition.notify()
+            logger.info(f"Pipeline \"{pipeline.name}\" has failed. Retrying at {retry_at} at the latest.")
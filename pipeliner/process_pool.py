@@ -0,0 +1,150 @@
+import logging
+import logging.config
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
+from pathlib import Path
+from threading import Lock
+from typing import List, Dict, Tuple, Optional, Any
+
+from pipeliner.circuit_breaker import circuit_breakers
+from pipeliner.coalescing import config_hash
+from pipeliner.pipeline import Pipeline
+from pipeliner.profiler import PipelineProfiler, make_profiler
+from pipeliner.retry_policy import RetryPolicy
+from pipeliner.run_history import make_run_history, set_run_history, get_run_history
+from pipeliner.state_store import make_state_store, set_state_store, get_state_store
+from pipeliner.steps_factory import StepsFactoryWithCustomSteps
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineProcessPool:
+    _executors: List[ProcessPoolExecutor]
+
+    def __init__(self,
+                 custom_steps_path: Path,
+                 shared_config: dict,
+                 workers: Optional[int] = None,
+                 log_config: Optional[dict] = None):
+        # workers are spawned rather than forked, forking a process with running threads is not safe
+        self._context = multiprocessing.get_context("spawn")
+        self._initargs = (str(custom_steps_path), shared_config, log_config)
+        self._lock = Lock()
+        self._executors = [self._make_executor() for _ in range(workers or os.cpu_count() or 1)]
+
+    def run(self, pipeline_config: dict, data: Any = None) -> None:
+        index = self._index_for(pipeline_config["name"])
+        executor = self._executors[index]
+        try:
+            future = executor.submit(_run_pipeline, pipeline_config, data)
+        except BrokenProcessPool:
+            # the worker died during an earlier run, the run is sent to a new one
+            executor = self._replace_executor(index, executor)
+            future = executor.submit(_run_pipeline, pipeline_config, data)
+        try:
+            future.result()
+        except BrokenProcessPool:
+            # the worker died during this run, it is not sent again in case the run is what kills it
+            self._replace_executor(index, executor)
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        for executor in self._executors:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _executor_for(self, pipeline_name: str) -> ProcessPoolExecutor:
+        return self._executors[self._index_for(pipeline_name)]
+
+    def _index_for(self, pipeline_name: str) -> int:
+        # a pipeline always runs in the same worker so state of its steps stays in one place
+        return zlib.crc32(pipeline_name.encode("utf-8")) % len(self._executors)
+
+    def _make_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._context,
+            initializer=_initialize_worker,
+            initargs=self._initargs
+        )
+
+    def _replace_executor(self, index: int, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            # several runs can find the same broken worker, only the first one replaces it
+            if self._executors[index] is broken:
+                logger.warning(f"Worker process {index} has died, starting a new one")
+                broken.shutdown(wait=False)
+                self._executors[index] = self._make_executor()
+            return self._executors[index]
+
+
+class ProcessPipeline(Pipeline):
+    def __init__(self, name: str, schedule: Optional[str], pipeline_config: dict, process_pool: PipelineProcessPool):
+        super().__init__(name, schedule, [])
+        self._pipeline_config = pipeline_config
+        self._process_pool = process_pool
+
+    def run(self, data: Any = None) -> None:
+        logger.info(f"Sending pipeline \"{self.name}\" to a worker process")
+        started = time.perf_counter()
+        outcome = "failure"
+        try:
+            self._process_pool.run(self._pipeline_config, data)
+            outcome = "success"
+        finally:
+            self.record_run(time.perf_counter() - started, outcome)
+
+
+_worker_steps_factory: Optional[StepsFactoryWithCustomSteps] = None
+_worker_profiler: Optional[PipelineProfiler] = None
+_worker_pipelines: Dict[str, Tuple[str, Pipeline]] = {}
+
+
+def _initialize_worker(custom_steps_path: str, shared_config: dict, log_config: Optional[dict]) -> None:
+    global _worker_steps_factory, _worker_profiler
+    if log_config is not None:
+        logging.config.dictConfig(log_config)
+    _worker_steps_factory = StepsFactoryWithCustomSteps(Path(custom_steps_path))
+    _worker_profiler = make_profiler(shared_config.get("profile"))
+    if "http" in shared_config:
+        from pipeliner.http_session_pool import http_session_pool
+        http_session_pool.configure(**shared_config["http"])
+    circuit_breakers.configure(**shared_config.get("circuit_breaker", {}))
+    Finalize(None, _close_email, exitpriority=20)
+    set_state_store(make_state_store(shared_config.get("state", {})))
+    Finalize(None, get_state_store().close, exitpriority=10)
+    # workers write runs of their pipelines into the same database
+    set_run_history(make_run_history(shared_config.get("history")))
+    Finalize(None, get_run_history().close, exitpriority=10)
+
+
+def _close_email() -> None:
+    # digests buffered in the worker are sent before its connections are closed, smtplib is not imported otherwise
+    module = sys.modules.get("pipeliner.smtp_connection_pool")
+    if module is not None:
+        module.email_digest.flush()
+        module.smtp_connection_pool.close()
+
+
+def _run_pipeline(pipeline_config: dict, data: Any = None) -> None:
+    new_hash = config_hash(pipeline_config)
+    name = pipeline_config["name"]
+    cached = _worker_pipelines.get(name)
+    if cached is None or cached[0] != new_hash:
+        pipeline = Pipeline(
+            name,
+            pipeline_config.get("schedule"),
+            _worker_steps_factory.create(pipeline_config["steps"]),
+            RetryPolicy(**pipeline_config["retry"]) if "retry" in pipeline_config else None,
+            make_profiler(pipeline_config["profile"]) if "profile" in pipeline_config else _worker_profiler,
+            pipeline_config.get("streaming", False),
+            pipeline_config.get("queue_size", Pipeline.DEFAULT_QUEUE_SIZE)
+        )
+        cached = (new_hash, pipeline)
+        _worker_pipelines[name] = cached
+    cached[1].run(data)
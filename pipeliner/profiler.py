@@ -0,0 +1,117 @@
+import cProfile
+import io
+import logging
+import pstats
+import random
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Tuple, Optional, Iterator, Union, List
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineProfiler:
+    DEFAULT_OUTPUT_DIR = "profiles"
+    DEFAULT_TOP = 20
+    _aggregated: Dict[Tuple[str, str], pstats.Stats]
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, sample_rate: float = 1.0, top: int = DEFAULT_TOP):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Profiling sample rate must be between 0 and 1, not {sample_rate}")
+        self._output_dir = Path(output_dir)
+        self._sample_rate = sample_rate
+        self._top = top
+        self._lock = Lock()
+        self._aggregated = {}
+
+    def start_run(self, pipeline_name: str) -> Optional["RunProfile"]:
+        if random.random() >= self._sample_rate:
+            return None
+        return RunProfile(self, pipeline_name)
+
+    def aggregated(self, pipeline_name: str, step_label: str) -> Optional[pstats.Stats]:
+        with self._lock:
+            return self._aggregated.get((pipeline_name, step_label))
+
+    def _save(self, pipeline_name: str, profiles: List[Tuple[str, cProfile.Profile]]) -> Path:
+        pipeline_dir = self._output_dir / _safe_name(pipeline_name)
+        run_dir = pipeline_dir / time.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while run_dir.exists():
+            suffix += 1
+            run_dir = pipeline_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        run_dir.mkdir(parents=True)
+
+        summary = []
+        for step_label, profile in profiles:
+            profile.dump_stats(str(run_dir / f"{_safe_name(step_label)}.pstats"))
+            stats = pstats.Stats(profile)
+            summary.append(f"Step {step_label} took {stats.total_tt:.3f} s")
+            summary.append(self._top_functions(stats))
+            with self._lock:
+                aggregated = self._aggregated.get((pipeline_name, step_label))
+                if aggregated is None:
+                    self._aggregated[(pipeline_name, step_label)] = stats
+                else:
+                    aggregated.add(stats)
+                    stats = aggregated
+                stats.dump_stats(str(pipeline_dir / f"{_safe_name(step_label)}.pstats"))
+
+        (run_dir / "summary.txt").write_text("\n".join(summary), encoding="utf8")
+        return run_dir
+
+    def _top_functions(self, stats: pstats.Stats) -> str:
+        output = io.StringIO()
+        stream, stats.stream = stats.stream, output
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self._top)
+        stats.stream = stream
+        return output.getvalue()
+
+
+class RunProfile:
+    _profiles: List[Tuple[str, cProfile.Profile]]
+
+    def __init__(self, profiler: PipelineProfiler, pipeline_name: str):
+        self._profiler = profiler
+        self._pipeline_name = pipeline_name
+        self._profiles = []
+
+    @contextmanager
+    def step(self, step_label: str) -> Iterator[None]:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # only one profiler can be active at a time on some Python versions
+            logger.warning(f"Could not profile step {step_label} of \"{self._pipeline_name}\" because {e}")
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._profiles.append((step_label, profile))
+
+    def finish(self) -> None:
+        if not self._profiles:
+            return
+        try:
+            run_dir = self._profiler._save(self._pipeline_name, self._profiles)
+            logger.info(f"Profile of pipeline \"{self._pipeline_name}\" was saved to {run_dir}")
+        except Exception as e:
+            logger.error(f"Could not save profile of pipeline \"{self._pipeline_name}\" because {e}")
+
+
+def make_profiler(profile_config: Union[None, bool, dict]) -> Optional[PipelineProfiler]:
+    if not profile_config:
+        return None
+    if profile_config is True:
+        return PipelineProfiler()
+    return PipelineProfiler(**profile_config)
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name)
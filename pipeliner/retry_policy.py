@@ -0,0 +1,49 @@
+import builtins
+import importlib
+import random
+from typing import List, Optional, Tuple, Type
+
+
+class RetryPolicy:
+    _retry_on: Tuple[Type[BaseException], ...]
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 backoff: float = 0.0,
+                 backoff_multiplier: float = 2.0,
+                 max_backoff: float = 60.0,
+                 jitter: bool = True,
+                 retry_on: Optional[List[str]] = None):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._backoff_multiplier = backoff_multiplier
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._retry_on = tuple(self._resolve_exception(name) for name in retry_on) if retry_on else (Exception,)
+
+    @property
+    def max_attempts(self) -> int:
+        return self._max_attempts
+
+    def is_retryable(self, exception: BaseException) -> bool:
+        return isinstance(exception, self._retry_on)
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self._backoff * self._backoff_multiplier ** (attempt - 1), self._max_backoff)
+        if self._jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    @staticmethod
+    def _resolve_exception(name: str) -> Type[BaseException]:
+        if "." in name:
+            module_name, class_name = name.rsplit(".", 1)
+            exception = getattr(importlib.import_module(module_name), class_name, None)
+        else:
+            exception = getattr(builtins, name, None)
+
+        if not (isinstance(exception, type) and issubclass(exception, BaseException)):
+            raise ValueError(f"{name} is not an exception class")
+        return exception
@@ -0,0 +1,177 @@
+import logging
+import sqlite3
+import time
+from threading import Condition, Lock, Thread
+from typing import Any, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StepRecord(NamedTuple):
+    step: str
+    duration: float
+    attempts: int
+    outcome: str
+    payload_size: Optional[int] = None
+
+
+class RunRecord(NamedTuple):
+    pipeline: str
+    started: float
+    duration: float
+    outcome: str
+    steps: List[StepRecord]
+    output: Optional[str] = None
+
+
+class RunHistory:
+    # history which is not configured keeps nothing
+    def record(self, run: RunRecord) -> None:
+        pass
+
+    def output_of(self, data: Any) -> Optional[str]:
+        return None
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SqliteRunHistory(RunHistory):
+    DEFAULT_FLUSH_INTERVAL = 1.0
+    DEFAULT_RETENTION_DAYS = 30
+    COMPACT_INTERVAL_SECONDS = 3600
+    BATCH_SIZE = 500
+    MAX_PENDING = 10000
+    _pending: List[RunRecord]
+
+    def __init__(self,
+                 path: str,
+                 retention_days: Optional[float] = DEFAULT_RETENTION_DAYS,
+                 output_size: int = 0,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self._path = path
+        self._retention_days = retention_days
+        self._output_size = output_size
+        self._flush_interval = flush_interval
+        self._connection = connect(path)
+        self._condition = Condition()
+        self._flush_lock = Lock()
+        self._pending = []
+        self._closed = False
+        self._compacted_at = 0.0
+        self.compact()
+        self._writer = Thread(target=self._write_periodically, name="RunHistoryWriter", daemon=True)
+        self._writer.start()
+
+    def record(self, run: RunRecord) -> None:
+        with self._condition:
+            if len(self._pending) >= self.MAX_PENDING:
+                logger.warning(f"Run history is not being written fast enough, dropping run of \"{run.pipeline}\"")
+                return
+            self._pending.append(run)
+            if len(self._pending) >= self.BATCH_SIZE:
+                self._condition.notify()
+
+    def output_of(self, data: Any) -> Optional[str]:
+        if not self._output_size or data is None:
+            return None
+        # only the beginning is converted, outputs can be whole pages
+        if isinstance(data, bytes):
+            return data[:self._output_size].decode("utf-8", errors="replace")
+        if isinstance(data, str):
+            return data[:self._output_size]
+        return str(data)[:self._output_size]
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._condition:
+                pending, self._pending = self._pending, []
+            if pending:
+                self._write(pending)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer.join()
+        self.flush()
+        self._connection.close()
+
+    def compact(self) -> None:
+        self._compacted_at = time.monotonic()
+        if self._retention_days is None:
+            return
+        oldest = time.time() - self._retention_days * 24 * 3600
+        with self._flush_lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM steps WHERE run_id IN (SELECT id FROM runs WHERE started < ?)", (oldest,)
+            )
+            deleted = self._connection.execute("DELETE FROM runs WHERE started < ?", (oldest,)).rowcount
+        if deleted:
+            logger.info(f"Removed {deleted} runs older than {self._retention_days} days from run history")
+            self._connection.execute("PRAGMA incremental_vacuum")
+
+    def _write_periodically(self) -> None:
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                if len(self._pending) < self.BATCH_SIZE:
+                    self._condition.wait(self._flush_interval)
+            try:
+                self.flush()
+                if time.monotonic() - self._compacted_at >= self.COMPACT_INTERVAL_SECONDS:
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Could not write run history because {e}")
+
+    def _write(self, runs: List[RunRecord]) -> None:
+        with self._connection:
+            for run in runs:
+                run_id = self._connection.execute(
+                    "INSERT INTO runs (pipeline, started, duration, outcome, output) VALUES (?, ?, ?, ?, ?)",
+                    (run.pipeline, run.started, run.duration, run.outcome, run.output)
+                ).lastrowid
+                self._connection.executemany(
+                    "INSERT INTO steps (run_id, position, step, duration, attempts, outcome, payload_size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, position, *step) for position, step in enumerate(run.steps)]
+                )
+
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+    # has effect only when the database is created, freed pages are then returned by incremental_vacuum
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, pipeline TEXT NOT NULL, started REAL NOT NULL, "
+        "duration REAL NOT NULL, outcome TEXT NOT NULL, output TEXT)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS runs_started ON runs (started)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS steps (run_id INTEGER NOT NULL, position INTEGER NOT NULL, step TEXT NOT NULL, "
+        "duration REAL NOT NULL, attempts INTEGER NOT NULL, outcome TEXT NOT NULL, payload_size INTEGER)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS steps_run_id ON steps (run_id)")
+    return connection
+
+
+_run_history: RunHistory = RunHistory()
+
+
+def make_run_history(history_config: Optional[dict]) -> RunHistory:
+    if not history_config:
+        return RunHistory()
+    return SqliteRunHistory(**history_config)
+
+
+def get_run_history() -> RunHistory:
+    return _run_history
+
+
+def set_run_history(run_history: RunHistory) -> None:
+    global _run_history
+    _run_history = run_history
@@ -1,9 +1,9 @@
 import logging
 import re
 from abc import ABC, abstractmethod
-from typing import Tuple, List, Type
+from typing import Tuple, List, Type, Optional, Iterator
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +17,13 @@ class Value(ABC):
     def match(self, value: int) -> bool:
         pass
 
+    def mask(self, allowed_range: Tuple[int, int]) -> int:
+        return sum(
+            1 << value
+            for value in range(allowed_range[0], allowed_range[1] + 1)
+            if self.match(value)
+        )
+
     @staticmethod
     def _check_range(value: int, allowed_range: Tuple[int, int]) -> None:
         if not (allowed_range[0] <= value <= allowed_range[1]):
@@ -38,11 +45,13 @@ class Value(ABC):
 
 
 class NumberValue(Value):
+    _PATTERN = re.compile(r"^(\d+)$")
+
     def __init__(self):
         self._value = None
 
     def parse(self, token: str, allowed_range: Tuple[int, int]) -> bool:
-        matches = re.search(r"^(\d+)$", token)
+        matches = self._PATTERN.search(token)
         if matches:
             parsed = int(matches.groups()[0])
             self._check_range(parsed, allowed_range)
@@ -55,14 +64,18 @@ class NumberValue(Value):
 
 
 class EveryNthValue(Value):
+    _PATTERN = re.compile(r"^\*/(\d+)$")
+
     def __init__(self):
         self._value = None
 
     def parse(self, token: str, allowed_range: Tuple[int, int]) -> bool:
-        matches = re.search(r"^\*/(\d+)$", token)
+        matches = self._PATTERN.search(token)
         if matches:
             parsed = int(matches.groups()[0])
             self._check_range(parsed, allowed_range)
+            if parsed == 0:
+                raise ValueError("step value must be greater than zero")
             self._value = parsed
             return True
         return False
@@ -80,12 +93,14 @@ class EveryTimeValue(EveryNthValue):
 
 
 class RangeValue(Value):
+    _PATTERN = re.compile(r"^(\d+)-(\d+)$")
+
     def __init__(self):
         self._from = None
         self._to = None
 
     def parse(self, token: str, allowed_range: Tuple[int, int]) -> bool:
-        matches = re.search(r"^(\d+)-(\d+)$", token)
+        matches = self._PATTERN.search(token)
         if matches:
             range_from = int(matches.groups()[0])
             range_to = int(matches.groups()[1])
@@ -108,14 +123,12 @@ class MultipleValue(Value):
         self._values = []
 
     def parse(self, token: str, allowed_range: Tuple[int, int]) -> bool:
-        if re.match(r"^(.*?,)*.*?$", token):
-            value_parts = token.split(",")
-            self._values = [
-                self.make(value_part, allowed_range, self._INNER_VALUE_TYPES)
-                for value_part in value_parts
-            ]
-            return True
-        return False
+        value_parts = token.split(",")
+        self._values = [
+            self.make(value_part, allowed_range, self._INNER_VALUE_TYPES)
+            for value_part in value_parts
+        ]
+        return True
 
     def match(self, value: int) -> bool:
         return any(
@@ -124,29 +137,191 @@ class MultipleValue(Value):
         )
 
 
-class Schedule:
+class _SundayAsSeven(Value):
+    def __init__(self, value: Value):
+        self._value = value
+
+    def parse(self, token: str, allowed_range: Tuple[int, int]) -> bool:
+        return self._value.parse(token, allowed_range)
+
+    def match(self, value: int) -> bool:
+        return self._value.match(value) or (value == 7 and self._value.match(0))
+
+
+class Field:
+    def __init__(self, value: Value, allowed_range: Tuple[int, int]):
+        self._mask = value.mask(allowed_range)
+        self._first = allowed_range[0]
+        self._next = [None] * (allowed_range[1] + 2)
+        following = None
+        for candidate in range(allowed_range[1], -1, -1):
+            if self.match(candidate):
+                following = candidate
+            self._next[candidate] = following
+
+    def match(self, value: int) -> bool:
+        return bool(self._mask >> value & 1)
+
+    def next(self, value: int) -> Optional[int]:
+        if value >= len(self._next):
+            return None
+        return self._next[value]
+
+    @property
+    def first(self) -> Optional[int]:
+        return self.next(self._first)
+
+    @property
+    def is_empty(self) -> bool:
+        return self._mask == 0
+
+
+class BaseSchedule(ABC):
+    @property
+    @abstractmethod
+    def resolution(self) -> timedelta:
+        pass
+
+    @abstractmethod
+    def should_run(self, when: Optional[datetime] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def next_run(self, after: Optional[datetime] = None) -> Optional[datetime]:
+        pass
+
+    def iter_runs(self, after: Optional[datetime] = None, until: Optional[datetime] = None) -> Iterator[datetime]:
+        when = self.next_run(after)
+        while when is not None and (until is None or when <= until):
+            yield when
+            when = self.next_run(when)
+
+
+class Schedule(BaseSchedule):
     _AVAILABLE_VALUE_TYPES = [NumberValue, EveryNthValue, EveryTimeValue, RangeValue, MultipleValue]
+    _SEARCH_YEARS = 400
 
     def __init__(self, time_string: str):
-        parts = re.split(r"\s+", time_string)
-        if len(parts) != 5:
+        parts = re.split(r"\s+", time_string.strip())
+        if len(parts) not in (5, 6):
             raise ValueError("Invalid time string format")
 
-        self._minute = Value.make(parts[0], (0, 59), self._AVAILABLE_VALUE_TYPES)
-        self._hour = Value.make(parts[1], (0, 23), self._AVAILABLE_VALUE_TYPES)
-        self._day_of_month = Value.make(parts[2], (1, 31), self._AVAILABLE_VALUE_TYPES)
-        self._month = Value.make(parts[3], (1, 12), self._AVAILABLE_VALUE_TYPES)
-        self._day_of_week = Value.make(parts[4], (0, 7), self._AVAILABLE_VALUE_TYPES)
-
-    def should_run(self, when: datetime = datetime.now()) -> bool:
-        if not self._minute.match(when.minute):
-            return False
-        if not self._hour.match(when.hour):
-            return False
-        if not self._day_of_month.match(when.day):
-            return False
-        if not self._month.match(when.month):
-            return False
-        if not self._day_of_week.match(when.weekday() + 1):
-            return False
-        return True
+        # optional sixth field in front of the others is second
+        self._has_seconds = len(parts) == 6
+        self._second = self._compile(parts.pop(0) if self._has_seconds else "0", (0, 59))
+        self._minute = self._compile(parts[0], (0, 59))
+        self._hour = self._compile(parts[1], (0, 23))
+        self._day_of_month = self._compile(parts[2], (1, 31))
+        self._month = self._compile(parts[3], (1, 12))
+        day_of_week = Value.make(parts[4], (0, 7), self._AVAILABLE_VALUE_TYPES)
+        # Sunday can be written both as 0 and 7, it is matched as 7 (weekday() + 1)
+        self._day_of_week = Field(_SundayAsSeven(day_of_week), (1, 7))
+        self._fields = [self._second, self._minute, self._hour, self._day_of_month, self._month, self._day_of_week]
+
+    def _compile(self, token: str, allowed_range: Tuple[int, int]) -> Field:
+        return Field(Value.make(token, allowed_range, self._AVAILABLE_VALUE_TYPES), allowed_range)
+
+    @property
+    def resolution(self) -> timedelta:
+        return timedelta(seconds=1) if self._has_seconds else timedelta(minutes=1)
+
+    def should_run(self, when: Optional[datetime] = None) -> bool:
+        when = when or datetime.now()
+        return (
+            (not self._has_seconds or self._second.match(when.second))
+            and self._minute.match(when.minute)
+            and self._hour.match(when.hour)
+            and self._day_of_month.match(when.day)
+            and self._month.match(when.month)
+            and self._day_of_week.match(when.weekday() + 1)
+        )
+
+    def next_run(self, after: Optional[datetime] = None) -> Optional[datetime]:
+        after = after or datetime.now()
+        if any(field.is_empty for field in self._fields):
+            return None
+
+        candidate = next_tick(after, self.resolution)
+        last_year = candidate.year + self._SEARCH_YEARS
+
+        while candidate.year <= last_year:
+            month = self._month.next(candidate.month)
+            if month is None:
+                candidate = datetime(candidate.year + 1, self._month.first, 1)
+                continue
+            if month != candidate.month:
+                candidate = datetime(candidate.year, month, 1)
+
+            if not (self._day_of_month.match(candidate.day) and self._day_of_week.match(candidate.weekday() + 1)):
+                candidate = candidate.replace(hour=0, minute=0, second=0) + timedelta(days=1)
+                continue
+
+            hour = self._hour.next(candidate.hour)
+            if hour is None:
+                candidate = candidate.replace(hour=0, minute=0, second=0) + timedelta(days=1)
+                continue
+            if hour != candidate.hour:
+                candidate = candidate.replace(hour=hour, minute=0, second=0)
+
+            minute = self._minute.next(candidate.minute)
+            if minute is None:
+                candidate = candidate.replace(minute=0, second=0) + timedelta(hours=1)
+                continue
+            if minute != candidate.minute:
+                candidate = candidate.replace(minute=minute, second=0)
+
+            second = self._second.next(candidate.second)
+            if second is None:
+                candidate = candidate.replace(second=0) + timedelta(minutes=1)
+                continue
+            return candidate.replace(second=second)
+
+        return None
+
+
+class IntervalSchedule(BaseSchedule):
+    _PATTERN = re.compile(r"^every:?\s*((?:\d+\s*[smhd]\s*)+)$")
+    _PART_PATTERN = re.compile(r"(\d+)\s*([smhd])")
+    _UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+    def __init__(self, time_string: str):
+        match = self._PATTERN.match(time_string.strip().lower())
+        if match is None:
+            raise ValueError("Invalid interval format")
+        seconds = sum(int(count) * self._UNITS[unit] for count, unit in self._PART_PATTERN.findall(match.group(1)))
+        if seconds == 0:
+            raise ValueError("Interval must be longer than zero")
+        self._interval = timedelta(seconds=seconds)
+
+    @classmethod
+    def is_interval(cls, time_string: str) -> bool:
+        return time_string.strip().lower().startswith("every")
+
+    @property
+    def interval(self) -> timedelta:
+        return self._interval
+
+    @property
+    def resolution(self) -> timedelta:
+        return timedelta(seconds=1)
+
+    def should_run(self, when: Optional[datetime] = None) -> bool:
+        when = when or datetime.now()
+        return (when.replace(microsecond=0) - _EPOCH) % self._interval == timedelta(0)
+
+    def next_run(self, after: Optional[datetime] = None) -> Optional[datetime]:
+        # runs are aligned to multiples of the interval, so "every 15s" runs at :00, :15, :30 and :45
+        return next_tick(after or datetime.now(), self._interval)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def next_tick(after: datetime, step: timedelta) -> datetime:
+    return _EPOCH + ((after - _EPOCH) // step + 1) * step
+
+
+def make_schedule(time_string: str) -> BaseSchedule:
+    if IntervalSchedule.is_interval(time_string):
+        return IntervalSchedule(time_string)
+    return Schedule(time_string)
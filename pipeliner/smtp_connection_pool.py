@@ -0,0 +1,200 @@
+import logging
+import smtplib
+import ssl
+import time
+from email.message import Message
+from threading import Lock, Timer
+from typing import Dict, List, Tuple, Callable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+SmtpKey = Tuple[str, int, str, bool]
+
+
+class _IdleConnection(NamedTuple):
+    server: smtplib.SMTP
+    released_at: float
+
+
+class SmtpConnectionPool:
+    DEFAULT_MAX_IDLE_SECONDS = 60.0
+    DEFAULT_TIMEOUT = 30.0
+    _idle: Dict[SmtpKey, List[_IdleConnection]]
+
+    def __init__(self, max_idle_seconds: float = DEFAULT_MAX_IDLE_SECONDS, timeout: float = DEFAULT_TIMEOUT):
+        self._lock = Lock()
+        self._idle = {}
+        self._max_idle_seconds = max_idle_seconds
+        # without a timeout, a server which stops responding blocks the sending step forever
+        self._timeout = timeout
+        self._ssl_context = None
+
+    def send(self,
+             host: str,
+             port: int,
+             login: str,
+             password: str,
+             use_ssl: bool,
+             from_email: str,
+             to_emails: List[str],
+             message: Message) -> None:
+        key = (host, port, login, use_ssl)
+        server, is_reused = self._acquire(key, password)
+        try:
+            server.sendmail(from_email, to_emails, message.as_string().encode("ascii"))
+        except smtplib.SMTPServerDisconnected:
+            self._close(server)
+            if not is_reused:
+                raise
+            logger.info(f"Connection to {host}:{port} went stale, reconnecting")
+            server = self._connect(key, password)
+            try:
+                server.sendmail(from_email, to_emails, message.as_string().encode("ascii"))
+            except Exception:
+                self._close(server)
+                raise
+        except Exception:
+            self._close(server)
+            raise
+        self._release(key, server)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                self._close(connection.server)
+
+    def _acquire(self, key: SmtpKey, password: str) -> Tuple[smtplib.SMTP, bool]:
+        while True:
+            with self._lock:
+                connections = self._idle.get(key)
+                connection = connections.pop() if connections else None
+            if connection is None:
+                return self._connect(key, password), False
+            if self._is_alive(connection):
+                return connection.server, True
+            self._close(connection.server)
+
+    def _release(self, key: SmtpKey, server: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(_IdleConnection(server, time.monotonic()))
+
+    def _is_alive(self, connection: _IdleConnection) -> bool:
+        if time.monotonic() - connection.released_at > self._max_idle_seconds:
+            return False
+        try:
+            return connection.server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def _connect(self, key: SmtpKey, password: str) -> smtplib.SMTP:
+        host, port, login, use_ssl = key
+        logger.info(f"Connecting to SMTP server {host}:{port} as {login}")
+        if use_ssl:
+            server = smtplib.SMTP_SSL(host, port, context=self.ssl_context, timeout=self._timeout)
+            server.ehlo()
+        else:
+            server = smtplib.SMTP(host, port, timeout=self._timeout)
+            server.ehlo()
+            server.starttls(context=self.ssl_context)
+            server.ehlo()
+        try:
+            server.login(login, password)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        if self._ssl_context is None:
+            # certificates were never verified by the email steps, keep it that way
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            self._ssl_context = context
+        return self._ssl_context
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+class _DigestEntry(NamedTuple):
+    subject: str
+    body: str
+
+
+class EmailDigest:
+    SEPARATOR = "\n<hr>\n"
+    _entries: Dict[tuple, List[_DigestEntry]]
+    _senders: Dict[tuple, Callable[[str, str], None]]
+    _timers: Dict[tuple, Timer]
+    _windows: Dict[tuple, float]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries = {}
+        self._senders = {}
+        self._timers = {}
+        self._windows = {}
+
+    def add(self, key: tuple, window: float, subject: str, body: str, send: Callable[[str, str], None]) -> None:
+        with self._lock:
+            self._entries.setdefault(key, []).append(_DigestEntry(subject, body))
+            self._senders[key] = send
+            self._windows[key] = window
+            if key not in self._timers:
+                self._start_timer(key)
+
+    def flush(self) -> None:
+        with self._lock:
+            keys = list(self._timers)
+        for key in keys:
+            self._send_safely(key)
+
+    def _start_timer(self, key: tuple) -> None:
+        timer = Timer(self._windows[key], self._send_safely, args=(key,))
+        timer.daemon = True
+        self._timers[key] = timer
+        timer.start()
+
+    def _send_safely(self, key: tuple) -> None:
+        try:
+            self._send(key)
+        except Exception as e:
+            logger.error(f"Could not send email digest because {e}. Retrying with the next digest.")
+
+    def _send(self, key: tuple) -> None:
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            entries = self._entries.pop(key, [])
+            send = self._senders.get(key)
+        if timer is not None:
+            timer.cancel()
+        if not entries:
+            return
+
+        subject = entries[0].subject
+        if len(entries) > 1:
+            subject = f"{subject} (+{len(entries) - 1} more)"
+        try:
+            send(subject, self.SEPARATOR.join(entry.body for entry in entries))
+        except Exception:
+            # the messages were already accepted from their pipelines, so they are kept for the next window
+            with self._lock:
+                self._entries[key] = entries + self._entries.get(key, [])
+                if key not in self._timers:
+                    self._start_timer(key)
+            raise
+        logger.info(f"Email digest of {len(entries)} messages was sent successfully")
+
+
+smtp_connection_pool = SmtpConnectionPool()
+email_digest = EmailDigest()
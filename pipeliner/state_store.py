@@ -0,0 +1,204 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from threading import Lock, Condition, Thread
+from typing import Dict, Optional, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StoredState(NamedTuple):
+    digest: str
+    payload: Optional[bytes] = None
+
+
+class StateStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[StoredState]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, state: StoredState) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class MemoryStateStore(StateStore):
+    _states: Dict[str, StoredState]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._states = {}
+
+    def get(self, key: str) -> Optional[StoredState]:
+        with self._lock:
+            return self._states.get(key)
+
+    def put(self, key: str, state: StoredState) -> None:
+        with self._lock:
+            self._states[key] = state
+
+
+class BatchedStateStore(StateStore, ABC):
+    DEFAULT_FLUSH_INTERVAL = 1.0
+    _states: Dict[str, StoredState]
+    _pending: Dict[str, StoredState]
+
+    def __init__(self, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self._flush_interval = flush_interval
+        self._condition = Condition()
+        self._flush_lock = Lock()
+        self._states = self._load()
+        self._pending = {}
+        self._closed = False
+        self._writer = Thread(target=self._write_periodically, name=f"{self.__class__.__name__}Writer", daemon=True)
+        self._writer.start()
+
+    def get(self, key: str) -> Optional[StoredState]:
+        with self._condition:
+            return self._states.get(key)
+
+    def put(self, key: str, state: StoredState) -> None:
+        with self._condition:
+            self._states[key] = state
+            self._pending[key] = state
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._condition:
+                pending, self._pending = self._pending, {}
+            if pending:
+                self._write(pending)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer.join()
+        self.flush()
+
+    def _write_periodically(self) -> None:
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                self._condition.wait(self._flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Could not write state because {e}")
+
+    @abstractmethod
+    def _load(self) -> Dict[str, StoredState]:
+        pass
+
+    @abstractmethod
+    def _write(self, states: Dict[str, StoredState]) -> None:
+        pass
+
+
+class SqliteStateStore(BatchedStateStore):
+    def __init__(self, path: str, flush_interval: float = BatchedStateStore.DEFAULT_FLUSH_INTERVAL):
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, digest TEXT NOT NULL, payload BLOB)"
+        )
+        super().__init__(flush_interval)
+
+    def close(self) -> None:
+        super().close()
+        self._connection.close()
+
+    def _load(self) -> Dict[str, StoredState]:
+        return {
+            key: StoredState(digest, payload)
+            for key, digest, payload in self._connection.execute("SELECT key, digest, payload FROM state")
+        }
+
+    def _write(self, states: Dict[str, StoredState]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO state (key, digest, payload) VALUES (?, ?, ?)",
+                [(key, state.digest, state.payload) for key, state in states.items()]
+            )
+
+
+class FileStateStore(BatchedStateStore):
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, path: str, flush_interval: float = BatchedStateStore.DEFAULT_FLUSH_INTERVAL):
+        self._path = Path(path)
+        super().__init__(flush_interval)
+
+    def _load(self) -> Dict[str, StoredState]:
+        states = {}
+        records_count = 0
+        if self._path.is_file():
+            with open(str(self._path), encoding="utf8", mode="r") as state_file:
+                for line in state_file:
+                    if not line.strip():
+                        continue
+                    key, state = self._decode(line)
+                    states[key] = state
+                    records_count += 1
+
+        if records_count > max(2 * len(states), self.COMPACT_MIN_RECORDS):
+            self._compact(states)
+        return states
+
+    def _write(self, states: Dict[str, StoredState]) -> None:
+        with open(str(self._path), encoding="utf8", mode="a") as state_file:
+            state_file.writelines(self._encode(key, state) for key, state in states.items())
+
+    def _compact(self, states: Dict[str, StoredState]) -> None:
+        logger.info(f"Compacting state file {self._path}")
+        compacted_path = self._path.with_name(self._path.name + ".compact")
+        with open(str(compacted_path), encoding="utf8", mode="w") as state_file:
+            state_file.writelines(self._encode(key, state) for key, state in states.items())
+        os.replace(str(compacted_path), str(self._path))
+
+    @staticmethod
+    def _encode(key: str, state: StoredState) -> str:
+        payload = base64.b64encode(state.payload).decode("ascii") if state.payload is not None else None
+        return json.dumps({"key": key, "digest": state.digest, "payload": payload}) + "\n"
+
+    @staticmethod
+    def _decode(line: str) -> Tuple[str, StoredState]:
+        record = json.loads(line)
+        payload = base64.b64decode(record["payload"]) if record["payload"] is not None else None
+        return record["key"], StoredState(record["digest"], payload)
+
+
+_STATE_STORE_BACKENDS = {
+    "memory": MemoryStateStore,
+    "sqlite": SqliteStateStore,
+    "file": FileStateStore,
+}
+
+_state_store: StateStore = MemoryStateStore()
+
+
+def make_state_store(state_config: dict) -> StateStore:
+    params = dict(state_config)
+    backend = params.pop("backend", "memory")
+    if backend not in _STATE_STORE_BACKENDS:
+        raise ValueError(f"Unknown state backend: {backend}")
+    return _STATE_STORE_BACKENDS[backend](**params)
+
+
+def get_state_store() -> StateStore:
+    return _state_store
+
+
+def set_state_store(state_store: StateStore) -> None:
+    global _state_store
+    _state_store = state_store
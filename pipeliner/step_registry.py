@@ -0,0 +1,90 @@
+import importlib
+import inspect
+import logging
+import sys
+from importlib.metadata import entry_points
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Type, Callable, NamedTuple, List, Optional
+
+from pipeliner.steps import Step, BUILTIN_STEPS
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateStepError(ValueError):
+    pass
+
+
+class _StepSource(NamedTuple):
+    # where the step comes from, used to tell duplicates apart from re-exports of the same class
+    origin: str
+    load: Callable[[], Type[Step]]
+
+
+class StepRegistry:
+    ENTRY_POINT_GROUP = "pipeliner.steps"
+    _sources: Dict[str, _StepSource]
+    _classes: Dict[str, Type[Step]]
+
+    def __init__(self, builtin_steps: bool = True, entry_point_steps: bool = True):
+        self._lock = Lock()
+        self._sources = {}
+        self._classes = {}
+        if builtin_steps:
+            for name, module_name in BUILTIN_STEPS.items():
+                self.register_lazy(name, module_name)
+        if entry_point_steps:
+            self.register_entry_points()
+
+    def register_lazy(self, name: str, module_name: str) -> None:
+        def load() -> Type[Step]:
+            return getattr(importlib.import_module(module_name), name)
+
+        self._register(name, _StepSource(f"{module_name}.{name}", load))
+
+    def register(self, step_type: Type[Step], name: Optional[str] = None) -> None:
+        name = name or step_type.__name__
+        self._register(name, _StepSource(f"{step_type.__module__}.{step_type.__qualname__}", lambda: step_type))
+
+    def register_entry_points(self) -> None:
+        for entry_point in entry_points(group=self.ENTRY_POINT_GROUP):
+            module_name, _, attribute = entry_point.value.partition(":")
+            self._register(entry_point.name, _StepSource(f"{module_name}.{attribute}", entry_point.load))
+
+    def register_package(self, package_path: Path) -> None:
+        # custom steps are user code, the package is imported as before and its public step classes are registered
+        sys.path.append(str(package_path.parent))
+        package = importlib.import_module(package_path.name)
+        names = getattr(package, "__all__", None)
+        if names is None:
+            names = [name for name in vars(package) if not name.startswith("_")]
+        for name in names:
+            value = getattr(package, name)
+            if inspect.isclass(value) and issubclass(value, Step) and value is not Step:
+                self.register(value, name)
+
+    def get(self, name: str) -> Type[Step]:
+        step_type = self._classes.get(name)
+        if step_type is not None:
+            return step_type
+
+        source = self._sources.get(name)
+        if source is None:
+            raise ModuleNotFoundError(f"could not find step class: {name}")
+        logger.debug(f"Loading step {name} from {source.origin}")
+        step_type = source.load()
+        with self._lock:
+            self._classes[name] = step_type
+        return step_type
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self._sources)
+
+    def _register(self, name: str, source: _StepSource) -> None:
+        with self._lock:
+            registered = self._sources.get(name)
+            if registered is not None and registered.origin != source.origin:
+                raise DuplicateStepError(f"Step {name} is defined by both {registered.origin} and {source.origin}")
+            self._sources[name] = source
@@ -1,9 +1,42 @@
-from .step import Step
-from .get_html_element_text import GetHtmlElementText
-from .get_html_element import GetHtmlElement
-from .http_download import HttpDownload
-from .compare_with_previous import CompareWithPrevious
-from .send_email import SendEmailSsl, SendEmailTls
-from .do_nothing import DoNothing
-from .send_message import SendMessageFb
-from .make_data import ProduceText, PickRandomText
+import importlib
+from typing import Any, List
+
+from .step import Step, SkipRemainingSteps
+
+# step modules are imported on first use, so dependencies of steps no pipeline uses (lxml, fbchat...) are never loaded
+BUILTIN_STEPS = {
+    "ParseHtml": "pipeliner.steps.html_document",
+    "GetHtmlElementText": "pipeliner.steps.get_html_element_text",
+    "GetHtmlElementsText": "pipeliner.steps.get_html_element_text",
+    "GetHtmlElement": "pipeliner.steps.get_html_element",
+    "HttpDownload": "pipeliner.steps.http_download",
+    "HttpDownloadMany": "pipeliner.steps.http_download",
+    "CompareWithPrevious": "pipeliner.steps.compare_with_previous",
+    "Parallel": "pipeliner.steps.parallel",
+    "SendEmailSsl": "pipeliner.steps.send_email",
+    "SendEmailTls": "pipeliner.steps.send_email",
+    "DoNothing": "pipeliner.steps.do_nothing",
+    "SendMessageFb": "pipeliner.steps.send_message",
+    "ProduceText": "pipeliner.steps.make_data",
+    "PickRandomText": "pipeliner.steps.make_data",
+    "Collect": "pipeliner.steps.collect",
+}
+_OTHER_EXPORTS = {
+    "HtmlDocument": "pipeliner.steps.html_document",
+    "ResponseTooLarge": "pipeliner.steps.http_download",
+}
+
+__all__ = ["Step", "SkipRemainingSteps", *BUILTIN_STEPS, *_OTHER_EXPORTS]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = BUILTIN_STEPS.get(name) or _OTHER_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,28 @@
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+from pipeliner.steps import Step
+
+
+class Collect(Step):
+    mutates_input = False
+    aggregates_items = True
+
+    def __init__(self, batch_size: Optional[int] = None):
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self._batch_size = batch_size
+
+    def perform(self, data: Iterable[Any]) -> Union[List[Any], Iterator[List[Any]]]:
+        if self._batch_size is None:
+            return list(data)
+        return self._batches(data)
+
+    def _batches(self, items: Iterable[Any]) -> Iterator[List[Any]]:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == self._batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
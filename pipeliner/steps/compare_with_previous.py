@@ -1,31 +1,79 @@
+import hashlib
+import json
 import logging
-from typing import Any
+import pickle
+import zlib
+from typing import Any, Optional
 
+from pipeliner.cancellation import CancellationToken
+from pipeliner.state_store import StateStore, StoredState, MemoryStateStore, get_state_store
 from pipeliner.steps_factory import HasStepsFactoryMixin, StepsFactory
-from pipeliner.steps.step import Step
+from pipeliner.steps.step import Step, perform_step
 
 logger = logging.getLogger(__name__)
 
 
 class CompareWithPrevious(Step, HasStepsFactoryMixin):
+    cancellable = True
     _old_next_step: None or Step
+    _state_key: None or str
 
-    def __init__(self, factory: StepsFactory, when_same: dict, when_different: dict):
+    def __init__(self, factory: StepsFactory, when_same: dict, when_different: dict, keep_payload: bool = False):
         super().__init__(factory)
-        self._previous_data = None
+        self._keep_payload = keep_payload
+        self._state_key = None
+        self._unbound_store = MemoryStateStore()
 
         self._when_same = self._steps_factory.create_step(when_same)
         self._when_different = self._steps_factory.create_step(when_different)
+        self.mutates_input = self._when_same.mutates_input or self._when_different.mutates_input
 
-    def perform(self, data: Any) -> Any:
-        if self._previous_data is None:
-            self._previous_data = data
+    def bind(self, pipeline_name: str, position: str) -> None:
+        self._state_key = f"{pipeline_name}/{position}"
+        self._when_same.bind(pipeline_name, f"{position}.when_same")
+        self._when_different.bind(pipeline_name, f"{position}.when_different")
+
+    def perform(self, data: Any, cancellation: Optional[CancellationToken] = None) -> Any:
+        cancellation = cancellation or CancellationToken()
+        current = self._make_state(data)
+        previous = self._store.get(self._key)
+        if previous is None:
+            self._store.put(self._key, current)
             return data
 
-        if self._previous_data != data:
-            result = self._when_different.perform(data)
+        # the new state is kept only when the next step succeeds, so a failed notification is retried as a change
+        if previous.digest != current.digest:
+            result = perform_step(self._when_different, data, cancellation)
         else:
-            result = self._when_same.perform(data)
-
-        self._previous_data = data
+            result = perform_step(self._when_same, data, cancellation)
+        self._store.put(self._key, current)
         return result
+
+    @property
+    def previous_data(self) -> Any:
+        state = self._store.get(self._key)
+        if state is None or state.payload is None:
+            return None
+        return pickle.loads(zlib.decompress(state.payload))
+
+    @property
+    def _store(self) -> StateStore:
+        return self._unbound_store if self._state_key is None else get_state_store()
+
+    @property
+    def _key(self) -> str:
+        return self._state_key or ""
+
+    def _make_state(self, data: Any) -> StoredState:
+        payload = zlib.compress(pickle.dumps(data)) if self._keep_payload else None
+        return StoredState(self.digest(data), payload)
+
+    @staticmethod
+    def digest(data: Any) -> str:
+        if isinstance(data, bytes):
+            serialized = b"b:" + data
+        elif isinstance(data, str):
+            serialized = b"s:" + data.encode("utf-8", "surrogatepass")
+        else:
+            serialized = b"j:" + json.dumps(data, sort_keys=True, default=repr).encode("utf-8")
+        return hashlib.blake2b(serialized, digest_size=16).hexdigest()
@@ -4,5 +4,8 @@ from pipeliner.steps import Step
 
 
 class DoNothing(Step):
+    mutates_input = False
+    shareable = True
+
     def perform(self, data: Any) -> Any:
         return data
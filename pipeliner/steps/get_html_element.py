@@ -1,18 +1,30 @@
+import copy
 import logging
-from lxml import html
+from typing import Any
 
+from lxml import etree, html
+
+from pipeliner.steps.html_document import HtmlDocument
 from pipeliner.steps.step import Step
 
 logger = logging.getLogger(__name__)
 
 
 class GetHtmlElement(Step):
-    def __init__(self, element_xpath: str):
+    mutates_input = False
+    shareable = True
+
+    def __init__(self, element_xpath: str, as_document: bool = False):
         super().__init__()
-        self._element_xpath = element_xpath
+        self._element_xpath = etree.XPath(element_xpath)
+        self._as_document = as_document
+
+    def perform(self, data: Any) -> Any:
+        element = self._element_xpath(HtmlDocument.of(data).root)[0]
+        if self._as_document:
+            # a detached copy, so absolute XPaths of next steps search only the element like in its re-parsed string
+            return HtmlDocument(copy.deepcopy(element))
 
-    def perform(self, data: str) -> str:
-        root = html.fromstring(data)
-        element_content = html.tostring(root.xpath(self._element_xpath)[0], pretty_print=True).decode("utf-8")
+        element_content = html.tostring(element, pretty_print=True).decode("utf-8")
         logger.info(f"Found content: {element_content}")
         return element_content
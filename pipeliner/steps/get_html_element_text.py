@@ -1,18 +1,44 @@
 import logging
-from lxml import html
+from typing import Any, Dict
 
+from lxml import etree
+
+from pipeliner.steps.html_document import HtmlDocument
 from pipeliner.steps.step import Step
 
 logger = logging.getLogger(__name__)
 
 
 class GetHtmlElementText(Step):
+    mutates_input = False
+    shareable = True
+
     def __init__(self, element_xpath: str):
         super().__init__()
-        self._element_xpath = element_xpath
+        self._element_xpath = etree.XPath(element_xpath)
 
-    def perform(self, data: str) -> str:
-        root = html.fromstring(data)
-        element_content = root.xpath(self._element_xpath)[0].text.strip()
+    def perform(self, data: Any) -> str:
+        element_content = self._element_xpath(HtmlDocument.of(data).root)[0].text.strip()
         logger.info(f"Found content: {element_content}")
         return element_content
+
+
+class GetHtmlElementsText(Step):
+    mutates_input = False
+    shareable = True
+
+    def __init__(self, elements_xpaths: Dict[str, str]):
+        super().__init__()
+        self._elements_xpaths = {
+            name: etree.XPath(element_xpath)
+            for name, element_xpath in elements_xpaths.items()
+        }
+
+    def perform(self, data: Any) -> Dict[str, str]:
+        root = HtmlDocument.of(data).root
+        elements_content = {
+            name: element_xpath(root)[0].text.strip()
+            for name, element_xpath in self._elements_xpaths.items()
+        }
+        logger.info(f"Found content: {elements_content}")
+        return elements_content
@@ -0,0 +1,37 @@
+from typing import Any
+
+from lxml import html
+
+from pipeliner.steps.step import Step
+
+
+class HtmlDocument:
+    def __init__(self, root: html.HtmlElement):
+        self._root = root
+
+    @classmethod
+    def of(cls, data: Any) -> "HtmlDocument":
+        if isinstance(data, HtmlDocument):
+            return data
+        return cls(html.fromstring(data))
+
+    @property
+    def root(self) -> html.HtmlElement:
+        return self._root
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, HtmlDocument) and str(self) == str(other)
+
+    def __str__(self):
+        return html.tostring(self._root, encoding="unicode")
+
+    def __repr__(self):
+        return f"HtmlDocument({self})"
+
+
+class ParseHtml(Step):
+    mutates_input = False
+    shareable = True
+
+    def perform(self, data: Any) -> HtmlDocument:
+        return HtmlDocument.of(data)
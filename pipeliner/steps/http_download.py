@@ -1,19 +1,341 @@
 import logging
-from typing import Any
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, List, Dict, Tuple, Mapping
+from urllib.parse import urlsplit
 
-import requests
+from lxml import etree
 
-from pipeliner.steps.step import Step
+from pipeliner.cancellation import CancellationToken
+from pipeliner.circuit_breaker import circuit_breakers, CircuitOpen
+from pipeliner.coalescing import SingleFlight
+from pipeliner.http_session_pool import http_session_pool
+from pipeliner.steps.html_document import HtmlDocument
+from pipeliner.steps.step import Step, SkipRemainingSteps
 
 logger = logging.getLogger(__name__)
 
+# identical requests made at the same time (e.g. the same page downloaded by several pipelines) are sent only once
+_downloads = SingleFlight()
+
+
+class ResponseTooLarge(Exception):
+    pass
+
 
 class HttpDownload(Step):
-    def __init__(self, url: str, headers: dict):
+    mutates_input = False
+    cancellable = True
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(self,
+                 url: str,
+                 headers: dict,
+                 timeout: Optional[float] = None,
+                 skip_unchanged: bool = False,
+                 until_xpath: Optional[str] = None,
+                 max_body_size: Optional[int] = None):
         super().__init__()
         self._url = url
         self._headers = headers
+        self._timeout = timeout
+        self._skip_unchanged = skip_unchanged
+        self._until_xpath = etree.XPath(until_xpath) if until_xpath is not None else None
+        if self._until_xpath is not None and not isinstance(self._until_xpath(etree.Element("html")), list):
+            raise ValueError(f"until_xpath {until_xpath} has to select elements, text or attributes")
+        self._until_tag, self._until_candidate = _candidate_test(until_xpath) if until_xpath is not None else (None, None)
+        self._max_body_size = max_body_size
+        self._etag = None
+        self._last_modified = None
+        self._cached_content = None
+
+    @property
+    def target_host(self) -> Optional[str]:
+        return urlsplit(self._url).netloc
+
+    @property
+    def shareable(self) -> bool:
+        # skipping depends on what this step has seen before
+        return not self._skip_unchanged
 
-    def perform(self, data: Any) -> str:
+    def perform(self, data: Any, cancellation: Optional[CancellationToken] = None) -> Any:
         logger.info(f"Downloading {self._url} with headers {self._headers}")
-        return requests.get(self._url, headers=self._headers).content
+        status_code, headers, content = self._download(self._conditional_headers(), cancellation or CancellationToken())
+        if status_code == 304 and self._cached_content is not None:
+            if self._skip_unchanged:
+                raise SkipRemainingSteps(f"{self._url} was not modified")
+            logger.info(f"{self._url} was not modified, using cached content")
+            return self._cached_content
+
+        self._remember(status_code, headers, content)
+        return content
+
+    def _download(self, headers: dict, cancellation: CancellationToken) -> Tuple[int, Mapping[str, str], Any]:
+        if self._until_xpath is not None:
+            # the parsed document is not shared, steps after this one could change it
+            return self._fetch(headers, cancellation)
+        # a cancelled download fails also for pipelines waiting for it, they download the page again when retried
+        key = ("page", self._url, tuple(sorted(headers.items())), self._timeout, self._max_body_size)
+        return _downloads.do(key, lambda: self._fetch(headers, cancellation))
+
+    def _fetch(self, headers: dict, cancellation: CancellationToken) -> Tuple[int, Mapping[str, str], Any]:
+        cancellation.raise_if_cancelled()
+        response = http_session_pool.get(self._url, headers=headers, timeout=self._timeout, stream=True)
+        try:
+            if response.status_code == 304 and self._cached_content is not None:
+                return response.status_code, response.headers, None
+            if self._until_xpath is not None:
+                return response.status_code, response.headers, self._parse_until_element(response, cancellation)
+            return response.status_code, response.headers, self._read(response, cancellation)
+        finally:
+            response.close()
+
+    def _read(self, response, cancellation: CancellationToken) -> bytes:
+        if self._max_body_size is None:
+            return response.content
+
+        self._check_content_length(response)
+        content = bytearray()
+        for chunk in response.iter_content(self.CHUNK_SIZE):
+            cancellation.raise_if_cancelled()
+            content += chunk
+            self._check_size(len(content))
+        return bytes(content)
+
+    def _parse_until_element(self, response, cancellation: CancellationToken) -> HtmlDocument:
+        # only completed elements which can match the XPath are tested, the whole XPath runs just when one turns up
+        parser = etree.HTMLPullParser(events=("end",), tag=self._until_tag)
+        size = 0
+        root = None
+        found = False
+        for chunk in response.iter_content(self.CHUNK_SIZE):
+            cancellation.raise_if_cancelled()
+            size += len(chunk)
+            self._check_size(size)
+            parser.feed(chunk)
+
+            ended = [element for _, element in parser.read_events()]
+            if ended:
+                root = ended[-1].getroottree().getroot()
+                found = found or self._has_candidate(ended)
+            if found:
+                if self._is_element_complete(root):
+                    logger.info(f"Found element after {size} bytes, stopping download of {self._url}")
+                    break
+                # a candidate which does not match the whole XPath is forgotten, a match waits for more content
+                found = bool(self._until_xpath(root))
+
+        return HtmlDocument(parser.close())
+
+    def _has_candidate(self, ended: list) -> bool:
+        if self._until_candidate is None:
+            return True
+        # one query per subtree completed in this chunk is much cheaper than one per element
+        ended_set = set(ended)
+        return any(self._until_candidate(element) for element in ended if element.getparent() not in ended_set)
+
+    def _is_element_complete(self, root) -> bool:
+        found = self._until_xpath(root)
+        if not found:
+            return False
+
+        # the parser has already moved past the element when anything follows it in the document,
+        # selected text or attribute is tested by the element it belongs to
+        element = found[0].getparent() if isinstance(found[0], str) else found[0]
+        while element is not None:
+            if element.getnext() is not None:
+                return True
+            element = element.getparent()
+        return False
+
+    def _check_content_length(self, response) -> None:
+        content_length = response.headers.get("Content-Length")
+        if content_length is not None and content_length.isdigit():
+            self._check_size(int(content_length))
+
+    def _check_size(self, size: int) -> None:
+        if self._max_body_size is not None and size > self._max_body_size:
+            raise ResponseTooLarge(f"{self._url} is larger than {self._max_body_size} bytes")
+
+    def _conditional_headers(self) -> dict:
+        if self._cached_content is None:
+            return self._headers
+
+        headers = dict(self._headers)
+        if self._etag is not None:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified is not None:
+            headers["If-Modified-Since"] = self._last_modified
+        return headers
+
+    def _remember(self, status_code: int, headers: Mapping[str, str], content: Any) -> None:
+        self._etag = None
+        self._last_modified = None
+        self._cached_content = None
+        if status_code != 200:
+            return
+
+        self._etag = headers.get("ETag")
+        self._last_modified = headers.get("Last-Modified")
+        if self._etag is not None or self._last_modified is not None:
+            self._cached_content = content
+
+
+_STEP = re.compile(r"(?:(?:child|descendant|descendant-or-self)::)?([A-Za-z_][\w.-]*|\*)")
+_UNSAFE_PREDICATE = re.compile(r"/|following|position\(|last\(|^\s*\d+\s*$")
+
+
+def _candidate_test(xpath: str) -> Tuple[Optional[str], Optional[etree.XPath]]:
+    # a necessary condition for an element (or its descendants) to be matched by the XPath: tag and predicates of its last step
+    # (without positions and predicates which could change with the rest of the page), None when it is unknown
+    path = xpath.strip()
+    outer = _split_brackets(path)
+    if outer is not None and outer[0].startswith("(") and outer[0].endswith(")"):
+        path = outer[0][1:-1].strip()
+    if _split_top_level(path, "|") != [path]:
+        return None, None
+    last_step = _split_top_level(path, "/")[-1]
+    parts = _split_brackets(last_step)
+    if parts is None:
+        return None, None
+    node_test, predicates = parts
+    match = _STEP.fullmatch(node_test.strip())
+    if match is None:
+        return None, None
+    tag = match.group(1) if match.group(1) != "*" else None
+    kept = "".join(f"[{predicate}]" for predicate in predicates if not _UNSAFE_PREDICATE.search(predicate))
+    if not kept:
+        return tag, None
+    try:
+        return tag, etree.XPath(f"descendant-or-self::{match.group(1)}{kept}")
+    except etree.XPathSyntaxError:
+        return tag, None
+
+
+def _split_top_level(expression: str, separator: str) -> List[str]:
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for index, character in enumerate(expression):
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in "\"'":
+            quote = character
+        elif character in "[(":
+            depth += 1
+        elif character in "])":
+            depth -= 1
+        elif character == separator and depth == 0:
+            parts.append(expression[start:index])
+            start = index + 1
+    parts.append(expression[start:])
+    return parts
+
+
+def _split_brackets(step: str) -> Optional[Tuple[str, List[str]]]:
+    # "name[a][b]" -> ("name", ["a", "b"]), None when the step is not of this form
+    head = None
+    predicates = []
+    depth = 0
+    quote = None
+    start = 0
+    for index, character in enumerate(step):
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in "\"'":
+            quote = character
+        elif character in "[(":
+            if depth == 0 and character == "[":
+                if head is None:
+                    head = step[:index]
+                start = index + 1
+            depth += 1
+        elif character in "])":
+            depth -= 1
+            if depth == 0 and character == "]":
+                predicates.append(step[start:index])
+        elif depth == 0 and head is not None and not character.isspace():
+            return None
+    if head is None:
+        return step, []
+    return head, predicates
+
+
+class HttpDownloadMany(Step):
+    mutates_input = False
+    shareable = True
+    cancellable = True
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    def __init__(self,
+                 urls: Optional[List[str]] = None,
+                 headers: Optional[dict] = None,
+                 timeout: Optional[float] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_body_size: Optional[int] = None):
+        super().__init__()
+        self._urls = urls
+        self._headers = headers or {}
+        self._timeout = timeout
+        self._max_body_size = max_body_size
+        # connections are shared with other HTTP steps through the session pool, this only bounds the requests in flight
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="HttpDownloadMany")
+
+    def perform(self, data: Any, cancellation: Optional[CancellationToken] = None) -> Dict[str, dict]:
+        cancellation = cancellation or CancellationToken()
+        urls = self._urls if self._urls is not None else data
+        if not isinstance(urls, (list, tuple)) or not all(isinstance(url, str) for url in urls):
+            raise ValueError(f"{self} expects a list of URLs, got {type(urls).__name__}")
+
+        urls = list(dict.fromkeys(urls))
+        logger.info(f"Downloading {len(urls)} URLs with headers {self._headers}")
+        # URLs which have not started yet when the step is cancelled are not downloaded at all
+        results = self._executor.map(lambda url: self._download(url, cancellation), urls)
+        return dict(zip(urls, results))
+
+    def _download(self, url: str, cancellation: CancellationToken) -> dict:
+        cancellation.raise_if_cancelled()
+        key = ("batch", url, tuple(sorted(self._headers.items())), self._timeout, self._max_body_size)
+        return dict(_downloads.do(key, lambda: self._fetch(url)))
+
+    def _fetch(self, url: str) -> dict:
+        # a failing URL is reported in the result so the rest of the batch is still usable
+        circuit_breaker = circuit_breakers.get(urlsplit(url).netloc)
+        try:
+            if not circuit_breaker.allow():
+                raise CircuitOpen(f"requests to {urlsplit(url).netloc} are failing, not trying for now")
+            response = http_session_pool.get(url, headers=self._headers, timeout=self._timeout, stream=True)
+        except CircuitOpen as e:
+            logger.warning(f"Could not download {url} because {e}")
+            return {"status": None, "error": str(e)}
+        except Exception as e:
+            circuit_breaker.record_failure()
+            logger.warning(f"Could not download {url} because {e}")
+            return {"status": None, "error": str(e)}
+
+        try:
+            # a server error counts against the host even though the response is still returned
+            if response.status_code >= 500:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+            return {"status": response.status_code, "body": self._read(url, response)}
+        except Exception as e:
+            logger.warning(f"Could not read {url} because {e}")
+            return {"status": response.status_code, "error": str(e)}
+        finally:
+            response.close()
+
+    def _read(self, url: str, response) -> bytes:
+        if self._max_body_size is None:
+            return response.content
+
+        content = bytearray()
+        for chunk in response.iter_content(HttpDownload.CHUNK_SIZE):
+            content += chunk
+            if len(content) > self._max_body_size:
+                raise ResponseTooLarge(f"{url} is larger than {self._max_body_size} bytes")
+        return bytes(content)
@@ -8,6 +8,9 @@ logger = logging.getLogger(__name__)
 
 
 class ProduceText(Step):
+    mutates_input = False
+    shareable = True
+
     def __init__(self, text: str):
         self._text = text
 
@@ -17,6 +20,8 @@ class ProduceText(Step):
 
 
 class PickRandomText(Step):
+    mutates_input = False
+
     def __init__(self, choices: List[str]):
         self._choices = choices
 
@@ -0,0 +1,107 @@
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION, ALL_COMPLETED, Future
+from typing import Any, List, Dict, Union, Optional
+
+from pipeliner.cancellation import CancellationToken, call_with_timeout
+from pipeliner.steps_factory import HasStepsFactoryMixin, StepsFactory
+from pipeliner.steps.step import Step, is_immutable, perform_step
+
+logger = logging.getLogger(__name__)
+
+
+class Parallel(Step, HasStepsFactoryMixin):
+    mutates_input = False
+    cancellable = True
+    _branches: List[List[Step]]
+    _names: None or List[str]
+
+    def __init__(self,
+                 factory: StepsFactory,
+                 branches: Union[List[list], Dict[str, list]],
+                 max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 fail_fast: bool = True):
+        super().__init__(factory)
+        if isinstance(branches, dict):
+            self._names = list(branches.keys())
+            branches = list(branches.values())
+        else:
+            self._names = None
+
+        self._branches = [
+            self._steps_factory.create(branch)
+            for branch in branches
+        ]
+        self._timeout = timeout
+        self._fail_fast = fail_fast
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(len(self._branches), 1),
+            thread_name_prefix="ParallelBranch"
+        )
+
+    def bind(self, pipeline_name: str, position: str) -> None:
+        for branch_name, branch in zip(self._branch_names, self._branches):
+            for step_position, step in enumerate(branch):
+                step.bind(pipeline_name, f"{position}.{branch_name}.{step_position}")
+
+    def perform(self, data: Any, cancellation: Optional[CancellationToken] = None) -> Any:
+        cancellation = cancellation or CancellationToken()
+        # every branch has its own token, so a branch which has timed out or is not needed any more can be stopped
+        tokens = [cancellation.child() for _ in self._branches]
+        futures = [
+            self._executor.submit(self._run_branch, name, branch, data, token)
+            for name, branch, token in zip(self._branch_names, self._branches, tokens)
+        ]
+        wait(futures, return_when=FIRST_EXCEPTION if self._fail_fast else ALL_COMPLETED)
+        for future, token in zip(futures, tokens):
+            if not future.done():
+                # branches which are still running stop at their next step or cancellable point
+                future.cancel()
+                token.cancel(f"{self} has stopped waiting for its branches")
+            cancellation.detach(token)
+
+        if self._fail_fast:
+            self._raise_first_failure(futures)
+        results = [self._branch_result(name, future) for name, future in zip(self._branch_names, futures)]
+
+        if self._names is None:
+            return results
+        return dict(zip(self._names, results))
+
+    @staticmethod
+    def _raise_first_failure(futures: List[Future]) -> None:
+        failed = [future for future in futures if future.done() and not future.cancelled() and future.exception()]
+        if failed:
+            raise failed[0].exception()
+
+    @property
+    def _branch_names(self) -> List[str]:
+        return self._names or [str(index) for index in range(len(self._branches))]
+
+    def _branch_result(self, name: str, future: Future) -> Any:
+        if future.exception() is not None:
+            logger.warning(f"Branch {name} of {self} has failed because {future.exception()}")
+            return future.exception()
+        return future.result()
+
+    def _run_branch(self, name: str, branch: List[Step], data: Any, cancellation: CancellationToken) -> Any:
+        # the timeout counts from the start of the branch, so branches waiting for a worker do not lose their time
+        if self._timeout is None:
+            return self._perform_branch(branch, data, cancellation)
+        return call_with_timeout(
+            lambda: self._perform_branch(branch, data, cancellation),
+            self._timeout,
+            cancellation,
+            f"Branch {name} of {self}"
+        )
+
+    @staticmethod
+    def _perform_branch(branch: List[Step], data: Any, cancellation: CancellationToken) -> Any:
+        # steps which do not mutate pass the shared input through, so any mutating step of the branch needs a copy
+        if any(step.mutates_input for step in branch) and not is_immutable(data):
+            data = copy.deepcopy(data)
+        for step in branch:
+            cancellation.raise_if_cancelled()
+            data = perform_step(step, data, cancellation)
+        return data
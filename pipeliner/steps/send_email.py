@@ -1,16 +1,18 @@
 import logging
-import smtplib
-import ssl
 from email.header import Header
 from email.mime.text import MIMEText
-from typing import List
+from typing import List, Optional
 
+from pipeliner.smtp_connection_pool import smtp_connection_pool, email_digest
 from pipeliner.steps.step import Step
 
 logger = logging.getLogger(__name__)
 
 
-class SendEmailTls(Step):
+class _SendEmail(Step):
+    mutates_input = False
+    _USE_SSL: bool
+
     def __init__(self,
                  smtp_host: str,
                  smtp_port: int,
@@ -18,7 +20,8 @@ class SendEmailTls(Step):
                  password: str,
                  from_email: str,
                  to_emails: List[str],
-                 subject: str):
+                 subject: str,
+                 digest_window: Optional[float] = None):
         super().__init__()
         self._smtp_host = smtp_host
         self._smtp_port = smtp_port
@@ -27,55 +30,53 @@ class SendEmailTls(Step):
         self._from_email = from_email
         self._to_emails = to_emails
         self._subject = subject
+        self._digest_window = digest_window
 
     def perform(self, data: str) -> str:
-        context = ssl.SSLContext(ssl.PROTOCOL_TLS)
-        with smtplib.SMTP(self._smtp_host, self._smtp_port) as server:
-            server.ehlo()
-            server.starttls(context=context)
-            server.ehlo()
-            server.login(self._login, self._password)
+        if self._digest_window is None:
+            self._send(self._subject, data)
+            logger.info("Email was sent successfully")
+        else:
+            email_digest.add(self._digest_key, self._digest_window, self._subject, data, self._send)
+            logger.info(f"Email was added to digest which will be sent within {self._digest_window} seconds")
+        return data
 
-            message = MIMEText(data, "html", "utf-8")
-            message["Subject"] = Header(self._subject, "utf-8")
-            message["From"] = self._from_email
-            message["To"] = ",".join(self._to_emails)
+    @property
+    def target_host(self) -> Optional[str]:
+        return self._smtp_host
 
-            server.sendmail(self._from_email, self._to_emails, message.as_string().encode("ascii"))
+    @property
+    def _digest_key(self) -> tuple:
+        return (
+            self._smtp_host,
+            self._smtp_port,
+            self._login,
+            self._USE_SSL,
+            self._from_email,
+            tuple(sorted(self._to_emails))
+        )
 
-        logger.info("Email was sent successfully")
-        return data
+    def _send(self, subject: str, body: str) -> None:
+        message = MIMEText(body, "html", "utf-8")
+        message["Subject"] = Header(subject, "utf-8")
+        message["From"] = self._from_email
+        message["To"] = ",".join(self._to_emails)
 
+        smtp_connection_pool.send(
+            self._smtp_host,
+            self._smtp_port,
+            self._login,
+            self._password,
+            self._USE_SSL,
+            self._from_email,
+            self._to_emails,
+            message
+        )
 
-class SendEmailSsl(Step):
-    def __init__(self,
-                 smtp_host: str,
-                 smtp_port: int,
-                 login: str,
-                 password: str,
-                 from_email: str,
-                 to_emails: List[str],
-                 subject: str):
-        super().__init__()
-        self._smtp_host = smtp_host
-        self._smtp_port = smtp_port
-        self._login = login
-        self._password = password
-        self._from_email = from_email
-        self._to_emails = to_emails
-        self._subject = subject
 
-    def perform(self, data: str) -> str:
-        with smtplib.SMTP_SSL(self._smtp_host, self._smtp_port) as server:
-            server.ehlo()
-            server.login(self._login, self._password)
+class SendEmailTls(_SendEmail):
+    _USE_SSL = False
 
-            message = MIMEText(data, "html", "utf-8")
-            message["Subject"] = Header(self._subject, "utf-8")
-            message["From"] = self._from_email
-            message["To"] = ",".join(self._to_emails)
 
-            server.sendmail(self._from_email, self._to_emails, message.as_string().encode("ascii"))
-
-        logger.info("Email was sent successfully")
-        return data
+class SendEmailSsl(_SendEmail):
+    _USE_SSL = True
@@ -7,6 +7,8 @@ logger = logging.getLogger(__name__)
 
 
 class SendMessageFb(Step):
+    mutates_input = False
+
     def __init__(self, login: str, password: str, to_user_name: str):
         self._login = login
         self._password = password
@@ -1,11 +1,163 @@
+import copy
+import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional
+
+from pipeliner.cancellation import CancellationToken, Cancelled, call_with_timeout
+from pipeliner.circuit_breaker import circuit_breakers, CircuitOpen
+from pipeliner.retry_policy import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+def is_immutable(data: Any) -> bool:
+    if isinstance(data, _IMMUTABLE_TYPES):
+        return True
+    if isinstance(data, tuple):
+        return all(is_immutable(item) for item in data)
+    return False
+
+
+class SkipRemainingSteps(Exception):
+    pass
 
 
 class Step(ABC):
+    # steps which never modify their input data in place can set this to False to avoid copying it
+    mutates_input = True
+    # aggregating steps get all items of a streaming pipeline at once (as an iterable) instead of one by one
+    aggregates_items = False
+    # steps whose result depends only on their config and input can run once for pipelines starting with them
+    shareable = False
+    # set by the steps factory from "retry" field of the step config, pipeline's policy is used when None
+    retry_policy: Optional[RetryPolicy] = None
+    # set by the steps factory from "timeout" field of the step config
+    timeout: Optional[float] = None
+    # steps which can stop early get a CancellationToken as the second argument of perform
+    cancellable = False
+
     @abstractmethod
     def perform(self, data: Any) -> Any:
         pass
 
+    def bind(self, pipeline_name: str, position: str) -> None:
+        pass
+
+    @property
+    def target_host(self) -> Optional[str]:
+        return None
+
     def __str__(self):
         return self.__class__.__name__
+
+
+class StepAttempts:
+    # collects what happened to the attempts of a step, the pipeline extends it to record metrics
+    def __init__(self):
+        self.count = 0
+        self.outcome = "failure"
+        self.result = None
+
+    def attempt_finished(self, outcome: str, duration: float, result: Any = None) -> None:
+        pass
+
+    def retrying(self) -> None:
+        pass
+
+    def failed(self) -> None:
+        pass
+
+    def snapshot(self, step: Step, data: Any, is_retry_possible: bool) -> Any:
+        return snapshot_input(step, data, is_retry_possible)
+
+
+def snapshot_input(step: Step, data: Any, is_retry_possible: bool) -> Any:
+    # a copy to retry with is needed only when the step can change its input in place
+    if is_retry_possible and step.mutates_input and not is_immutable(data):
+        return copy.deepcopy(data)
+    return data
+
+
+# nested steps are retried only when they have their own policy, the step containing them is retried anyway
+_SINGLE_ATTEMPT = RetryPolicy(max_attempts=1)
+
+
+def perform_step(step: Step,
+                 data: Any,
+                 cancellation: CancellationToken,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 attempts: Optional[StepAttempts] = None,
+                 description: Optional[str] = None) -> Any:
+    retry_policy = retry_policy or step.retry_policy or _SINGLE_ATTEMPT
+    attempts = attempts or StepAttempts()
+    description = description or str(step)
+    circuit_breaker = circuit_breakers.get(step.target_host) if step.target_host else None
+    logger.info(f"Starting step {description}.")
+
+    for attempt in range(1, retry_policy.max_attempts + 1):
+        attempts.count = attempt
+        cancellation.raise_if_cancelled()
+        if circuit_breaker is not None and not circuit_breaker.allow():
+            attempts.failed()
+            raise CircuitOpen(f"requests to {step.target_host} are failing, not trying for now")
+
+        is_retry_possible = attempt < retry_policy.max_attempts
+        snapshot = attempts.snapshot(step, data, is_retry_possible)
+        started = time.perf_counter()
+        try:
+            result = _perform_with_timeout(step, data, cancellation)
+            attempts.attempt_finished("success", time.perf_counter() - started, result)
+            if circuit_breaker is not None:
+                circuit_breaker.record_success()
+            logger.info(f"Finished step {description}.")
+            attempts.outcome = "success"
+            attempts.result = result
+            return result
+        except SkipRemainingSteps:
+            attempts.outcome = "skipped"
+            attempts.attempt_finished("skipped", time.perf_counter() - started)
+            if circuit_breaker is not None:
+                circuit_breaker.record_success()
+            raise
+        except Exception as e:
+            attempts.attempt_finished("failure", time.perf_counter() - started)
+            if cancellation.cancelled:
+                attempts.outcome = "cancelled"
+                if circuit_breaker is not None:
+                    circuit_breaker.release()
+                raise e
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            if not is_retry_possible:
+                attempts.failed()
+                logger.error(f"Step {description} failed too many times.")
+                raise e
+            if not retry_policy.is_retryable(e):
+                attempts.failed()
+                logger.error(f"Step {description} failed and will not be retried.")
+                raise e
+
+            attempts.retrying()
+            delay = retry_policy.delay(attempt)
+            logger.warning(f"Failed step {description}. Retrying in {delay:.1f} seconds...")
+            if cancellation.wait(delay):
+                raise Cancelled(cancellation.reason)
+            data = snapshot
+
+
+def _perform_with_timeout(step: Step, data: Any, cancellation: CancellationToken) -> Any:
+    # steps with a timeout run in their own thread so a hung call does not block the pipeline
+    if step.timeout is None:
+        return _perform(step, data, cancellation)
+    token = cancellation.child()
+    try:
+        return call_with_timeout(lambda: _perform(step, data, token), step.timeout, token, str(step))
+    finally:
+        cancellation.detach(token)
+
+
+def _perform(step: Step, data: Any, token: CancellationToken) -> Any:
+    return step.perform(data, token) if step.cancellable else step.perform(data)
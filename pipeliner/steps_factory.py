@@ -1,9 +1,9 @@
-import importlib
-import sys
 from abc import abstractmethod, ABC
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
+from pipeliner.retry_policy import RetryPolicy
+from pipeliner.step_registry import StepRegistry
 from pipeliner.steps import Step
 
 
@@ -23,9 +23,14 @@ class HasStepsFactoryMixin:
 
 
 class StepsFactoryWithCustomSteps(StepsFactory):
-    def __init__(self, custom_steps_path: Path):
+    def __init__(self, custom_steps_path: Path, registry: Optional[StepRegistry] = None):
         self._custom_steps_path = custom_steps_path
-        self._import_steps_modules()
+        self._registry = registry or StepRegistry()
+        self._registry.register_package(custom_steps_path)
+
+    @property
+    def registry(self) -> StepRegistry:
+        return self._registry
 
     def create(self, steps_config: list) -> List[Step]:
         return [
@@ -33,34 +38,17 @@ class StepsFactoryWithCustomSteps(StepsFactory):
             for step_config in steps_config
         ]
 
-    def _import_steps_modules(self) -> None:
-        self._import_steps_module(self._custom_steps_path)
-        steps_path = Path(__file__).resolve().parent / "steps"
-        self._import_steps_module(steps_path)
-
-    def _import_steps_module(self, module_path: Path) -> None:
-        sys.path.append(str(module_path.parent))
-        custom_steps_module = importlib.import_module(str(module_path.name))
-        if "__all__" in custom_steps_module.__dict__:
-            custom_steps = custom_steps_module.__dict__["__all__"]
-        else:
-            custom_steps = (
-                custom_step
-                for custom_step in custom_steps_module.__dict__
-                if not custom_step.startswith("_")
-            )
-        globals().update({
-            key: getattr(custom_steps_module, key)
-            for key in custom_steps
-        })
-
     def create_step(self, step_config: dict) -> Step:
-        if step_config["class"] not in globals():
-            raise ModuleNotFoundError(f"could not find step class: {step_config['class']}")
-        StepType = globals()[step_config["class"]]
+        StepType = self._registry.get(step_config["class"])
         params = step_config.get("params", dict())
 
         if issubclass(StepType, HasStepsFactoryMixin):
-            return StepType(self, **params)
+            step = StepType(self, **params)
+        else:
+            step = StepType(**params)
 
-        return StepType(**params)
+        if "retry" in step_config:
+            step.retry_policy = RetryPolicy(**step_config["retry"])
+        if "timeout" in step_config:
+            step.timeout = float(step_config["timeout"])
+        return step
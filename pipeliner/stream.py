@@ -0,0 +1,43 @@
+import queue
+from typing import Any, Iterator
+
+from pipeliner.cancellation import CancellationToken
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+_END = object()
+
+
+class ItemQueue:
+    # blocked steps wake up regularly to notice that another step of the stream has failed
+    POLL_SECONDS = 0.1
+
+    def __init__(self, max_size: int, cancellation: CancellationToken):
+        self._queue = queue.Queue(max_size)
+        self._cancellation = cancellation
+
+    def put(self, item: Any) -> None:
+        while not self._cancellation.cancelled:
+            try:
+                self._queue.put(item, timeout=self.POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+        raise StreamCancelled()
+
+    def close(self) -> None:
+        self.put(_END)
+
+    def __iter__(self) -> Iterator[Any]:
+        while not self._cancellation.cancelled:
+            try:
+                item = self._queue.get(timeout=self.POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            yield item
+        raise StreamCancelled()
@@ -0,0 +1,179 @@
+import fnmatch
+import hmac
+import json
+import logging
+import os
+from email.message import Message
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from threading import Thread, Event
+from typing import Dict, Tuple, Any, Optional, List
+from urllib.parse import unquote
+
+from pipeliner.config_reload import PipelineSet
+from pipeliner.pipeline_scheduler import PipelineScheduler
+
+logger = logging.getLogger(__name__)
+
+FileSignatures = Dict[str, Tuple[int, int]]
+
+
+class WebhookServer:
+    PATH_PREFIX = "/pipelines/"
+    DEFAULT_MAX_BODY_SIZE = 1024 * 1024
+
+    def __init__(self,
+                 pipeline_set: PipelineSet,
+                 scheduler: PipelineScheduler,
+                 host: str = "127.0.0.1",
+                 port: int = 8080,
+                 max_body_size: int = DEFAULT_MAX_BODY_SIZE):
+        webhook_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                status, message = webhook_server._handle(self)
+                body = json.dumps({"message": message}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._pipeline_set = pipeline_set
+        self._scheduler = scheduler
+        self._max_body_size = max_body_size
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        logger.info(f"Listening for webhooks on port {self.port}")
+        self._thread = Thread(target=self._server.serve_forever, name="WebhookServer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> Tuple[int, str]:
+        path = request.path.split("?")[0]
+        if not path.startswith(self.PATH_PREFIX):
+            return 404, "Not found"
+        name = unquote(path[len(self.PATH_PREFIX):])
+        triggers = [
+            trigger for pipeline_name, trigger in self._pipeline_set.triggers("webhook") if pipeline_name == name
+        ]
+        pipeline = self._pipeline_set.get(name)
+        # only pipelines with a webhook trigger can be run from outside
+        if not triggers or pipeline is None:
+            return 404, f"Pipeline \"{name}\" has no webhook trigger"
+        if not any(self._is_authorized(request, trigger) for trigger in triggers):
+            return 401, "Invalid token"
+
+        try:
+            content_length = int(request.headers.get("Content-Length") or 0)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            return 400, "Invalid Content-Length header"
+        if content_length > self._max_body_size:
+            return 413, f"Body is larger than {self._max_body_size} bytes"
+        try:
+            data = self._decode_body(request.rfile.read(content_length), request.headers)
+        except ValueError as e:
+            return 400, f"Invalid body: {e}"
+
+        if not self._scheduler.trigger(pipeline, data):
+            return 409, f"Pipeline \"{name}\" is already running"
+        logger.info(f"Pipeline \"{name}\" was triggered by a webhook")
+        return 202, f"Pipeline \"{name}\" was started"
+
+    @staticmethod
+    def _is_authorized(request: BaseHTTPRequestHandler, trigger: dict) -> bool:
+        token = trigger.get("token")
+        if token is None:
+            return True
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+    @staticmethod
+    def _decode_body(body: bytes, headers: Message) -> Any:
+        if not body:
+            return None
+        content_type = headers.get_content_type()
+        if content_type == "application/json":
+            return json.loads(body.decode(headers.get_content_charset("utf-8")))
+        if content_type.startswith("text/"):
+            return body.decode(headers.get_content_charset("utf-8"))
+        return body
+
+
+class FileWatcher(Thread):
+    DEFAULT_INTERVAL = 1.0
+    _signatures: Dict[Tuple[str, str, str], FileSignatures]
+
+    def __init__(self, pipeline_set: PipelineSet, scheduler: PipelineScheduler, interval: float = DEFAULT_INTERVAL):
+        super().__init__(name="FileWatcher", daemon=True)
+        self._pipeline_set = pipeline_set
+        self._scheduler = scheduler
+        self._interval = interval
+        self._stopped = Event()
+        self._signatures = {}
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Could not check watched files because {e}")
+
+    def check(self) -> None:
+        signatures = {}
+        for name, trigger in self._pipeline_set.triggers("file"):
+            key = (name, trigger["path"], trigger.get("pattern", "*"))
+            current = self._scan(Path(trigger["path"]), key[2])
+            signatures[key] = current
+            previous = self._signatures.get(key)
+            if previous is None:
+                # files existing when watching starts are not changes
+                continue
+            changed = sorted(path for path, signature in current.items() if previous.get(path) != signature)
+            if changed and not self._fire(name, changed):
+                # the changes are reported again when the pipeline is not running anymore
+                signatures[key] = previous
+        self._signatures = signatures
+
+    def _fire(self, name: str, changed: List[str]) -> bool:
+        pipeline = self._pipeline_set.get(name)
+        if pipeline is None:
+            return True
+        logger.info(f"Pipeline \"{name}\" was triggered by changes of {', '.join(changed)}")
+        return self._scheduler.trigger(pipeline, changed)
+
+    @staticmethod
+    def _scan(path: Path, pattern: str) -> FileSignatures:
+        if path.is_file():
+            paths = [path]
+        elif path.is_dir():
+            paths = [child for child in path.rglob("*") if child.is_file() and fnmatch.fnmatch(child.name, pattern)]
+        else:
+            paths = []
+
+        signatures = {}
+        for file_path in paths:
+            try:
+                stat = os.stat(str(file_path))
+            except OSError:
+                continue
+            signatures[str(file_path)] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
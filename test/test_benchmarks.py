@@ -0,0 +1,18 @@
+from benchmarks.common import compare, regressions, save_results, load_results
+
+
+def test_compare_results(tmp_path):
+    baseline = [{"name": "schedule/parse", "seconds": 0.2}, {"name": "html/parse", "seconds": 0.1}]
+    current = [
+        {"name": "schedule/parse", "seconds": 0.21},
+        {"name": "html/parse", "seconds": 0.15},
+        {"name": "http/download/small", "seconds": 0.002},
+    ]
+    save_results(baseline, tmp_path / "baseline.json")
+
+    comparisons = compare(load_results(tmp_path / "baseline.json"), current)
+
+    assert [comparison.name for comparison in comparisons] == ["schedule/parse", "html/parse"]
+    assert round(comparisons[1].change, 2) == 0.5
+    assert regressions(comparisons) == [comparisons[1]]
+    assert regressions(comparisons, threshold=0.6) == []
@@ -0,0 +1,226 @@
+import time
+from pathlib import Path
+from threading import Event
+from typing import Any, Optional
+
+import pytest
+
+from pipeliner import Pipeline, StepsFactoryWithCustomSteps
+from pipeliner.circuit_breaker import CircuitBreakerRegistry
+from pipeliner.cancellation import CancellationToken, Cancelled, StepTimeout, call_with_timeout, current_cancellation
+from pipeliner.pipeline_scheduler import PipelineScheduler
+from pipeliner.retry_policy import RetryPolicy
+from pipeliner.steps import Step, DoNothing, Parallel
+from test.test_pipeline_scheduler import wait_until
+from test.test_steps import ParallelStepsFactory
+
+
+class HangingStep(Step):
+    def __init__(self, seconds: float = 5):
+        self.seconds = seconds
+        self.calls = 0
+
+    def perform(self, data: Any) -> Any:
+        self.calls += 1
+        time.sleep(self.seconds)
+        return data
+
+
+class CancellableStep(Step):
+    cancellable = True
+
+    def __init__(self):
+        self.started = Event()
+        self.stopped = Event()
+        self.tokens = []
+
+    def perform(self, data: Any, cancellation: Optional[CancellationToken] = None) -> Any:
+        self.tokens.append(cancellation)
+        self.started.set()
+        try:
+            if cancellation.wait(5):
+                cancellation.raise_if_cancelled()
+            return data
+        finally:
+            self.stopped.set()
+
+
+def test_cancellation_token():
+    token = CancellationToken()
+    child = token.child()
+    detached = token.child()
+    token.detach(detached)
+
+    child.cancel("child is done")
+    assert child.cancelled and child.reason == "child is done"
+    assert not token.cancelled
+
+    token.cancel("stopping")
+    assert detached.cancelled is False
+    assert token.child().cancelled
+    with pytest.raises(Cancelled, match="stopping"):
+        token.raise_if_cancelled()
+    assert token.wait(0)
+
+
+def test_call_with_timeout():
+    token = CancellationToken()
+    assert call_with_timeout(lambda: "Hello test!", 1, token, "Quick") == "Hello test!"
+    with pytest.raises(ValueError):
+        call_with_timeout(lambda: int("Hello"), 1, token, "Failing")
+    assert not token.cancelled
+
+    started = time.monotonic()
+    with pytest.raises(StepTimeout, match="Hanging has not finished in 0.1 seconds"):
+        call_with_timeout(lambda: time.sleep(5), 0.1, token, "Hanging")
+    assert time.monotonic() - started < 1
+    assert token.cancelled
+
+
+def test_step_timeout_is_retried():
+    step = HangingStep()
+    step.timeout = 0.1
+    pipeline = Pipeline("Hanging", None, [step], RetryPolicy(max_attempts=2, jitter=False))
+
+    started = time.monotonic()
+    with pytest.raises(StepTimeout):
+        pipeline.run()
+    assert time.monotonic() - started < 1
+    assert step.calls == 2
+
+
+def test_timed_out_step_is_cancelled():
+    step = CancellableStep()
+    step.timeout = 0.1
+    with pytest.raises(StepTimeout):
+        Pipeline("Cancellable", None, [step], RetryPolicy(max_attempts=1)).run()
+
+    assert step.stopped.wait(1)
+    assert step.tokens[0].cancelled
+
+
+def test_step_timeout_from_config():
+    factory = StepsFactoryWithCustomSteps(Path("./custom_steps/"))
+    step = factory.create_step({"class": "DoNothing", "timeout": 2})
+    assert step.timeout == 2.0
+    assert factory.create_step({"class": "DoNothing"}).timeout is None
+
+
+def test_cancelled_run_is_not_retried(mocker):
+    step = CancellableStep()
+    cancellation = CancellationToken()
+    pipeline = Pipeline("Cancellable", None, [step, DoNothing()], RetryPolicy(max_attempts=3, backoff=10))
+    save_run = mocker.spy(pipeline, "_save_run")
+
+    cancellation.cancel("Pipeliner is stopping")
+    context_token = current_cancellation.set(cancellation)
+    try:
+        with pytest.raises(Cancelled):
+            pipeline.run()
+    finally:
+        current_cancellation.reset(context_token)
+    assert step.tokens == []
+    assert save_run.call_args.args[2] == "cancelled"
+
+
+class CancelledProbeStep(Step):
+    def __init__(self, cancellation: CancellationToken):
+        self.cancellation = cancellation
+
+    @property
+    def target_host(self) -> Optional[str]:
+        return "example.com"
+
+    def perform(self, data: Any) -> Any:
+        self.cancellation.cancel("Pipeliner is stopping")
+        raise ConnectionError("Connection was closed")
+
+
+def test_cancelled_probe_is_released(mocker):
+    now = mocker.patch("time.monotonic", return_value=100.0)
+    registry = CircuitBreakerRegistry()
+    registry.configure(failure_threshold=1, reset_timeout=60)
+    mocker.patch("pipeliner.steps.step.circuit_breakers", registry)
+    registry.get("example.com").record_failure()
+    now.return_value = 160.0
+
+    cancellation = CancellationToken()
+    context_token = current_cancellation.set(cancellation)
+    try:
+        with pytest.raises(ConnectionError):
+            Pipeline("Probe", None, [CancelledProbeStep(cancellation)]).run()
+    finally:
+        current_cancellation.reset(context_token)
+    assert registry.get("example.com").state == "half-open"
+    assert registry.get("example.com").allow()
+
+
+def test_parallel_cancels_slow_branches():
+    cancellable = CancellableStep()
+    factory = ParallelStepsFactory({"Cancellable": cancellable, "Nothing": DoNothing()})
+    step = Parallel(factory, [[{"class": "Nothing"}], [{"class": "Cancellable"}]], timeout=0.1, fail_fast=False)
+
+    results = step.perform("Hello")
+    assert results[0] == "Hello"
+    assert isinstance(results[1], TimeoutError)
+    assert cancellable.stopped.wait(1)
+    assert cancellable.tokens[0].cancelled
+
+
+class FailingAfterStep(Step):
+    def __init__(self, started: Event):
+        self.started = started
+
+    def perform(self, data: Any) -> Any:
+        self.started.wait(5)
+        raise RuntimeError("This step just fails")
+
+
+def test_parallel_cancels_branches_after_failure():
+    cancellable = CancellableStep()
+    factory = ParallelStepsFactory({"Cancellable": cancellable, "Failing": FailingAfterStep(cancellable.started)})
+    step = Parallel(factory, [[{"class": "Cancellable"}], [{"class": "Failing"}]])
+
+    with pytest.raises(RuntimeError):
+        step.perform("Hello")
+    assert cancellable.stopped.wait(1)
+    assert cancellable.tokens[0].cancelled
+
+
+def test_scheduler_stop_cancels_runs():
+    step = CancellableStep()
+    scheduler = PipelineScheduler()
+    scheduler.start()
+    scheduler.trigger(Pipeline("Cancellable", None, [step]))
+    assert step.started.wait(5)
+
+    started = time.monotonic()
+    assert scheduler.stop(timeout=0.1)
+    assert time.monotonic() - started < 1
+    assert step.tokens[0].cancelled
+
+
+def test_scheduler_stop_abandons_stuck_runs(mocker):
+    mocker.patch.object(PipelineScheduler, "CANCEL_GRACE_SECONDS", 0.1)
+    step = HangingStep(seconds=2)
+    scheduler = PipelineScheduler()
+    scheduler.start()
+    pipeline = Pipeline("Hanging", None, [step])
+    scheduler.trigger(pipeline)
+    assert wait_until(lambda: step.calls == 1)
+
+    started = time.monotonic()
+    assert not scheduler.stop(timeout=0.1)
+    assert time.monotonic() - started < 1
+    assert scheduler.running_pipelines == {pipeline}
+
+
+def test_scheduler_stop_waits_for_runs():
+    step = HangingStep(seconds=0.2)
+    scheduler = PipelineScheduler()
+    scheduler.start()
+    scheduler.trigger(Pipeline("Slow", None, [step]))
+    assert wait_until(lambda: step.calls == 1)
+
+    assert scheduler.stop(timeout=5)
+    assert not scheduler.running_pipelines
@@ -0,0 +1,164 @@
+import multiprocessing
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List
+
+from pipeliner import Pipeline
+from pipeliner.cluster import HashRing, SqliteLeaseStore, ClusterMember, make_cluster_member
+from pipeliner.pipeline_scheduler import PipelineScheduler
+from pipeliner.steps import ProduceText
+from test.test_pipeline_scheduler import wait_until
+
+PIPELINE_NAMES = [f"Pipeline {index}" for index in range(30)]
+
+
+def test_hash_ring():
+    ring = HashRing(["a", "b", "c"])
+    owners = {name: ring.owner(name) for name in PIPELINE_NAMES}
+
+    assert set(owners.values()) == {"a", "b", "c"}
+    assert owners == {name: HashRing(["c", "b", "a"]).owner(name) for name in PIPELINE_NAMES}
+    smaller_ring = HashRing(["a", "b"])
+    # only keys of the removed node move
+    assert all(smaller_ring.owner(name) == owner for name, owner in owners.items() if owner != "c")
+    assert HashRing([]).owner("Pipeline") is None
+
+
+def test_hash_ring_spreads_keys_evenly():
+    ring = HashRing(["a", "b", "c", "d"])
+    counts = Counter(ring.owner(f"Pipeline {index}") for index in range(4000))
+    assert all(800 < count < 1200 for count in counts.values())
+
+
+def test_lease_store(tmp_path, mocker):
+    now = time.time()
+    mocker.patch("time.time", lambda: now)
+    path = str(tmp_path / "cluster.db")
+    first, second = SqliteLeaseStore(path), SqliteLeaseStore(path)
+
+    assert first.acquire("Say hello", "first", 10)
+    assert first.acquire("Say hello", "first", 10)
+    assert not second.acquire("Say hello", "second", 10)
+    assert first.heartbeat("first", 10) == ["first"]
+    assert second.heartbeat("second", 10) == ["first", "second"]
+
+    now += 11
+    assert second.heartbeat("second", 10) == ["second"]
+    assert second.acquire("Say hello", "second", 10)
+    assert not first.acquire("Say hello", "first", 10)
+
+    second.release(["Say hello"], "second")
+    assert first.acquire("Say hello", "first", 10)
+    first.leave("first")
+    assert second.acquire("Say hello", "second", 10)
+    first.close()
+    second.close()
+
+
+def make_member(path: str, instance_id: str, lease_seconds: float = 30) -> ClusterMember:
+    return make_cluster_member({
+        "store": {"backend": "sqlite", "path": path},
+        "instance_id": instance_id,
+        "lease_seconds": lease_seconds
+    })
+
+
+def test_pipelines_are_split_between_members(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    first, second = make_member(path, "first"), make_member(path, "second")
+    first.start()
+    second.start()
+    first.heartbeat()
+    assert first.instances == second.instances == ["first", "second"]
+
+    first_names = [name for name in PIPELINE_NAMES if first.should_run(name)]
+    second_names = [name for name in PIPELINE_NAMES if second.should_run(name)]
+    assert first_names and second_names
+    assert sorted(first_names + second_names) == sorted(PIPELINE_NAMES)
+
+    # a stopped member hands its pipelines over right away
+    second.stop()
+    first.heartbeat()
+    assert all(first.should_run(name) for name in PIPELINE_NAMES)
+    first.stop()
+
+
+def test_pipelines_of_failed_member_are_taken_over(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    first, failed = make_member(path, "first", lease_seconds=0.3), make_member(path, "failed", lease_seconds=0.3)
+    failed.heartbeat()
+    first.heartbeat()
+    failed_names = [name for name in PIPELINE_NAMES if failed.should_run(name)]
+    assert failed_names
+
+    # the failed member neither renews its leases nor leaves the cluster
+    first.heartbeat()
+    assert not any(first.should_run(name) for name in failed_names)
+    time.sleep(0.4)
+    first.heartbeat()
+    assert first.instances == ["first"]
+    assert all(first.should_run(name) for name in failed_names)
+
+
+def test_scheduler_runs_only_leased_pipelines(tmp_path, mocker):
+    member = make_member(str(tmp_path / "cluster.db"), "first")
+    member.heartbeat()
+    mocker.patch.object(member, "owns", lambda name: name == "Mine")
+    acquire = mocker.patch.object(member, "acquire", return_value=True)
+    mine = Pipeline("Mine", "* * * * *", [ProduceText("Hello test!")])
+    other = Pipeline("Other", "* * * * *", [ProduceText("Hello test!")])
+    mine_run, other_run = mocker.spy(mine, "run"), mocker.spy(other, "run")
+
+    scheduler = PipelineScheduler(cluster=member)
+    scheduler.start()
+    with scheduler._condition:
+        scheduler._dispatch(mine, datetime.now())
+        scheduler._dispatch(other, datetime.now())
+        # a pipeline owned by another instance is not even submitted
+        assert other not in scheduler.running_pipelines
+    assert wait_until(lambda: mine_run.call_count == 1)
+    acquire.assert_called_once_with("Mine")
+
+    # triggers are run by the instance which received them
+    assert scheduler.trigger(other)
+    assert wait_until(lambda: other_run.call_count == 1)
+    scheduler.stop()
+    acquire.assert_called_once_with("Mine")
+
+
+def run_member(path: str, instance_id: str, barrier, results) -> None:
+    member = make_member(path, instance_id)
+    member.start()
+    deadline = time.monotonic() + 20
+    while len(member.instances) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        member.heartbeat()
+    results.put((instance_id, [name for name in PIPELINE_NAMES if member.should_run(name)]))
+    # members leave only after all of them have leased their pipelines
+    barrier.wait()
+    member.stop()
+
+
+def test_members_in_separate_processes(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(3)
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_member, args=(str(tmp_path / "cluster.db"), f"member-{index}", barrier, results))
+        for index in range(3)
+    ]
+    for process in processes:
+        process.start()
+    leased: List[str] = []
+    members = []
+    for _ in processes:
+        instance_id, names = results.get(timeout=30)
+        members.append(instance_id)
+        leased.extend(names)
+    for process in processes:
+        process.join(10)
+        assert process.exitcode == 0
+
+    assert sorted(members) == ["member-0", "member-1", "member-2"]
+    assert sorted(leased) == sorted(PIPELINE_NAMES)
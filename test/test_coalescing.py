@@ -0,0 +1,162 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from pipeliner import PipelineFactory, StepsFactoryWithCustomSteps
+from pipeliner.coalescing import SingleFlight, SharedPrefixes, config_hash, current_tick
+from pipeliner.steps import HttpDownload, Step
+
+
+def test_config_hash_is_canonical():
+    assert config_hash({"a": 1, "b": [1, 2]}) == config_hash({"b": [1, 2], "a": 1})
+    assert config_hash({"a": "ü"}) != config_hash({"a": "u"})
+
+
+def test_single_flight():
+    single_flight = SingleFlight()
+    calls = []
+
+    def slow_call() -> int:
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda _: single_flight.do("key", slow_call), range(4)))
+    assert results == [1, 1, 1, 1]
+    assert single_flight.do("key", slow_call) == 2
+
+
+def test_single_flight_shares_exception():
+    def failing_call():
+        time.sleep(0.1)
+        raise ConnectionError("Host is down")
+
+    single_flight = SingleFlight()
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(single_flight.do, "key", failing_call) for _ in range(2)]
+    for future in futures:
+        assert isinstance(future.exception(), ConnectionError)
+
+
+def test_shared_prefixes():
+    shared = SharedPrefixes()
+    shared.register("A", ["a1", "a2"])
+    shared.register("B", ["a1", "a2", "b3"])
+    shared.register("C", ["a1"])
+    shared.register("D", ["d1"])
+
+    assert shared.shared_length(["a1", "a2"]) == 2
+    assert shared.shared_length(["a1", "a2", "b3"]) == 2
+    assert shared.shared_length(["a1"]) == 1
+    assert shared.shared_length(["d1"]) == 0
+
+    shared.unregister("A")
+    assert shared.shared_length(["a1", "a2", "b3"]) == 1
+
+
+def test_shared_prefixes_run_once_per_tick():
+    shared = SharedPrefixes()
+    shared.register("A", ["a1"])
+    shared.register("B", ["a1"])
+    computed = []
+
+    def compute() -> list:
+        computed.append(1)
+        return [len(computed)]
+
+    tick = datetime(2020, 1, 1, 12, 0)
+    first = shared.run("a1", tick, compute)
+    assert shared.run("a1", tick, compute) is first
+    assert shared._results == {}
+    assert shared.run("a1", datetime(2020, 1, 1, 12, 1), compute) == [2]
+    # a late run of an older tick computes on its own
+    assert shared.run("a1", tick, compute) == [3]
+
+
+class MarkChanged(Step):
+    def perform(self, data: Any) -> Any:
+        data["changed"] = True
+        return data
+
+
+def make_config(name: str, url: str, last_step: str = "DoNothing") -> dict:
+    return {
+        "name": name,
+        "schedule": "* * * * *",
+        "steps": [
+            {"class": "HttpDownload", "params": {"url": url, "headers": {}}},
+            {"class": "GetHtmlElementsText", "params": {"elements_xpaths": {"title": "(//h2)[1]"}}},
+            {"class": last_step}
+        ]
+    }
+
+
+@pytest.fixture
+def factory():
+    return PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/")))
+
+
+def test_pipelines_share_common_steps(http_server, factory):
+    http_server.routes["/page"] = lambda request: (200, {}, b"<html><h2>First</h2><h2>Second</h2></html>")
+    factory._steps_factory.registry.register(MarkChanged)
+    first = factory.create(make_config("First", http_server.url("/page")))
+    second = factory.create(make_config("Second", http_server.url("/page"), "MarkChanged"))
+
+    assert first._prefix_hashes[:2] == second._prefix_hashes
+    token = current_tick.set(datetime(2020, 1, 1, 12, 0))
+    try:
+        first.run()
+        second.run()
+        assert len(http_server.requests) == 1
+        assert first._current_data == {"title": "First"}
+        assert second._current_data == {"title": "First", "changed": True}
+
+        current_tick.set(datetime(2020, 1, 1, 12, 1))
+        first.run()
+        assert len(http_server.requests) == 2
+    finally:
+        current_tick.reset(token)
+
+    # triggered runs do not share steps
+    first.run()
+    second.run()
+    assert len(http_server.requests) == 4
+
+
+def test_pipelines_with_different_steps_do_not_share(http_server, factory):
+    http_server.routes["/a"] = lambda request: (200, {}, b"<html><h2>A</h2></html>")
+    http_server.routes["/b"] = lambda request: (200, {}, b"<html><h2>B</h2></html>")
+    first = factory.create(make_config("First", http_server.url("/a")))
+    second = factory.create(make_config("Second", http_server.url("/b")))
+    skipping = make_config("Skipping", http_server.url("/a"))
+    skipping["steps"][0]["params"]["skip_unchanged"] = True
+
+    assert first._shared_prefixes.shared_length(first._prefix_hashes) == 0
+    assert factory.create(skipping)._prefix_hashes == []
+    token = current_tick.set(datetime(2020, 1, 1, 12, 0))
+    try:
+        first.run()
+        second.run()
+    finally:
+        current_tick.reset(token)
+    assert first._current_data == {"title": "A"}
+    assert second._current_data == {"title": "B"}
+
+
+def test_concurrent_identical_downloads_are_coalesced(http_server):
+    def slow_page(request):
+        time.sleep(0.1)
+        return 200, {}, b"Hello test!"
+
+    http_server.routes["/page"] = slow_page
+    steps = [HttpDownload(http_server.url("/page"), {"X-Test": "yes"}) for _ in range(3)]
+
+    with ThreadPoolExecutor(3) as executor:
+        results = list(executor.map(lambda step: step.perform(None), steps))
+    assert results == [b"Hello test!"] * 3
+    assert len(http_server.requests) == 1
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from pipeliner import PipelineFactory, StepsFactoryWithCustomSteps
+from pipeliner.config_reload import ConfigWatcher, PipelineSet, config_hash
+from pipeliner.pipeline_scheduler import PipelineScheduler
+
+
+def make_config(name: str, text: str = "Hello test!", schedule: str = "* * * * *") -> dict:
+    return {
+        "name": name,
+        "schedule": schedule,
+        "steps": [{"class": "ProduceText", "params": {"text": text}}, {"class": "DoNothing"}]
+    }
+
+
+def test_config_watcher(tmp_path):
+    config_path = tmp_path / "config.json"
+    config_path.write_text("{}")
+    watcher = ConfigWatcher(config_path)
+
+    assert not watcher.changed()
+    config_path.write_text("{\"pipelines\": []}")
+    assert watcher.changed()
+    assert not watcher.changed()
+
+    config_path.unlink()
+    assert not watcher.changed()
+    config_path.write_text("{\"pipelines\": []}")
+    os.utime(str(config_path), ns=(1, 1))
+    assert watcher.changed()
+
+
+def test_config_hash():
+    assert config_hash({"a": 1, "b": [1, 2]}) == config_hash({"b": [1, 2], "a": 1})
+    assert config_hash({"a": 1}) != config_hash({"a": 2})
+
+
+def test_pipeline_set_applies_only_changes():
+    scheduler = PipelineScheduler()
+    pipeline_set = PipelineSet(PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/"))), scheduler)
+    pipeline_set.apply([make_config("Same"), make_config("Changed"), make_config("Removed")])
+    before = {pipeline.name: pipeline for pipeline in pipeline_set.pipelines}
+
+    pipeline_set.apply([
+        make_config("Same"),
+        make_config("Changed", text="Changed text"),
+        make_config("Added"),
+        make_config("Added", text="Duplicate"),
+    ])
+    after = {pipeline.name: pipeline for pipeline in pipeline_set.pipelines}
+
+    assert sorted(after) == ["Added", "Changed", "Same"]
+    assert after["Same"] is before["Same"]
+    assert after["Changed"] is not before["Changed"]
+    assert after["Changed"]._steps[0]._text == "Changed text"
+    assert after["Added"]._steps[0]._text == "Hello test!"
+    assert set(scheduler._next_runs) == set(after.values())
+
+
+def test_pipeline_set_keeps_pipeline_with_invalid_config():
+    scheduler = PipelineScheduler()
+    pipeline_set = PipelineSet(PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/"))), scheduler)
+    pipeline_set.apply([make_config("Pipeline")])
+    pipeline = pipeline_set.pipelines[0]
+
+    pipeline_set.apply([make_config("Pipeline", schedule="not a schedule")])
+
+    assert pipeline_set.pipelines == [pipeline]
+    assert set(scheduler._next_runs) == {pipeline}
+    pipeline_set.apply([make_config("Pipeline", text="Fixed")])
+    assert pipeline_set.pipelines[0]._steps[0]._text == "Fixed"
+
+
+def test_pipeline_set_fails_on_invalid_config_at_start():
+    scheduler = PipelineScheduler()
+    pipeline_set = PipelineSet(PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/"))), scheduler)
+
+    with pytest.raises(Exception):
+        pipeline_set.apply([make_config("Pipeline", schedule="not a schedule")], strict=True)
+    assert pipeline_set.pipelines == []
+
+    # a new pipeline with invalid config is skipped by a reload
+    pipeline_set.apply([make_config("Pipeline"), make_config("Invalid", schedule="not a schedule")])
+    assert [pipeline.name for pipeline in pipeline_set.pipelines] == ["Pipeline"]
@@ -0,0 +1,37 @@
+from pipeliner.http_session_pool import HttpSessionPool
+from pipeliner.steps import HttpDownload
+
+
+def test_session_is_shared_per_host(http_server):
+    pool = HttpSessionPool()
+    assert pool.session(http_server.url("/a")) is pool.session(http_server.url("/b"))
+    assert pool.session(http_server.url("/a")) is not pool.session("http://localhost:1/")
+    pool.close()
+
+
+def test_connections_are_reused(http_server):
+    http_server.routes["/page"] = lambda request: (200, {}, b"Hello test!")
+    pool = HttpSessionPool(pool_size=2)
+
+    for _ in range(5):
+        assert pool.get(http_server.url("/page")).content == b"Hello test!"
+
+    stats = pool.stats()[http_server.url("")]
+    assert stats["requests"] == 5
+    assert stats["connections"] == 1
+    assert stats["reused_connections"] == 4
+    assert stats["reuse_rate"] == 0.8
+    pool.close()
+    assert pool.stats() == {}
+
+
+def test_http_download_uses_shared_pool(http_server, mocker):
+    http_server.routes["/page"] = lambda request: (200, {}, b"Hello test!")
+    pool = HttpSessionPool()
+    mocker.patch("pipeliner.steps.http_download.http_session_pool", pool)
+
+    steps = [HttpDownload(http_server.url("/page"), {"X-Test": "yes"}) for _ in range(3)]
+    assert [step.perform(None) for step in steps] == [b"Hello test!"] * 3
+    assert http_server.requests[0][1]["X-Test"] == "yes"
+    assert pool.stats()[http_server.url("")]["connections"] == 1
+    pool.close()
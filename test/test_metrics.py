@@ -0,0 +1,76 @@
+import requests
+
+from pipeliner import Pipeline
+from pipeliner.metrics import MetricsRegistry, MetricsServer, metrics
+from pipeliner.steps import ProduceText, DoNothing
+
+
+def test_counter_and_gauge():
+    registry = MetricsRegistry()
+    runs = registry.counter("runs_total", "Runs", ["pipeline"])
+    busy = registry.gauge("busy", "Busy workers")
+    runs.inc(pipeline="first")
+    runs.inc(2, pipeline="first")
+    runs.inc(pipeline="sec\"ond")
+    busy.set(3)
+
+    assert runs.value(pipeline="first") == 3
+    assert registry.snapshot()["busy"] == [{"labels": {}, "value": 3}]
+    assert registry.render() == "\n".join([
+        "# HELP runs_total Runs",
+        "# TYPE runs_total counter",
+        "runs_total{pipeline=\"first\"} 3",
+        "runs_total{pipeline=\"sec\\\"ond\"} 1",
+        "# HELP busy Busy workers",
+        "# TYPE busy gauge",
+        "busy 3",
+    ]) + "\n"
+
+
+def test_histogram():
+    registry = MetricsRegistry()
+    duration = registry.histogram("duration_seconds", "Duration", ["step"], buckets=[0.1, 1])
+    for value in [0.05, 0.1, 0.5, 2]:
+        duration.observe(value, step="0:DoNothing")
+
+    assert registry.snapshot()["duration_seconds"] == [{
+        "labels": {"step": "0:DoNothing"},
+        "count": 4,
+        "sum": 2.65,
+        "buckets": {0.1: 2, 1: 3, float("inf"): 4},
+    }]
+    assert registry.render().splitlines()[2:] == [
+        "duration_seconds_bucket{step=\"0:DoNothing\",le=\"0.1\"} 2",
+        "duration_seconds_bucket{step=\"0:DoNothing\",le=\"1\"} 3",
+        "duration_seconds_bucket{step=\"0:DoNothing\",le=\"+Inf\"} 4",
+        "duration_seconds_sum{step=\"0:DoNothing\"} 2.65",
+        "duration_seconds_count{step=\"0:DoNothing\"} 4",
+    ]
+
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.counter("runs_total", "Runs").inc()
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        response = requests.get(f"http://127.0.0.1:{server.port}/metrics")
+        assert response.status_code == 200
+        assert "runs_total 1" in response.text
+        assert requests.get(f"http://127.0.0.1:{server.port}/other").status_code == 404
+    finally:
+        server.stop()
+
+
+def test_pipeline_is_instrumented():
+    Pipeline("Instrumented pipeline", "* * * * *", [ProduceText("Hello test!"), DoNothing()]).run()
+    snapshot = metrics.snapshot()
+
+    def find(name: str, **labels) -> dict:
+        return next(sample for sample in snapshot[name] if labels.items() <= sample["labels"].items())
+
+    assert find("pipeliner_pipeline_runs_total", pipeline="Instrumented pipeline")["value"] == 1
+    assert find("pipeliner_pipeline_duration_seconds", pipeline="Instrumented pipeline")["count"] == 1
+    assert find("pipeliner_step_duration_seconds", pipeline="Instrumented pipeline", step="1:DoNothing")["count"] == 1
+    payload_size = find("pipeliner_step_payload_bytes", pipeline="Instrumented pipeline", step="0:ProduceText")
+    assert payload_size["sum"] == len("Hello test!")
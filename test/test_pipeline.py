@@ -1,11 +1,16 @@
+import itertools
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 import pytest
 
 from pipeliner import Pipeline, PipelineFactory, StepsFactoryWithCustomSteps
+from pipeliner.circuit_breaker import CircuitBreakerRegistry, CircuitOpen
+from pipeliner.retry_policy import RetryPolicy
 from pipeliner.schedule import Schedule
-from pipeliner.steps import DoNothing, ProduceText, Step
+from pipeliner.steps import DoNothing, ProduceText, Step, SkipRemainingSteps, Collect, Parallel
+from test.test_steps import ParallelStepsFactory
 
 
 def test_pipeline_factory():
@@ -78,3 +83,275 @@ def test_pipeline_step_fails(mocker):
         ] * Pipeline.STEP_REPEAT_TRY_COUNT
     )
     mock_steps[2].assert_not_called()
+
+
+def test_pipeline_skips_remaining_steps(mocker):
+    class UnchangedStep(Step):
+        def perform(self, data: Any) -> Any:
+            raise SkipRemainingSteps("nothing has changed")
+
+    steps = [ProduceText("Hello test!"), UnchangedStep(), DoNothing()]
+    mock_steps = [
+        mocker.spy(step, "perform")
+        for step in steps
+    ]
+
+    pipeline = Pipeline("Test pipeline", "* * * * *", steps)
+    pipeline.run()
+
+    mock_steps[1].assert_called_once_with("Hello test!")
+    mock_steps[2].assert_not_called()
+
+
+def test_pipeline_passes_data_without_copy():
+    class ProduceList(Step):
+        mutates_input = False
+
+        def __init__(self):
+            self.produced = [1, 2, 3]
+
+        def perform(self, data: Any) -> Any:
+            return self.produced
+
+    class ReadOnlyStep(Step):
+        mutates_input = False
+
+        def perform(self, data: Any) -> Any:
+            self.received = data
+            return data
+
+    producer, reader = ProduceList(), ReadOnlyStep()
+    Pipeline("Test pipeline", "* * * * *", [producer, reader]).run()
+    assert reader.received is producer.produced
+
+
+def test_pipeline_retries_mutating_step_with_original_data():
+    class ProduceList(Step):
+        def perform(self, data: Any) -> Any:
+            return [1, 2, 3]
+
+    class AppendAndFailOnce(Step):
+        def __init__(self):
+            self.received = []
+
+        def perform(self, data: Any) -> Any:
+            self.received.append(list(data))
+            data.append(4)
+            if len(self.received) == 1:
+                raise RuntimeError("This step fails once")
+            return data
+
+    step = AppendAndFailOnce()
+    Pipeline("Test pipeline", "* * * * *", [ProduceList(), step]).run()
+    assert step.received == [[1, 2, 3], [1, 2, 3]]
+
+
+class HostStep(Step):
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    @property
+    def target_host(self) -> str:
+        return "example.com"
+
+    def perform(self, data: Any) -> Any:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("Host is down")
+        return "Downloaded"
+
+
+def test_pipeline_step_retry_policy(mocker):
+    sleep = mocker.patch("pipeliner.cancellation.CancellationToken.wait", return_value=False)
+    step = HostStep(failures=3)
+    step.retry_policy = RetryPolicy(max_attempts=4, backoff=1, jitter=False)
+
+    Pipeline("Test pipeline", "* * * * *", [step]).run()
+    assert step.calls == 4
+    sleep.assert_has_calls([mocker.call(1), mocker.call(2), mocker.call(4)])
+
+
+def test_pipeline_does_not_retry_other_exceptions(mocker):
+    mocker.patch("pipeliner.cancellation.CancellationToken.wait", return_value=False)
+    step = HostStep(failures=3)
+    retry_policy = RetryPolicy(max_attempts=5, retry_on=["ValueError"])
+
+    with pytest.raises(ConnectionError):
+        Pipeline("Test pipeline", "* * * * *", [step], retry_policy).run()
+    assert step.calls == 1
+
+
+def test_pipeline_circuit_breaker(mocker):
+    mocker.patch("pipeliner.cancellation.CancellationToken.wait", return_value=False)
+    registry = CircuitBreakerRegistry()
+    registry.configure(failure_threshold=2, reset_timeout=60)
+    mocker.patch("pipeliner.steps.step.circuit_breakers", registry)
+
+    step = HostStep(failures=10)
+    pipeline = Pipeline("Test pipeline", "* * * * *", [step])
+    with pytest.raises(CircuitOpen):
+        pipeline.run()
+    assert step.calls == 2
+    with pytest.raises(CircuitOpen):
+        pipeline.run()
+    assert step.calls == 2
+
+
+def test_nested_step_retry_policy_and_circuit_breaker(mocker):
+    mocker.patch("pipeliner.cancellation.CancellationToken.wait", return_value=False)
+    registry = CircuitBreakerRegistry()
+    registry.configure(failure_threshold=2, reset_timeout=60)
+    mocker.patch("pipeliner.steps.step.circuit_breakers", registry)
+
+    flaky = HostStep(failures=1)
+    flaky.retry_policy = RetryPolicy(max_attempts=2, jitter=False)
+    nested = Parallel(ParallelStepsFactory({"Host": flaky}), [[{"class": "Host"}]])
+    Pipeline("Test pipeline", None, [nested], RetryPolicy(max_attempts=1)).run()
+    assert flaky.calls == 2
+
+    down = HostStep(failures=10)
+    down.retry_policy = RetryPolicy(max_attempts=4, jitter=False)
+    nested = Parallel(ParallelStepsFactory({"Host": down}), [[{"class": "Host"}]])
+    pipeline = Pipeline("Test pipeline", None, [nested], RetryPolicy(max_attempts=3, jitter=False))
+    with pytest.raises(CircuitOpen):
+        pipeline.run()
+    # the nested step shares the breaker of its host, so retries stop once it opens
+    assert down.calls == 2
+
+
+def test_pipeline_factory_retry_policy():
+    steps_factory = StepsFactoryWithCustomSteps(Path("./custom_steps/"))
+    pipeline = PipelineFactory(steps_factory).create({
+        "name": "Say hello",
+        "schedule": "* * * * *",
+        "retry": {"max_attempts": 5},
+        "steps": [
+            {"class": "ProduceText", "params": {"text": "Hello test!"}, "retry": {"max_attempts": 2, "backoff": 1}},
+            {"class": "DoNothing"}
+        ]
+    })
+    assert pipeline._retry_policy.max_attempts == 5
+    assert pipeline._steps[0].retry_policy.max_attempts == 2
+    assert pipeline._steps[1].retry_policy is None
+
+
+class YieldNumbers(Step):
+    mutates_input = False
+
+    def __init__(self, count: int = None):
+        self.count = count
+        self.produced = 0
+
+    def perform(self, data: Any) -> Iterator[int]:
+        for number in itertools.count(1) if self.count is None else range(1, self.count + 1):
+            self.produced += 1
+            yield number
+
+
+class Record(Step):
+    mutates_input = False
+
+    def __init__(self, fail_on: Any = None, skip_on: Any = None, delay: float = 0):
+        self.received = []
+        self.fail_on = fail_on
+        self.skip_on = skip_on
+        self.delay = delay
+
+    def perform(self, data: Any) -> Any:
+        time.sleep(self.delay)
+        if data == self.fail_on:
+            raise ValueError(f"Cannot process {data}")
+        if data == self.skip_on:
+            raise SkipRemainingSteps(f"{data} is not interesting")
+        self.received.append(data)
+        return data
+
+
+def test_streaming_pipeline():
+    first, last = Record(skip_on=3), Record()
+    pipeline = Pipeline("Test pipeline", None, [YieldNumbers(5), first, Collect(), last], streaming=True)
+
+    pipeline.run()
+    assert first.received == [1, 2, 4, 5]
+    assert last.received == [[1, 2, 4, 5]]
+
+
+def test_streaming_pipeline_backpressure():
+    producer = YieldNumbers(30)
+    in_flight = []
+
+    class SlowConsumer(Step):
+        mutates_input = False
+
+        def perform(self, data: Any) -> Any:
+            in_flight.append(producer.produced - data)
+            time.sleep(0.001)
+            return data
+
+    last = Record()
+    Pipeline("Test pipeline", None, [producer, SlowConsumer(), last], streaming=True, queue_size=2).run()
+    assert last.received == list(range(1, 31))
+    # the queue, the item being put into it and the one being consumed
+    assert max(in_flight) <= 3
+
+
+def test_streaming_pipeline_step_fails():
+    producer = YieldNumbers()
+    last = Record()
+    pipeline = Pipeline("Test pipeline", None, [producer, Record(fail_on=3), last], streaming=True, queue_size=2)
+
+    with pytest.raises(ValueError):
+        pipeline.run()
+    assert last.received == [1, 2]
+    assert producer.produced < 20
+
+
+def test_collect_without_streaming():
+    last = Record()
+    Pipeline("Test pipeline", None, [YieldNumbers(3), Collect(), last]).run()
+    assert last.received == [[1, 2, 3]]
+
+    last = Record()
+    Pipeline("Test pipeline", None, [ProduceText("Hello test!"), Collect(), last]).run()
+    assert last.received == [["Hello test!"]]
+
+
+class AppendNumber(Step):
+    def perform(self, data: Any) -> Any:
+        data.append(len(data) + 1)
+        return data
+
+
+def test_generator_output_followed_by_mutating_step():
+    last = Record()
+    Pipeline("Test pipeline", None, [YieldNumbers(3), AppendNumber(), last]).run()
+    assert last.received == [[1, 2, 3, 4]]
+
+
+def test_generator_as_last_step_without_streaming(mocker):
+    output_of = mocker.patch("pipeliner.run_history.RunHistory.output_of", return_value=None)
+    producer = YieldNumbers(3)
+    pipeline = Pipeline("Test pipeline", None, [producer])
+    pipeline.run()
+    assert producer.produced == 3
+    output_of.assert_called_once_with([1, 2, 3])
+
+
+def test_collect_batches():
+    assert list(Collect(batch_size=2).perform(iter([1, 2, 3, 4, 5]))) == [[1, 2], [3, 4], [5]]
+    with pytest.raises(ValueError):
+        Collect(batch_size=0)
+
+
+def test_pipeline_factory_streaming():
+    steps_factory = StepsFactoryWithCustomSteps(Path("./custom_steps/"))
+    pipeline = PipelineFactory(steps_factory).create({
+        "name": "Say hello",
+        "schedule": "* * * * *",
+        "streaming": True,
+        "queue_size": 4,
+        "steps": [{"class": "ProduceText", "params": {"text": "Hello test!"}}, {"class": "Collect"}]
+    })
+    assert pipeline._streaming
+    assert pipeline._queue_size == 4
@@ -0,0 +1,195 @@
+import time
+from datetime import datetime, timedelta
+from threading import Event
+from typing import Any
+
+from pipeliner import Pipeline
+from pipeliner.pipeline_scheduler import PipelineScheduler
+from pipeliner.steps import Step, ProduceText
+
+
+class BlockingStep(Step):
+    def __init__(self):
+        self.started = Event()
+        self.release = Event()
+
+    def perform(self, data: Any) -> Any:
+        self.started.set()
+        self.release.wait(5)
+        return data
+
+
+class FailingStep(Step):
+    def perform(self, data: Any) -> Any:
+        raise RuntimeError("This step just fails")
+
+
+def wait_until(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_pop_due_in_order():
+    scheduler = PipelineScheduler()
+    hourly = Pipeline("Hourly", "0 * * * *", [])
+    minutely = Pipeline("Minutely", "* * * * *", [])
+    now = datetime(2019, 12, 24, 11, 53, 25)
+    scheduler.add(hourly, now)
+    scheduler.add(minutely, now)
+
+    assert scheduler._pop_due(now) == []
+    assert scheduler._pop_due(datetime(2019, 12, 24, 11, 54)) == [(datetime(2019, 12, 24, 11, 54), minutely)]
+    assert scheduler._pop_due(datetime(2019, 12, 24, 12, 0)) == [(datetime(2019, 12, 24, 12, 0), hourly)]
+    assert scheduler._sleep_time(now) == PipelineScheduler.MAX_SLEEP_SECONDS
+
+
+def test_removed_pipeline_is_not_due():
+    scheduler = PipelineScheduler()
+    pipeline = Pipeline("Minutely", "* * * * *", [])
+    now = datetime(2019, 12, 24, 11, 53, 25)
+    scheduler.add(pipeline, now)
+    scheduler.remove(pipeline)
+
+    assert scheduler._pop_due(now + timedelta(minutes=5)) == []
+
+
+def test_scheduler_runs_due_pipeline(mocker):
+    step = ProduceText("Hello test!")
+    perform = mocker.spy(step, "perform")
+    pipeline = Pipeline("Test pipeline", "* * * * *", [step])
+
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.start()
+    try:
+        scheduler.add(pipeline, datetime.now() - timedelta(minutes=1))
+        assert wait_until(lambda: perform.call_count == 1)
+    finally:
+        scheduler.stop()
+
+
+def test_scheduler_does_not_overlap_runs():
+    step = BlockingStep()
+    pipeline = Pipeline("Slow pipeline", "* * * * *", [step])
+
+    scheduler = PipelineScheduler(max_workers=2)
+    scheduler.start()
+    try:
+        with scheduler._condition:
+            scheduler._dispatch(pipeline, datetime.now())
+            assert step.started.wait(5)
+            scheduler._dispatch(pipeline, datetime.now())
+            assert scheduler.running_pipelines == {pipeline}
+        step.release.set()
+        assert wait_until(lambda: not scheduler.running_pipelines)
+    finally:
+        step.release.set()
+        scheduler.stop()
+
+
+def test_replaced_pipeline_does_not_overlap_previous_version():
+    step = BlockingStep()
+    old_pipeline = Pipeline("Reloaded pipeline", "* * * * *", [step])
+    new_pipeline = Pipeline("Reloaded pipeline", "* * * * *", [ProduceText("New version")])
+
+    scheduler = PipelineScheduler(max_workers=2)
+    scheduler.add(old_pipeline)
+    scheduler.start()
+    try:
+        with scheduler._condition:
+            scheduler._dispatch(old_pipeline, datetime.now())
+            assert step.started.wait(5)
+            scheduler.replace(old_pipeline, new_pipeline)
+            assert set(scheduler._next_runs) == {new_pipeline}
+            scheduler._dispatch(new_pipeline, datetime.now())
+            assert scheduler.running_pipelines == {old_pipeline}
+        step.release.set()
+        assert wait_until(lambda: not scheduler.running_pipelines)
+    finally:
+        step.release.set()
+        scheduler.stop()
+
+
+def test_failed_pipeline_is_retried_next_minute():
+    pipeline = Pipeline("Failing pipeline", "0 0 1 1 *", [FailingStep()])
+
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.start()
+    try:
+        with scheduler._condition:
+            scheduler._dispatch(pipeline, datetime.now())
+        assert wait_until(lambda: not scheduler.running_pipelines)
+        with scheduler._condition:
+            assert scheduler._next_runs[pipeline] - datetime.now() <= timedelta(minutes=1)
+    finally:
+        scheduler.stop()
+
+
+def test_failed_pipeline_with_seconds_is_retried_next_second():
+    pipeline = Pipeline("Failing pipeline", "0 0 0 1 1 *", [FailingStep()])
+
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.start()
+    try:
+        with scheduler._condition:
+            scheduler._dispatch(pipeline, datetime.now())
+        assert wait_until(lambda: not scheduler.running_pipelines)
+        with scheduler._condition:
+            assert scheduler._next_runs[pipeline] - datetime.now() <= timedelta(seconds=1)
+    finally:
+        scheduler.stop()
+
+
+def test_failed_triggered_run_is_not_retried():
+    pipeline = Pipeline("Failing pipeline", "0 0 1 1 *", [FailingStep()])
+
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.add(pipeline)
+    next_run = scheduler._next_runs[pipeline]
+    scheduler.start()
+    try:
+        assert scheduler.trigger(pipeline, "Trigger data")
+        assert wait_until(lambda: not scheduler.running_pipelines)
+        with scheduler._condition:
+            assert scheduler._next_runs[pipeline] == next_run
+            assert pipeline not in scheduler._failures
+    finally:
+        scheduler.stop()
+
+
+def test_scheduler_runs_interval_pipeline_on_time(mocker):
+    step = ProduceText("Hello test!")
+    perform = mocker.spy(step, "perform")
+    pipeline = Pipeline("Test pipeline", "every 1s", [step])
+    run_times = []
+    perform.side_effect = lambda data: run_times.append(datetime.now())
+
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.add(pipeline)
+    scheduler.start()
+    try:
+        assert wait_until(lambda: perform.call_count >= 2, timeout=5)
+    finally:
+        scheduler.stop()
+    assert all(when.microsecond < 200_000 for when in run_times)
+
+
+def test_failed_pipeline_retries_are_backed_off():
+    pipeline = Pipeline("Failing pipeline", "0 0 1 1 *", [FailingStep()])
+
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.start()
+    try:
+        for failures in range(1, 4):
+            with scheduler._condition:
+                scheduler._dispatch(pipeline, datetime.now())
+            assert wait_until(lambda: not scheduler.running_pipelines)
+            with scheduler._condition:
+                delay = scheduler._next_runs[pipeline] - datetime.now()
+                assert timedelta(minutes=2 ** (failures - 1) - 1) <= delay <= timedelta(minutes=2 ** (failures - 1))
+                assert scheduler._failures[pipeline] == failures
+    finally:
+        scheduler.stop()
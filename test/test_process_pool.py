@@ -0,0 +1,117 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from pipeliner import PipelineFactory, StepsFactoryWithCustomSteps
+from pipeliner import process_pool
+from pipeliner.process_pool import PipelineProcessPool, ProcessPipeline
+from test.test_pipeline_scheduler import wait_until
+
+
+def make_config(name: str, text: str) -> dict:
+    return {
+        "name": name,
+        "schedule": "* * * * *",
+        "executor": "process",
+        "steps": [
+            {"class": "ProduceText", "params": {"text": text}},
+            {"class": "SayHello"}
+        ]
+    }
+
+
+def test_process_pipeline_runs_in_worker():
+    pool = PipelineProcessPool(Path("./custom_steps/").resolve(), {}, workers=2)
+    factory = PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/")), pool)
+    try:
+        pipeline = factory.create(make_config("Say hello", "Hello test!"))
+        assert type(pipeline) is ProcessPipeline
+        pipeline.run()
+
+        failing_config = make_config("Fail", "Hello test!")
+        failing_config["steps"].append({"class": "GetHtmlElementText", "params": {"element_xpath": "//h1"}})
+        with pytest.raises(Exception):
+            factory.create(failing_config).run()
+    finally:
+        pool.shutdown()
+
+
+def test_process_pipeline_needs_pool():
+    factory = PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/")))
+    with pytest.raises(ValueError):
+        factory.create(make_config("Say hello", "Hello test!"))
+
+
+def test_pipeline_worker_is_affine():
+    pool = PipelineProcessPool(Path("./custom_steps/").resolve(), {}, workers=4)
+    assert pool._executor_for("Say hello") is pool._executor_for("Say hello")
+    pool.shutdown()
+
+
+def test_dead_worker_is_replaced():
+    pool = PipelineProcessPool(Path("./custom_steps/").resolve(), {}, workers=1)
+    config = make_config("Say hello", "Hello test!")
+    try:
+        pool.run(config)
+        broken = pool._executors[0]
+        for process in list(broken._processes.values()):
+            process.kill()
+        assert wait_until(lambda: broken._broken)
+
+        pool.run(config)
+        assert pool._executors[0] is not broken
+    finally:
+        pool.shutdown()
+
+
+def exit_worker(pipeline_config: dict, data: Any = None) -> None:
+    os._exit(1)
+
+
+def test_worker_dying_during_run_is_replaced(mocker):
+    pool = PipelineProcessPool(Path("./custom_steps/").resolve(), {}, workers=1)
+    config = make_config("Say hello", "Hello test!")
+    try:
+        broken = pool._executors[0]
+        mocker.patch.object(process_pool, "_run_pipeline", exit_worker)
+        with pytest.raises(BrokenProcessPool):
+            pool.run(config)
+        mocker.stopall()
+        assert pool._executors[0] is not broken
+        pool.run(config)
+    finally:
+        pool.shutdown()
+
+
+def test_worker_keeps_pipelines(mocker):
+    mocker.patch.object(process_pool, "_worker_pipelines", {})
+    mocker.patch.object(process_pool, "_worker_steps_factory")
+    mocker.patch.object(process_pool, "set_state_store")
+    mocker.patch.object(process_pool, "Finalize")
+    process_pool._initialize_worker(str(Path("./custom_steps/").resolve()), {}, None)
+
+    process_pool._run_pipeline(make_config("Say hello", "Hello test!"))
+    pipeline = process_pool._worker_pipelines["Say hello"][1]
+    process_pool._run_pipeline(make_config("Say hello", "Hello test!"))
+    assert process_pool._worker_pipelines["Say hello"][1] is pipeline
+
+    process_pool._run_pipeline(make_config("Say hello", "Hello again!"))
+    assert process_pool._worker_pipelines["Say hello"][1] is not pipeline
+
+
+def test_worker_sends_email_digests_at_exit(mocker):
+    finalize = mocker.patch.object(process_pool, "Finalize")
+    mocker.patch.object(process_pool, "set_state_store")
+    mocker.patch.object(process_pool, "set_run_history")
+    process_pool._initialize_worker(str(Path("./custom_steps/").resolve()), {}, None)
+    close_email = next(call.args[1] for call in finalize.call_args_list if call.args[1] is process_pool._close_email)
+
+    from pipeliner.smtp_connection_pool import email_digest, smtp_connection_pool
+    calls = []
+    mocker.patch.object(email_digest, "flush", lambda: calls.append("flush"))
+    mocker.patch.object(smtp_connection_pool, "close", lambda: calls.append("close"))
+    close_email()
+    assert calls == ["flush", "close"]
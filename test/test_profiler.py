@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+
+from pipeliner import Pipeline, PipelineFactory, StepsFactoryWithCustomSteps
+from pipeliner.profiler import PipelineProfiler, make_profiler
+from pipeliner.steps import ProduceText, DoNothing
+
+
+def test_profiled_pipeline(tmp_path):
+    profiler = PipelineProfiler(str(tmp_path), top=5)
+    pipeline = Pipeline("Profiled pipeline", "* * * * *", [ProduceText("Hello test!"), DoNothing()], profiler=profiler)
+    pipeline.run()
+    pipeline.run()
+
+    pipeline_dir = tmp_path / "Profiled_pipeline"
+    run_dirs = sorted(path for path in pipeline_dir.iterdir() if path.is_dir())
+    assert len(run_dirs) == 2
+    assert sorted(path.name for path in run_dirs[0].iterdir()) == [
+        "0_ProduceText.pstats", "1_DoNothing.pstats", "summary.txt"
+    ]
+    summary = (run_dirs[0] / "summary.txt").read_text(encoding="utf8")
+    assert "Step 0:ProduceText took" in summary
+    assert "Step 1:DoNothing took" in summary
+
+    assert (pipeline_dir / "1_DoNothing.pstats").is_file()
+    aggregated = profiler.aggregated("Profiled pipeline", "1:DoNothing")
+    perform_calls = [
+        calls for (file_name, _, function), (_, calls, *_) in aggregated.stats.items()
+        if function == "perform" and file_name.endswith("do_nothing.py")
+    ]
+    assert perform_calls == [2]
+
+
+def test_profiler_sample_rate(tmp_path):
+    profiler = PipelineProfiler(str(tmp_path), sample_rate=0)
+    Pipeline("Not profiled pipeline", "* * * * *", [DoNothing()], profiler=profiler).run()
+
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(ValueError):
+        PipelineProfiler(str(tmp_path), sample_rate=2)
+
+
+def test_make_profiler(tmp_path):
+    assert make_profiler(None) is None
+    assert make_profiler(False) is None
+    assert isinstance(make_profiler(True), PipelineProfiler)
+    assert make_profiler({"output_dir": str(tmp_path), "sample_rate": 0.5})._sample_rate == 0.5
+
+
+def test_pipeline_factory_profile(tmp_path):
+    default_profiler = PipelineProfiler(str(tmp_path))
+    factory = PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/")), profiler=default_profiler)
+    steps = [{"class": "DoNothing"}]
+
+    assert factory.create({"name": "Default", "schedule": "* * * * *", "steps": steps})._profiler is default_profiler
+    assert factory.create({"name": "Off", "schedule": "* * * * *", "steps": steps, "profile": False})._profiler is None
+    own = factory.create({"name": "Own", "schedule": "* * * * *", "steps": steps, "profile": {"top": 3}})
+    assert own._profiler is not default_profiler
+    assert own._profiler._top == 3
@@ -0,0 +1,82 @@
+import pytest
+import requests
+
+from pipeliner.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from pipeliner.retry_policy import RetryPolicy
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(backoff=1, backoff_multiplier=2, max_backoff=5, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1, 2, 4, 5, 5]
+
+    policy = RetryPolicy(backoff=1, backoff_multiplier=2, max_backoff=5)
+    for attempt in range(1, 6):
+        assert 0 <= policy.delay(attempt) <= min(2 ** (attempt - 1), 5)
+
+    assert RetryPolicy().delay(3) == 0
+
+
+def test_retry_policy_retryable_exceptions():
+    policy = RetryPolicy(retry_on=["ConnectionError", "requests.exceptions.Timeout"])
+    assert policy.is_retryable(ConnectionRefusedError())
+    assert policy.is_retryable(requests.exceptions.ReadTimeout())
+    assert not policy.is_retryable(ValueError())
+    assert RetryPolicy().is_retryable(ValueError())
+
+    with pytest.raises(ValueError):
+        RetryPolicy(retry_on=["NoSuchError"])
+    with pytest.raises(ValueError):
+        RetryPolicy(retry_on=["json.dumps"])
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+
+
+def test_circuit_breaker(mocker):
+    now = mocker.patch("time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker("example.com", failure_threshold=2, reset_timeout=10, half_open_attempts=1)
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now.return_value = 110.0
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now.return_value = 120.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_circuit_breaker_lost_probe(mocker):
+    now = mocker.patch("time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker("example.com", failure_threshold=1, reset_timeout=10, half_open_attempts=1)
+    breaker.record_failure()
+
+    now.return_value = 110.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # a probe which never reports back is given up after another reset timeout
+    now.return_value = 120.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_registry():
+    registry = CircuitBreakerRegistry()
+    assert registry.get("example.com") is registry.get("example.com")
+    assert registry.get("example.com") is not registry.get("example.org")
+    registry.get("example.com").record_failure()
+    assert registry.states() == {"example.com": CircuitBreaker.CLOSED, "example.org": CircuitBreaker.CLOSED}
@@ -0,0 +1,168 @@
+import json
+import sqlite3
+import time
+from typing import Any
+
+import pytest
+
+from pipeliner import Pipeline
+from pipeliner.history_cli import main, percentile, pipeline_stats, slowest_steps
+from pipeliner.retry_policy import RetryPolicy
+from pipeliner.run_history import SqliteRunHistory, RunRecord, StepRecord, set_run_history, get_run_history, \
+    RunHistory, make_run_history
+from pipeliner.steps import ProduceText, DoNothing, Step
+
+
+class FailOnce(Step):
+    def __init__(self):
+        self.calls = 0
+
+    def perform(self, data: Any) -> Any:
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("Host is down")
+        return data
+
+
+class AlwaysFail(Step):
+    def perform(self, data: Any) -> Any:
+        raise ValueError("Invalid data")
+
+
+@pytest.fixture
+def history(tmp_path):
+    run_history = SqliteRunHistory(str(tmp_path / "history.db"), output_size=5, flush_interval=60)
+    set_run_history(run_history)
+    yield run_history
+    set_run_history(RunHistory())
+    run_history.close()
+
+
+def read_rows(history: SqliteRunHistory, query: str) -> list:
+    history.flush()
+    return history._connection.execute(query).fetchall()
+
+
+def test_pipeline_run_is_recorded(history):
+    retry_policy = RetryPolicy(max_attempts=2, jitter=False)
+    Pipeline("Say hello", None, [ProduceText("Hello test!"), FailOnce(), DoNothing()], retry_policy).run()
+
+    runs = read_rows(history, "SELECT pipeline, duration, outcome, output FROM runs")
+    assert len(runs) == 1
+    assert runs[0][0] == "Say hello"
+    assert runs[0][1] > 0
+    assert runs[0][2:] == ("success", "Hello")
+
+    steps = read_rows(history, "SELECT position, step, attempts, outcome, payload_size FROM steps ORDER BY position")
+    assert steps == [
+        (0, "0:ProduceText", 1, "success", 11),
+        (1, "1:FailOnce", 2, "success", 11),
+        (2, "2:DoNothing", 1, "success", 11),
+    ]
+
+
+def test_failed_run_is_recorded(history):
+    with pytest.raises(ValueError):
+        Pipeline("Failing", None, [ProduceText("Hello test!"), AlwaysFail(), DoNothing()]).run()
+
+    assert read_rows(history, "SELECT outcome, output FROM runs") == [("failure", None)]
+    assert read_rows(history, "SELECT step, attempts, outcome FROM steps") == [
+        ("0:ProduceText", 1, "success"),
+        ("1:AlwaysFail", 3, "failure"),
+    ]
+
+
+def test_runs_are_written_in_background(tmp_path):
+    history = SqliteRunHistory(str(tmp_path / "history.db"), flush_interval=0.05)
+    history.record(RunRecord("Say hello", time.time(), 0.1, "success", []))
+
+    connection = sqlite3.connect(str(tmp_path / "history.db"))
+    deadline = time.monotonic() + 5
+    while connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    connection.close()
+    history.close()
+
+
+def test_old_runs_are_removed(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = SqliteRunHistory(path, retention_days=1)
+    steps = [StepRecord("0:DoNothing", 0.1, 1, "success")]
+    history.record(RunRecord("Old", time.time() - 2 * 24 * 3600, 0.1, "success", steps))
+    history.record(RunRecord("New", time.time(), 0.1, "success", steps))
+    history.close()
+
+    history = SqliteRunHistory(path, retention_days=1)
+    assert read_rows(history, "SELECT pipeline FROM runs") == [("New",)]
+    assert len(read_rows(history, "SELECT * FROM steps")) == 1
+    history.close()
+
+
+def test_run_history_is_disabled_by_default():
+    assert type(get_run_history()) is RunHistory
+    assert type(make_run_history(None)) is RunHistory
+    assert get_run_history().output_of("Hello test!") is None
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile([3.0], 0.99) == 3
+
+
+def make_history(path: str) -> None:
+    history = SqliteRunHistory(path)
+    now = time.time()
+    for index in range(10):
+        outcome = "failure" if index == 9 else "success"
+        history.record(RunRecord("Download", now, index + 1, outcome, [
+            StepRecord("0:HttpDownload", index + 0.5, 2 if index == 0 else 1, outcome),
+            StepRecord("1:DoNothing", 0.001, 1, "success"),
+        ]))
+    old_steps = [StepRecord("0:ProduceText", 0.1, 1, "success")]
+    history.record(RunRecord("Say hello", now - 3 * 24 * 3600, 0.1, "success", old_steps))
+    history.close()
+
+
+def test_history_queries(tmp_path):
+    path = str(tmp_path / "history.db")
+    make_history(path)
+    connection = sqlite3.connect(path)
+
+    stats = pipeline_stats(connection, 0)
+    assert [row["pipeline"] for row in stats] == ["Download", "Say hello"]
+    assert stats[0]["runs"] == 10
+    assert stats[0]["failure_rate"] == 0.1
+    assert stats[0]["p50"] == 5
+    assert stats[0]["max"] == 10
+    assert [row["pipeline"] for row in pipeline_stats(connection, time.time() - 24 * 3600)] == ["Download"]
+
+    steps = slowest_steps(connection, 0, limit=2)
+    assert [(row["pipeline"], row["step"]) for row in steps] == [
+        ("Download", "0:HttpDownload"),
+        ("Say hello", "0:ProduceText"),
+    ]
+    assert steps[0]["retries"] == 1
+    assert steps[0]["mean"] == 5
+    assert slowest_steps(connection, 0, "Say hello")[0]["runs"] == 1
+    connection.close()
+
+
+def test_history_command(tmp_path, capsys):
+    path = tmp_path / "history.db"
+    make_history(str(path))
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"history": {"path": str(path)}, "pipelines": []}))
+
+    assert main([str(config_path)]) == 0
+    output = capsys.readouterr().out
+    assert "Download" in output and "10.0%" in output and "Say hello" in output
+
+    assert main([str(path), "--steps", "1", "--pipeline", "Download"]) == 0
+    output = capsys.readouterr().out
+    assert "0:HttpDownload" in output and "1:DoNothing" not in output
+
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "missing.db")])
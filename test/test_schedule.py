@@ -3,8 +3,8 @@ from typing import Set
 import pytest
 from datetime import datetime, timedelta
 
-from pipeliner.pipeline import Schedule
-from pipeliner.schedule import NumberValue, EveryNthValue, EveryTimeValue, RangeValue, MultipleValue, Value
+from pipeliner.schedule import Schedule, NumberValue, EveryNthValue, EveryTimeValue, RangeValue, MultipleValue, Value, \
+    IntervalSchedule, make_schedule
 
 
 def match_values(value: Value, should_match: Set[int]):
@@ -117,3 +117,110 @@ def test_schedule_month():
         assert schedule.should_run(datetime(2019, i, 1, 0, 0, 0))
     for i in range(7, 12):
         assert not schedule.should_run(datetime(2019, i, 1, 0, 0, 0))
+
+
+def test_schedule_sunday():
+    sunday = datetime(2019, 12, 29, 0, 0, 0)
+    assert Schedule("* * * * 0").should_run(sunday)
+    assert Schedule("* * * * 7").should_run(sunday)
+    assert not Schedule("* * * * 0").should_run(sunday - timedelta(days=1))
+
+
+def test_schedule_next_run():
+    schedule = Schedule("*/15 9-14 * * *")
+    assert schedule.next_run(datetime(2019, 12, 24, 11, 53, 25)) == datetime(2019, 12, 24, 12, 0)
+    assert schedule.next_run(datetime(2019, 12, 24, 12, 0)) == datetime(2019, 12, 24, 12, 15)
+    assert schedule.next_run(datetime(2019, 12, 24, 14, 45)) == datetime(2019, 12, 25, 9, 0)
+
+    schedule = Schedule("0 0 1 1 *")
+    assert schedule.next_run(datetime(2019, 1, 1, 0, 0, 0)) == datetime(2020, 1, 1, 0, 0)
+
+    schedule = Schedule("30 8 29 2 *")
+    assert schedule.next_run(datetime(2019, 3, 1)) == datetime(2020, 2, 29, 8, 30)
+
+    schedule = Schedule("0 12 * * 1-5")
+    friday = datetime(2019, 12, 27, 13, 0, 0)
+    assert schedule.next_run(friday) == datetime(2019, 12, 30, 12, 0)
+
+
+def test_schedule_next_run_matches_should_run():
+    for time_string in ["* * * * *", "*/7 */5 * * *", "5,35 1-3 1-15 */2 *", "0 0 * * 1-5", "59 23 * * 7"]:
+        schedule = Schedule(time_string)
+        when = datetime(2019, 12, 24, 11, 53)
+        for _ in range(20):
+            expected = when + timedelta(minutes=1)
+            while not schedule.should_run(expected):
+                expected += timedelta(minutes=1)
+            when = schedule.next_run(when)
+            assert when == expected
+
+
+def test_schedule_never_runs():
+    assert Schedule("0 0 31 2 *").next_run(datetime(2019, 1, 1)) is None
+    assert Schedule("0 20-10 * * *").next_run(datetime(2019, 1, 1)) is None
+
+
+def test_schedule_iter_runs():
+    schedule = Schedule("0 */6 * * *")
+    runs = list(schedule.iter_runs(datetime(2019, 12, 24, 0, 0), datetime(2019, 12, 25, 0, 0)))
+    assert runs == [
+        datetime(2019, 12, 24, 6, 0),
+        datetime(2019, 12, 24, 12, 0),
+        datetime(2019, 12, 24, 18, 0),
+        datetime(2019, 12, 25, 0, 0),
+    ]
+
+
+def test_schedule_invalid_step():
+    with pytest.raises(ValueError):
+        Schedule("*/0 * * * *")
+
+
+def test_schedule_with_seconds():
+    schedule = Schedule("*/15 * * * * *")
+    assert schedule.resolution == timedelta(seconds=1)
+    assert schedule.should_run(datetime(2019, 12, 24, 11, 53, 30))
+    assert not schedule.should_run(datetime(2019, 12, 24, 11, 53, 25))
+    assert schedule.next_run(datetime(2019, 12, 24, 11, 53, 25, 500)) == datetime(2019, 12, 24, 11, 53, 30)
+    assert schedule.next_run(datetime(2019, 12, 24, 11, 59, 45)) == datetime(2019, 12, 24, 12, 0, 0)
+
+    schedule = Schedule("10 0 12 * * *")
+    assert schedule.next_run(datetime(2019, 12, 24, 12, 0, 10)) == datetime(2019, 12, 25, 12, 0, 10)
+
+    assert Schedule("* * * * *").resolution == timedelta(minutes=1)
+    assert Schedule("* * * * *").next_run(datetime(2019, 12, 24, 11, 53, 25)) == datetime(2019, 12, 24, 11, 54)
+
+    with pytest.raises(ValueError):
+        Schedule("60 * * * * *")
+    with pytest.raises(ValueError):
+        Schedule("* * * * * * *")
+
+
+def test_schedule_with_seconds_next_run_matches_should_run():
+    for time_string in ["*/7 * * * * *", "5,35 */2 1-3 * * *", "30 */10 * * * 1-5"]:
+        schedule = Schedule(time_string)
+        when = datetime(2019, 12, 24, 11, 53, 3)
+        for _ in range(20):
+            expected = when + timedelta(seconds=1)
+            while not schedule.should_run(expected):
+                expected += timedelta(seconds=1)
+            when = schedule.next_run(when)
+            assert when == expected
+
+
+def test_interval_schedule():
+    schedule = make_schedule("every 15s")
+    assert isinstance(schedule, IntervalSchedule)
+    assert schedule.interval == timedelta(seconds=15)
+    assert schedule.next_run(datetime(2019, 12, 24, 11, 53, 25)) == datetime(2019, 12, 24, 11, 53, 30)
+    assert schedule.next_run(datetime(2019, 12, 24, 11, 53, 30)) == datetime(2019, 12, 24, 11, 53, 45)
+    assert schedule.should_run(datetime(2019, 12, 24, 11, 53, 45))
+    assert not schedule.should_run(datetime(2019, 12, 24, 11, 53, 46))
+
+    assert make_schedule("every: 1h 30m").interval == timedelta(minutes=90)
+    assert make_schedule("EVERY 2d").interval == timedelta(days=2)
+    assert isinstance(make_schedule("* * * * *"), Schedule)
+
+    for time_string in ["every", "every 0s", "every 15", "every 5x", "every -5s"]:
+        with pytest.raises(ValueError):
+            make_schedule(time_string)
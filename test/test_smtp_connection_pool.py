@@ -0,0 +1,103 @@
+import smtplib
+from email.mime.text import MIMEText
+
+import pytest
+
+from pipeliner.smtp_connection_pool import SmtpConnectionPool, EmailDigest
+from pipeliner.steps import SendEmailSsl, SendEmailTls
+
+
+@pytest.fixture
+def smtp_ssl(mocker):
+    smtp_ssl = mocker.patch("smtplib.SMTP_SSL")
+    smtp_ssl.return_value.noop.return_value = (250, b"OK")
+    return smtp_ssl
+
+
+def send(pool: SmtpConnectionPool, use_ssl: bool = True):
+    pool.send("smtp.doe.com", 465, "john@doe.com", "$3cr37", use_ssl, "john@doe.com", ["sally@doe.com"], MIMEText("Hi"))
+
+
+def test_connection_is_reused(smtp_ssl):
+    pool = SmtpConnectionPool()
+    send(pool)
+    send(pool)
+    send(pool)
+
+    smtp_ssl.assert_called_once()
+    smtp_ssl.return_value.login.assert_called_once_with("john@doe.com", "$3cr37")
+    assert smtp_ssl.return_value.sendmail.call_count == 3
+    assert smtp_ssl.call_args.kwargs["context"] is pool.ssl_context
+    pool.close()
+    smtp_ssl.return_value.quit.assert_called_once()
+
+
+def test_stale_connection_is_replaced(smtp_ssl):
+    pool = SmtpConnectionPool()
+    send(pool)
+    smtp_ssl.return_value.noop.side_effect = smtplib.SMTPServerDisconnected()
+    send(pool)
+    assert smtp_ssl.call_count == 2
+
+
+def test_disconnected_connection_is_retried(smtp_ssl):
+    pool = SmtpConnectionPool()
+    send(pool)
+    smtp_ssl.return_value.sendmail.side_effect = [smtplib.SMTPServerDisconnected(), {}]
+    send(pool)
+    assert smtp_ssl.call_count == 2
+    assert smtp_ssl.return_value.sendmail.call_count == 3
+
+
+def test_tls_connection(mocker):
+    smtp = mocker.patch("smtplib.SMTP")
+    pool = SmtpConnectionPool()
+    send(pool, use_ssl=False)
+    smtp.return_value.starttls.assert_called_once_with(context=pool.ssl_context)
+    smtp.return_value.sendmail.assert_called_once()
+
+
+def test_email_digest(mocker):
+    digest = EmailDigest()
+    send = mocker.Mock()
+    digest.add(("key",), 60, "New post", "First", send)
+    digest.add(("key",), 60, "New post", "Second", send)
+    digest.add(("other",), 60, "Other post", "Third", send)
+    send.assert_not_called()
+
+    digest.flush()
+    send.assert_has_calls([
+        mocker.call("New post (+1 more)", "First" + EmailDigest.SEPARATOR + "Second"),
+        mocker.call("Other post", "Third"),
+    ])
+
+
+def test_email_digest_is_sent_after_window(mocker):
+    digest = EmailDigest()
+    send = mocker.Mock()
+    digest.add(("key",), 0.01, "New post", "First", send)
+    digest._timers[("key",)].join(5)
+    send.assert_called_once_with("New post", "First")
+
+
+def test_failed_email_digest_is_sent_again(mocker):
+    digest = EmailDigest()
+    send = mocker.Mock(side_effect=[ConnectionError("Server is down"), None])
+    digest.add(("key",), 60, "New post", "First", send)
+    digest.flush()
+    assert ("key",) in digest._timers
+
+    digest.add(("key",), 60, "New post", "Second", send)
+    digest.flush()
+    send.assert_called_with("New post (+1 more)", "First" + EmailDigest.SEPARATOR + "Second")
+    assert not digest._timers
+
+
+def test_send_email_steps(mocker):
+    pool_send = mocker.patch("pipeliner.smtp_connection_pool.smtp_connection_pool.send")
+    params = ["smtp.doe.com", 465, "john@doe.com", "$3cr37", "john@doe.com", ["sally@doe.com"], "Hey!"]
+
+    assert SendEmailSsl(*params).perform("Hello test!") == "Hello test!"
+    assert SendEmailTls(*params).perform("Hello test!") == "Hello test!"
+    assert [call.args[4] for call in pool_send.call_args_list] == [True, False]
+    assert pool_send.call_args.args[7].get_payload(decode=True) == b"Hello test!"
@@ -0,0 +1,62 @@
+import pytest
+
+from pipeliner.state_store import StoredState, MemoryStateStore, SqliteStateStore, FileStateStore, make_state_store
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def make_store(request, tmp_path):
+    def make():
+        if request.param == "memory":
+            return MemoryStateStore()
+        if request.param == "sqlite":
+            return SqliteStateStore(str(tmp_path / "state.db"), flush_interval=0.01)
+        return FileStateStore(str(tmp_path / "state.jsonl"), flush_interval=0.01)
+    return make
+
+
+def test_state_store(make_store):
+    store = make_store()
+    assert store.get("pipeline/0") is None
+    store.put("pipeline/0", StoredState("digest"))
+    store.put("pipeline/1", StoredState("other", b"payload"))
+    store.put("pipeline/0", StoredState("changed"))
+    assert store.get("pipeline/0") == StoredState("changed")
+    assert store.get("pipeline/1") == StoredState("other", b"payload")
+    store.close()
+
+
+@pytest.mark.parametrize("Store, file_name", [(SqliteStateStore, "state.db"), (FileStateStore, "state.jsonl")])
+def test_state_store_persists(Store, file_name, tmp_path):
+    path = str(tmp_path / file_name)
+    store = Store(path, flush_interval=60)
+    store.put("pipeline/0", StoredState("digest"))
+    store.put("pipeline/0", StoredState("changed", b"payload"))
+    store.close()
+
+    store = Store(path)
+    assert store.get("pipeline/0") == StoredState("changed", b"payload")
+    store.close()
+
+
+def test_file_state_store_compacts(tmp_path):
+    path = tmp_path / "state.jsonl"
+    store = FileStateStore(str(path))
+    for i in range(FileStateStore.COMPACT_MIN_RECORDS + 1):
+        store.put("pipeline/0", StoredState(str(i)))
+        store.flush()
+    store.close()
+
+    store = FileStateStore(str(path))
+    assert store.get("pipeline/0") == StoredState(str(FileStateStore.COMPACT_MIN_RECORDS))
+    store.close()
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_make_state_store(tmp_path):
+    assert type(make_state_store({})) is MemoryStateStore
+    store = make_state_store({"backend": "sqlite", "path": str(tmp_path / "state.db")})
+    assert type(store) is SqliteStateStore
+    store.close()
+
+    with pytest.raises(ValueError):
+        make_state_store({"backend": "redis"})
@@ -0,0 +1,75 @@
+import subprocess
+import sys
+from importlib.metadata import EntryPoint
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import pipeliner.steps
+from pipeliner.step_registry import StepRegistry, DuplicateStepError
+from pipeliner.steps import Step, DoNothing
+
+
+class DoNothing2(Step):
+    def perform(self, data: Any) -> Any:
+        return data
+
+
+def test_steps_are_imported_lazily():
+    code = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "from pipeliner import StepsFactoryWithCustomSteps\n"
+        "factory = StepsFactoryWithCustomSteps(Path('./custom_steps/').resolve())\n"
+        "factory.create([{'class': 'ProduceText', 'params': {'text': 'Hi'}}, {'class': 'SayHello'}])\n"
+        "print(sorted(name for name in ('lxml', 'fbchat', 'smtplib', 'requests', 'pipeliner.steps.make_data') "
+        "if name in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "['pipeliner.steps.make_data']"
+
+
+def test_requests_is_imported_lazily():
+    code = "import sys\nimport pipeliner.__main__\nprint('requests' in sys.modules)\n"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
+
+
+def test_registry_resolves_steps():
+    registry = StepRegistry(entry_point_steps=False)
+    registry.register_package(Path("./custom_steps/").resolve())
+
+    assert registry.get("DoNothing") is DoNothing
+    assert registry.get("SayHello").__module__ == "custom_steps.my_custom_steps"
+    assert "HttpDownload" in registry.names
+    with pytest.raises(ModuleNotFoundError):
+        registry.get("DoSomething")
+
+
+def test_registry_detects_duplicates():
+    registry = StepRegistry(entry_point_steps=False)
+    registry.register(DoNothing)
+    registry.register(DoNothing2)
+
+    with pytest.raises(DuplicateStepError):
+        registry.register(DoNothing2, "DoNothing")
+    assert registry.get("DoNothing") is DoNothing
+
+
+def test_registry_entry_points(mocker):
+    mocker.patch("pipeliner.step_registry.entry_points", return_value=[
+        EntryPoint("Hello", "custom_steps.my_custom_steps:SayHello", StepRegistry.ENTRY_POINT_GROUP),
+        EntryPoint("ProduceText", "custom_steps.my_custom_steps:SayBye", StepRegistry.ENTRY_POINT_GROUP),
+    ])
+    with pytest.raises(DuplicateStepError):
+        StepRegistry()
+
+    registry = StepRegistry(builtin_steps=False)
+    assert registry.get("Hello").__name__ == "SayHello"
+
+
+def test_steps_package_exports():
+    assert "HttpDownload" in dir(pipeliner.steps)
+    with pytest.raises(AttributeError):
+        pipeliner.steps.DoSomething
@@ -1,8 +1,21 @@
-from typing import List
+import threading
+import time
+from typing import List, Any
+from urllib.parse import urlsplit
+
+import lxml.html
+import pytest
+from lxml import etree
 from unittest.mock import Mock
 
+from pipeliner import Pipeline
+from pipeliner.circuit_breaker import CircuitBreakerRegistry
+from pipeliner.http_session_pool import http_session_pool
+from pipeliner.retry_policy import RetryPolicy
+from pipeliner.state_store import SqliteStateStore
 from pipeliner.steps_factory import StepsFactory
-from pipeliner.steps import CompareWithPrevious, Step, DoNothing, ProduceText, GetHtmlElement, GetHtmlElementText, HttpDownload, PickRandomText
+from pipeliner.steps import CompareWithPrevious, Step, DoNothing, ProduceText, GetHtmlElement, GetHtmlElementText, HttpDownload, PickRandomText, \
+    SkipRemainingSteps, ParseHtml, GetHtmlElementsText, ResponseTooLarge, Parallel, HttpDownloadMany
 
 
 class CompareWithPreviousStepsFactory(StepsFactory):
@@ -42,6 +55,148 @@ def test_compare_with_previous(mocker):
     ])
 
 
+class FailOnceStep(Step):
+    def __init__(self):
+        self.calls = []
+
+    def perform(self, data: Any) -> Any:
+        self.calls.append(data)
+        if len(self.calls) == 1:
+            raise ConnectionError("SMTP server is down")
+        return data
+
+
+def test_compare_with_previous_retries_failed_change():
+    factory = CompareWithPreviousStepsFactory()
+    factory.when_different = FailOnceStep()
+    when_same = FailOnceStep()
+    factory.when_same = when_same
+
+    step = CompareWithPrevious(factory, {"type": "when_same"}, {"type": "when_different"})
+    Pipeline("Notify", None, [ProduceText("a"), step]).run()
+    pipeline = Pipeline("Notify", None, [ProduceText("b"), step], RetryPolicy(max_attempts=2, jitter=False))
+    pipeline.run()
+
+    assert factory.when_different.calls == ["b", "b"]
+    assert when_same.calls == []
+
+
+def test_compare_with_previous_persists_state(mocker, tmp_path):
+    state_store = SqliteStateStore(str(tmp_path / "state.db"))
+    mocker.patch("pipeliner.steps.compare_with_previous.get_state_store", lambda: state_store)
+
+    factory = CompareWithPreviousStepsFactory()
+    when_same = mocker.spy(factory.when_same, "perform")
+    step = CompareWithPrevious(factory, {"type": "when_same"}, {"type": "when_different"}, keep_payload=True)
+    step.bind("Test pipeline", "2")
+    step.perform("Hello test!")
+    assert step.previous_data == "Hello test!"
+    state_store.close()
+
+    state_store = SqliteStateStore(str(tmp_path / "state.db"))
+    step = CompareWithPrevious(factory, {"type": "when_same"}, {"type": "when_different"})
+    step.bind("Test pipeline", "2")
+    step.perform("Hello test!")
+    when_same.assert_called_once_with("Hello test!")
+    state_store.close()
+
+
+class SleepingStep(Step):
+    def __init__(self, seconds: float, result: Any):
+        self._seconds = seconds
+        self._result = result
+
+    def perform(self, data: Any) -> Any:
+        time.sleep(self._seconds)
+        return f"{data} {self._result}"
+
+
+class FailingStep(Step):
+    def perform(self, data: Any) -> Any:
+        raise RuntimeError("This step just fails")
+
+
+class ParallelStepsFactory(StepsFactory):
+    def __init__(self, steps: dict):
+        self.steps = steps
+
+    def create(self, steps_config: list) -> List[Step]:
+        return [self.create_step(step_config) for step_config in steps_config]
+
+    def create_step(self, step_config: dict) -> Step:
+        return self.steps[step_config["class"]]
+
+
+def test_parallel():
+    factory = ParallelStepsFactory({
+        "Slow": SleepingStep(0.2, "slow"),
+        "Slower": SleepingStep(0.3, "slower"),
+        "Nothing": DoNothing(),
+    })
+    step = Parallel(factory, [[{"class": "Slow"}, {"class": "Nothing"}], [{"class": "Slower"}]])
+
+    started = time.monotonic()
+    assert step.perform("Hello") == ["Hello slow", "Hello slower"]
+    assert time.monotonic() - started < 0.45
+
+    step = Parallel(factory, {"first": [{"class": "Slow"}], "second": [{"class": "Slower"}]}, max_workers=1)
+    assert step.perform("Hello") == {"first": "Hello slow", "second": "Hello slower"}
+
+
+def test_parallel_fail_fast():
+    factory = ParallelStepsFactory({"Slow": SleepingStep(0.5, "slow"), "Failing": FailingStep()})
+    step = Parallel(factory, [[{"class": "Slow"}], [{"class": "Failing"}]])
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        step.perform("Hello")
+    assert time.monotonic() - started < 0.4
+
+
+class AppendingStep(Step):
+    def __init__(self, item: str):
+        self._item = item
+
+    def perform(self, data: Any) -> Any:
+        data.append(self._item)
+        return data
+
+
+def test_parallel_copies_input_for_mutating_branches():
+    factory = ParallelStepsFactory({"Nothing": DoNothing(), "A": AppendingStep("a"), "B": AppendingStep("b")})
+    step = Parallel(factory, [[{"class": "Nothing"}, {"class": "A"}], [{"class": "Nothing"}, {"class": "B"}]])
+
+    data = []
+    assert step.perform(data) == [["a"], ["b"]]
+    assert data == []
+
+
+def test_parallel_collect_all():
+    factory = ParallelStepsFactory({
+        "Slow": SleepingStep(0.5, "slow"),
+        "Failing": FailingStep(),
+        "Nothing": DoNothing(),
+    })
+    step = Parallel(factory, [[{"class": "Nothing"}], [{"class": "Failing"}], [{"class": "Slow"}]],
+                    timeout=0.2, fail_fast=False)
+
+    results = step.perform("Hello")
+    assert results[0] == "Hello"
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], TimeoutError)
+
+    step = Parallel(factory, [[{"class": "Nothing"}], [{"class": "Slow"}]], timeout=0.2)
+    with pytest.raises(TimeoutError):
+        step.perform("Hello")
+
+
+def test_parallel_timeout_is_per_branch():
+    factory = ParallelStepsFactory({"First": SleepingStep(0.15, "first"), "Second": SleepingStep(0.15, "second")})
+    # the branches run one after another, together they take longer than the timeout
+    step = Parallel(factory, [[{"class": "First"}], [{"class": "Second"}]], max_workers=1, timeout=0.25)
+    assert step.perform("Hello") == ["Hello first", "Hello second"]
+
+
 def test_get_html_element():
     html = "<html><head></head><body><h1>Title with <a href=\"#url\">link</a></h1></body></html>"
     step = GetHtmlElement("//html/body/h1")
@@ -56,8 +211,40 @@ def test_get_html_element_text():
     assert element_text == "link"
 
 
+def test_get_html_element_invalid_xpath():
+    with pytest.raises(etree.XPathSyntaxError):
+        GetHtmlElement("//html/body/h1[")
+    with pytest.raises(etree.XPathSyntaxError):
+        GetHtmlElementText("//html/body/h1[")
+
+
+def test_html_document_is_parsed_once(mocker):
+    html = "<html><head></head><body><h1>Title with <a href=\"#url\">link</a></h1><p> Text </p></body></html>"
+    fromstring = mocker.spy(lxml.html, "fromstring")
+
+    document = ParseHtml().perform(html)
+    assert GetHtmlElement("//html/body/h1").perform(document) == "<h1>Title with <a href=\"#url\">link</a>\n</h1>\n"
+    assert GetHtmlElementText("//html/body/p").perform(document) == "Text"
+    heading = GetHtmlElement("//html/body/h1", as_document=True).perform(document)
+    assert GetHtmlElementText("./a").perform(heading) == "link"
+    assert fromstring.call_count == 1
+
+
+def test_get_html_element_as_document_is_detached():
+    html = "<html><body><div id=\"a\"><p>inside</p></div><p>outside</p></body></html>"
+    document = GetHtmlElement("//body/p", as_document=True).perform(ParseHtml().perform(html))
+    assert GetHtmlElementText("//p").perform(document) == "outside"
+    assert GetHtmlElementText("//p").perform(GetHtmlElement("//body/p").perform(html)) == "outside"
+
+
+def test_get_html_elements_text():
+    html = "<html><head><title>Blog</title></head><body><h1>Title with <a href=\"#url\">link</a></h1></body></html>"
+    step = GetHtmlElementsText({"title": "//title", "link": "//html/body/h1/a"})
+    assert step.perform(html) == {"title": "Blog", "link": "link"}
+
+
 def test_http_download(mocker):
-    requests_get = mocker.patch("requests.get")
+    requests_get = mocker.patch.object(http_session_pool, "get")
     requests_get.return_value = Mock()
     requests_get.return_value.content = "Downloaded content"
 
@@ -65,6 +252,162 @@ def test_http_download(mocker):
     assert step.perform(None) == "Downloaded content"
 
 
+def conditional_page(request):
+    if request.headers.get("If-None-Match") == "\"v1\"":
+        return 304, {"ETag": "\"v1\""}, b""
+    return 200, {"ETag": "\"v1\""}, b"Hello test!"
+
+
+def test_http_download_not_modified(http_server):
+    http_server.routes["/page"] = conditional_page
+    step = HttpDownload(http_server.url("/page"), dict())
+
+    assert step.perform(None) == b"Hello test!"
+    assert step.perform(None) == b"Hello test!"
+    assert "If-None-Match" not in http_server.requests[0][1]
+    assert http_server.requests[1][1]["If-None-Match"] == "\"v1\""
+
+
+def test_http_download_skip_unchanged(http_server):
+    http_server.routes["/page"] = conditional_page
+    step = HttpDownload(http_server.url("/page"), dict(), skip_unchanged=True)
+
+    assert step.perform(None) == b"Hello test!"
+    with pytest.raises(SkipRemainingSteps):
+        step.perform(None)
+
+
+def test_http_download_last_modified(http_server):
+    modified = "Tue, 24 Dec 2019 11:53:25 GMT"
+    http_server.routes["/page"] = lambda request: (
+        (304, {}, b"") if request.headers.get("If-Modified-Since") == modified
+        else (200, {"Last-Modified": modified}, b"Hello test!")
+    )
+    step = HttpDownload(http_server.url("/page"), dict())
+
+    assert step.perform(None) == b"Hello test!"
+    assert step.perform(None) == b"Hello test!"
+    assert http_server.requests[1][1]["If-Modified-Since"] == modified
+
+
+def large_page(request):
+    posts = "".join(f"<div class=\"post\"><h2 class=\"post-title\">Post {i}</h2></div>" for i in range(50000))
+    return 200, {}, f"<html><body><h1 class=\"post-title\">First post</h1>{posts}</body></html>".encode("utf-8")
+
+
+def test_http_download_until_element(http_server):
+    http_server.routes["/large"] = large_page
+    step = HttpDownload(http_server.url("/large"), dict(), until_xpath="(//*[@class=\"post-title\"])[1]")
+
+    document = step.perform(None)
+    assert GetHtmlElementText("(//*[@class=\"post-title\"])[1]").perform(document) == "First post"
+    assert len(str(document)) < len(large_page(None)[2]) / 10
+
+
+def test_http_download_until_text_or_attribute(http_server):
+    http_server.routes["/large"] = large_page
+
+    for until_xpath in ("//h1/text()", "//h1/@class"):
+        document = HttpDownload(http_server.url("/large"), dict(), until_xpath=until_xpath).perform(None)
+        assert GetHtmlElementText("//h1").perform(document) == "First post"
+        assert len(str(document)) < len(large_page(None)[2]) / 10
+
+    with pytest.raises(ValueError):
+        HttpDownload(http_server.url("/large"), dict(), until_xpath="count(//h1)")
+
+
+def test_http_download_until_element_at_end(http_server):
+    page = large_page(None)[2].replace(b"</body>", b"<footer class=\"end\">The end</footer><p>Bye</p></body>")
+    http_server.routes["/large"] = lambda request: (200, {}, page)
+
+    for until_xpath in ("//footer", "(//*[@class=\"end\"])[1]"):
+        step = HttpDownload(http_server.url("/large"), dict(), until_xpath=until_xpath)
+        full_xpath = Mock(side_effect=step._until_xpath)
+        step._until_xpath = full_xpath
+        document = step.perform(None)
+        assert GetHtmlElementText(until_xpath).perform(document) == "The end"
+        # the whole XPath runs only once a matching element is complete, not after every chunk
+        assert full_xpath.call_count == 1
+
+
+def test_http_download_max_body_size(http_server):
+    http_server.routes["/large"] = large_page
+    with pytest.raises(ResponseTooLarge):
+        HttpDownload(http_server.url("/large"), dict(), max_body_size=1024).perform(None)
+    with pytest.raises(ResponseTooLarge):
+        HttpDownload(http_server.url("/large"), dict(), until_xpath="//footer", max_body_size=1024).perform(None)
+
+    step = HttpDownload(http_server.url("/large"), dict(), max_body_size=10 * 1024 * 1024)
+    assert step.perform(None) == large_page(None)[2]
+
+
+def test_http_download_many(http_server):
+    http_server.routes["/a"] = lambda request: (200, {}, b"A")
+    http_server.routes["/b"] = lambda request: (200, {}, b"B")
+    urls = [http_server.url("/a"), http_server.url("/b"), http_server.url("/missing"), "not a url"]
+
+    result = HttpDownloadMany(urls).perform(None)
+
+    assert list(result) == urls
+    assert result[urls[0]] == {"status": 200, "body": b"A"}
+    assert result[urls[1]] == {"status": 200, "body": b"B"}
+    assert result[urls[2]] == {"status": 404, "body": b"Not found"}
+    assert result[urls[3]]["status"] is None
+    assert "error" in result[urls[3]]
+
+
+def test_http_download_many_server_errors_open_circuit(http_server, mocker):
+    registry = CircuitBreakerRegistry()
+    registry.configure(failure_threshold=2, reset_timeout=60)
+    mocker.patch("pipeliner.steps.http_download.circuit_breakers", registry)
+    http_server.routes["/a"] = lambda request: (500, {}, b"Server error")
+    http_server.routes["/b"] = lambda request: (500, {}, b"Server error")
+    urls = [http_server.url("/a"), http_server.url("/b")]
+
+    result = HttpDownloadMany(urls, max_concurrency=1).perform(None)
+    assert [page["status"] for page in result.values()] == [500, 500]
+    assert registry.get(urlsplit(urls[0]).netloc).state == "open"
+
+
+def test_http_download_many_urls_from_data(http_server):
+    http_server.routes["/a"] = lambda request: (200, {}, b"A")
+    http_server.routes["/large"] = lambda request: (200, {}, b"x" * 2048)
+    step = HttpDownloadMany(headers={"X-Test": "yes"}, max_body_size=1024)
+
+    result = step.perform([http_server.url("/a"), http_server.url("/large"), http_server.url("/a")])
+
+    assert result[http_server.url("/a")] == {"status": 200, "body": b"A"}
+    assert "larger than 1024 bytes" in result[http_server.url("/large")]["error"]
+    assert len(http_server.requests) == 2
+    assert http_server.requests[0][1]["X-Test"] == "yes"
+    with pytest.raises(ValueError):
+        step.perform("http://127.0.0.1/")
+
+
+def test_http_download_many_max_concurrency(http_server):
+    lock = threading.Lock()
+    in_flight = []
+    most_in_flight = []
+
+    def slow_page(request):
+        with lock:
+            in_flight.append(request.path)
+            most_in_flight.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.remove(request.path)
+        return 200, {}, b"slow"
+
+    urls = [http_server.url(f"/{i}") for i in range(8)]
+    for i in range(8):
+        http_server.routes[f"/{i}"] = slow_page
+
+    result = HttpDownloadMany(urls, max_concurrency=2).perform(None)
+
+    assert all(page["body"] == b"slow" for page in result.values())
+    assert max(most_in_flight) == 2
+
+
 def test_make_text_data():
     step = ProduceText("Hello test!")
     assert step.perform(None) == "Hello test!"
@@ -0,0 +1,133 @@
+import http.client
+from pathlib import Path
+from typing import Any
+
+import pytest
+import requests
+
+from pipeliner import Pipeline, PipelineFactory, StepsFactoryWithCustomSteps
+from pipeliner.config_reload import PipelineSet
+from pipeliner.pipeline_scheduler import PipelineScheduler
+from pipeliner.steps import Step
+from pipeliner.triggers import WebhookServer, FileWatcher
+from test.test_pipeline_scheduler import wait_until
+
+
+class RecordingStep(Step):
+    def __init__(self):
+        self.received = []
+
+    def perform(self, data: Any) -> Any:
+        self.received.append(data)
+        return data
+
+
+def make_pipeline_set(scheduler, triggers: list) -> PipelineSet:
+    pipeline_set = PipelineSet(PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/"))), scheduler)
+    pipeline_set.apply([{"name": "Triggered pipeline", "triggers": triggers, "steps": [{"class": "DoNothing"}]}])
+    return pipeline_set
+
+
+def test_triggered_run_gets_data():
+    step = RecordingStep()
+    pipeline = Pipeline("Triggered pipeline", None, [step])
+    scheduler = PipelineScheduler(max_workers=1)
+    scheduler.add(pipeline)
+    assert not scheduler._next_runs
+
+    scheduler.start()
+    try:
+        assert scheduler.trigger(pipeline, "Hello test!")
+        assert wait_until(lambda: step.received == ["Hello test!"])
+    finally:
+        scheduler.stop()
+
+
+def test_pipeline_needs_schedule_or_trigger():
+    factory = PipelineFactory(StepsFactoryWithCustomSteps(Path("./custom_steps/")))
+    with pytest.raises(ValueError):
+        factory.create({"name": "Never runs", "steps": []})
+    with pytest.raises(ValueError):
+        factory.create({"name": "Unknown trigger", "triggers": [{"type": "email"}], "steps": []})
+    with pytest.raises(ValueError):
+        factory.create({"name": "File without path", "triggers": [{"type": "file"}], "steps": []})
+    assert factory.create({"name": "Triggered", "triggers": [{"type": "webhook"}], "steps": []}).schedule is None
+
+
+def test_webhook_server(mocker):
+    scheduler = mocker.Mock()
+    scheduler.trigger.return_value = True
+    pipeline_set = make_pipeline_set(scheduler, [{"type": "webhook", "token": "s3cr3t"}])
+    pipeline = pipeline_set.get("Triggered pipeline")
+    server = WebhookServer(pipeline_set, scheduler, port=0)
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/pipelines/Triggered%20pipeline"
+        authorization = {"Authorization": "Bearer s3cr3t"}
+
+        assert requests.post(url, data="Hello test!").status_code == 401
+        assert requests.post(url, data="Hello test!", headers=authorization).status_code == 202
+        scheduler.trigger.assert_called_with(pipeline, "Hello test!")
+
+        headers = {"Content-Type": "application/octet-stream", **authorization}
+        assert requests.post(url, data=b"\x00\x01", headers=headers).status_code == 202
+        scheduler.trigger.assert_called_with(pipeline, b"\x00\x01")
+
+        assert requests.post(url, json={"post": 1}, headers=authorization).status_code == 202
+        scheduler.trigger.assert_called_with(pipeline, {"post": 1})
+
+        headers = {"Content-Type": "text/plain; charset=utf-8", **authorization}
+        assert requests.post(url, data="Ahoj světe".encode("utf-8"), headers=headers).status_code == 202
+        scheduler.trigger.assert_called_with(pipeline, "Ahoj světe")
+
+        scheduler.trigger.return_value = False
+        assert requests.post(url, headers=authorization).status_code == 409
+        scheduler.trigger.assert_called_with(pipeline, None)
+
+        unknown_url = f"http://127.0.0.1:{server.port}/pipelines/Unknown"
+        assert requests.post(unknown_url, headers=authorization).status_code == 404
+    finally:
+        server.stop()
+
+
+def test_webhook_server_rejects_invalid_content_length(mocker):
+    scheduler = mocker.Mock()
+    pipeline_set = make_pipeline_set(scheduler, [{"type": "webhook"}])
+    server = WebhookServer(pipeline_set, scheduler, port=0)
+    server.start()
+    try:
+        for content_length in ("abc", "-1"):
+            connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+            connection.putrequest("POST", "/pipelines/Triggered%20pipeline")
+            connection.putheader("Content-Length", content_length)
+            connection.endheaders()
+            assert connection.getresponse().status == 400
+            connection.close()
+        scheduler.trigger.assert_not_called()
+    finally:
+        server.stop()
+
+
+def test_file_watcher(mocker, tmp_path):
+    scheduler = mocker.Mock()
+    scheduler.trigger.return_value = True
+    (tmp_path / "existing.csv").write_text("1")
+    pipeline_set = make_pipeline_set(scheduler, [{"type": "file", "path": str(tmp_path), "pattern": "*.csv"}])
+    pipeline = pipeline_set.get("Triggered pipeline")
+    watcher = FileWatcher(pipeline_set, scheduler)
+
+    watcher.check()
+    watcher.check()
+    scheduler.trigger.assert_not_called()
+
+    (tmp_path / "new.csv").write_text("2")
+    (tmp_path / "ignored.txt").write_text("3")
+    scheduler.trigger.return_value = False
+    watcher.check()
+    scheduler.trigger.return_value = True
+    watcher.check()
+    assert scheduler.trigger.call_count == 2
+    scheduler.trigger.assert_called_with(pipeline, [str(tmp_path / "new.csv")])
+
+    watcher.check()
+    assert scheduler.trigger.call_count == 2